@@ -1,10 +1,18 @@
 import argparse
 import logging
 import os
+import shlex
 import shutil
 import subprocess
+import sys
 import datetime
 import concurrent.futures 
+import hashlib
+import re
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from journal import completed_units, journal_path, load_events, record, resolve_campaign, unit_key
+from ssh_pool import POOL
 
 TESTS = ['udperf', 'iperf2', 'iperf3']
 udperf_BENCHMARK_REPO = "https://github.com/PickingUpPieces/udperf-benchmark.git"
@@ -14,6 +22,7 @@ udperf_RESULTS_DIR = "results"
 LOG_FILE = "results/run.log"
 IP_RECEIVER = "192.168.128.1"
 IP_SENDER = "192.168.128.2"
+CHUNK_SIZE = 1 << 20 # Bytes read at once from the streamed results
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', filename=LOG_FILE, filemode='a')
 
@@ -27,6 +36,7 @@ def main():
     parser.add_argument("sender_hostname", type=str, help="The hostname of the sender")
     parser.add_argument("sender_interfacename", type=str, help="The interface name of the sender")
     parser.add_argument("-t", "--tests", type=str, nargs='*', help="List of tests to run in a string with space separated values. Possible values: udperf, sysinfo, iperf2, iperf3")
+    parser.add_argument("--resume", action='store_true', help="Continue the last campaign from the journal, skipping completed tests and repetitions. The results of the interrupted campaign on the hosts are reused")
 
     args = parser.parse_args()
 
@@ -73,14 +83,17 @@ def main():
     logging.info('----------------------')
     setup_hosts(hosts)
     logging.info('----------------------')
-    execute_tests(tests, [args.receiver_hostname, args.sender_hostname], [(args.receiver_hostname, args.receiver_interfacename, ip_receiver), (args.sender_hostname, args.sender_interfacename, ip_sender)])
+    execute_tests(tests, [args.receiver_hostname, args.sender_hostname], [(args.receiver_hostname, args.receiver_interfacename, ip_receiver), (args.sender_hostname, args.sender_interfacename, ip_sender)], args.resume)
     logging.info('----------------------')
     get_results(hosts)
     logging.info('----------------------')
+    POOL.log_stats()
+    POOL.close_all()
 
 
-def execute_tests(tests: list, hosts, interfaces) -> bool:
+def execute_tests(tests: list, hosts, interfaces, resume=False) -> bool:
     logging.info('Executing tests')
+    # The hosts are configured again on resume, a rebooted host lost its configuration
     logging.info(f'Configuring all hosts')
     execute_on_hosts_in_parallel(interfaces, execute_script_on_host, 'configure.py')
     logging.info(f'Getting system information from all hosts')
@@ -92,14 +105,32 @@ def execute_tests(tests: list, hosts, interfaces) -> bool:
     receiver_ip = interfaces[0][2]
     logging.info(f'Interface names: {interface_names}')
 
+    journal_file = journal_path(udperf_RESULTS_DIR)
+    campaign = resolve_campaign(journal_file, resume=resume)
+    completed = completed_units(load_events(journal_file), campaign) if resume else set()
+    logging.info(f'Campaign: {campaign}')
+
     for test in tests:
+        if unit_key({'campaign': campaign, 'test_name': test}) in completed:
+            logging.info(f"Test {test} already completed in campaign {campaign}, skipping")
+            continue
         logging.info(f"Executing test: {test}")
+        record(journal_file, 'started', campaign=campaign, test_name=test)
         # Assuming each test has a corresponding script with the same name
         script_name = f"{test}.py"
-        execute_script_locally(script_name, hosts, interface_names, receiver_ip)
+        # Only udperf.py keeps its own journal, it continues within the campaign
+        arguments = ['--campaign', campaign] + (['--resume'] if resume else []) if test == 'udperf' else []
+        if test == 'udperf':
+            success = execute_udperf(hosts, interface_names, receiver_ip, arguments)
+        else:
+            success = execute_script_locally(script_name, hosts, interface_names, receiver_ip, arguments)
+        if success:
+            record(journal_file, 'done', campaign=campaign, test_name=test)
+        else:
+            record(journal_file, 'failed', campaign=campaign, test_name=test)
     return True
 
-def execute_script_locally(script_name, hosts, interfaces, receiver_ip: str):
+def execute_script_locally(script_name, hosts, interfaces, receiver_ip: str, arguments=()) -> bool:
     logging.info(f"Executing {script_name} locally to trigger test on remote hosts")
 
     env_vars = os.environ.copy()
@@ -108,7 +139,18 @@ def execute_script_locally(script_name, hosts, interfaces, receiver_ip: str):
         env_vars['SSH_AUTH_SOCK'] = os.environ['SSH_AUTH_SOCK']
         
     with open(LOG_FILE, 'a+') as log_file:
-        subprocess.run(["python3", 'scripts/' + script_name] + hosts + interfaces + [receiver_ip], stdout=log_file, stderr=log_file, env=env_vars)
+        result = subprocess.run(["python3", 'scripts/' + script_name] + hosts + interfaces + [receiver_ip] + list(arguments), stdout=log_file, stderr=log_file, env=env_vars)
+    return result.returncode == 0
+
+def execute_udperf(hosts, interfaces, receiver_ip: str, arguments=()) -> bool:
+    # udperf.py runs in this process, so its runs share one set of SSH connections and agents with run.py
+    logging.info("Executing udperf benchmarks")
+    import udperf # Imported here, so the logging configuration of run.py takes precedence
+    try:
+        return udperf.main(hosts + interfaces + [receiver_ip] + list(arguments))
+    except (Exception, SystemExit) as e:
+        logging.exception(f"udperf benchmarks failed: {e}")
+        return False
 
 def execute_script_on_host(host, interface, ip, script_name):
     logging.info(f"Executing {script_name} on {host}")
@@ -138,27 +180,58 @@ def execute_on_hosts_in_parallel(hosts, function_to_execute, script_name: str):
             future.result()
             pass
 
+def setup_host(host: str):
+    logging.info(f"Setting up host: {host}")
+    return execute_ssh_command(host, f"(test -d {udperf_BENCHMARK_DIRECTORY}/.git || git clone -b {udperf_BENCHMARK_REPO_BRANCH} {udperf_BENCHMARK_REPO}) && cd {udperf_BENCHMARK_DIRECTORY} && git pull", return_output=True)
+
 def setup_hosts(hosts: list) -> bool:
-    for host in hosts:
-        logging.info(f"Setting up host: {host}")
-        with open(LOG_FILE, 'a') as log_file:
-            execute_ssh_command(host, f"git clone -b {udperf_BENCHMARK_REPO_BRANCH} {udperf_BENCHMARK_REPO}", log_file)
-            execute_ssh_command(host, f"cd {udperf_BENCHMARK_DIRECTORY} && git pull", log_file)
+    # All hosts are set up in parallel, the output is written to the log file afterwards so it is not interleaved
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+        results = list(executor.map(setup_host, hosts))
+
+    with open(LOG_FILE, 'a') as log_file:
+        for host, result in zip(hosts, results):
+            log_file.write(result.stdout + result.stderr)
+            if result.returncode != 0:
+                logging.error(f"Setting up host {host} failed: {result.stderr}")
+                return False
 
     logging.info('Hosts repo setup completed')
     return True
 
-def get_results(hosts) -> bool:
-    for host in hosts:
-        logging.info(f'Getting results from host: {host}')
-
-        with open(LOG_FILE, 'a') as log_file:
-            execute_ssh_command(host, f"cd {udperf_BENCHMARK_DIRECTORY} && tar -czvf {host}-results.tar.gz {udperf_RESULTS_DIR}", log_file)
+def collect_results(host: str) -> bool:
+    # Streams the results of the host as tar | zstd over the SSH connection into a local archive, without a remote archive.
+    # The SHA-256 of the stream is computed on both ends, the remote results are only deleted if they match
+    archive_path = f"{udperf_RESULTS_DIR}/{host}-results.tar.zst"
+    logging.info(f'Getting results from host: {host}')
+    stream_command = f"set -o pipefail; tar -C {udperf_BENCHMARK_DIRECTORY} -cf - {udperf_RESULTS_DIR} | zstd -q -c -T0 | tee >(sha256sum >&2)"
+    process = POOL.popen(host, f"bash -c {shlex.quote(stream_command)}", stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    local_checksum = hashlib.sha256()
+    with open(archive_path, 'wb') as archive:
+        for chunk in iter(lambda: process.stdout.read(CHUNK_SIZE), b''):
+            local_checksum.update(chunk)
+            archive.write(chunk)
+    stderr = process.stderr.read().decode()
+    process.wait()
+
+    remote_checksums = re.findall(r'^([0-9a-f]{64})\s+-$', stderr, re.MULTILINE)
+    if process.returncode != 0 or not remote_checksums:
+        logging.error(f'Streaming results from {host} failed, keeping them on the host: {stderr}')
+        return False
+    if remote_checksums[-1] != local_checksum.hexdigest():
+        logging.error(f'Checksum of results from {host} does not match ({remote_checksums[-1]} != {local_checksum.hexdigest()}), keeping them on the host')
+        return False
 
-            scp_command = f"scp -o LogLevel=quiet -o StrictHostKeyChecking=no {host}:{udperf_BENCHMARK_DIRECTORY}/{host}-results.tar.gz {udperf_RESULTS_DIR}/"
-            subprocess.run(scp_command, shell=True, stdout=log_file, stderr=log_file)
+    logging.info(f'Results of {host} stored in {archive_path} (sha256 {local_checksum.hexdigest()})')
+    execute_ssh_command(host, f"rm -rf {udperf_BENCHMARK_DIRECTORY}/{udperf_RESULTS_DIR}/*")
+    return True
 
-            execute_ssh_command(host, f"rm -rf {udperf_BENCHMARK_DIRECTORY}/{udperf_RESULTS_DIR}/*", log_file)
+def get_results(hosts) -> bool:
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+        collected = list(executor.map(collect_results, hosts))
+    if not all(collected):
+        logging.error('Results of some hosts could not be collected, see above')
 
     logging.info(f'Results copied to results directory {udperf_RESULTS_DIR}')
     logging.info('Zipping results')
@@ -188,7 +261,7 @@ def get_results(hosts) -> bool:
 
 def test_ssh_connection(ssh_address: str) -> bool:
     try:
-        result = subprocess.run(['ssh', '-o LogLevel=quiet', '-o StrictHostKeyChecking=no', ssh_address, 'echo ok'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
+        result = POOL.run(ssh_address, 'echo ok', stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
         if result.stdout.decode().strip() == 'ok':
             logging.info(f"SSH connection to {ssh_address} successful.")
             return True
@@ -203,19 +276,13 @@ def test_ssh_connection(ssh_address: str) -> bool:
         return False
 
 def execute_ssh_command(host: str, command: str, log_file=None, return_output=False) -> str:
-    env_vars = os.environ.copy()
-    # Ensure SSH_AUTH_SOCK is forwarded if available
-    if 'SSH_AUTH_SOCK' in os.environ:
-        env_vars['SSH_AUTH_SOCK'] = os.environ['SSH_AUTH_SOCK']
-
-    ssh_command = f"ssh -o LogLevel=quiet -o StrictHostKeyChecking=no {host} '{command}'"
     if log_file:
-        subprocess.run(ssh_command, shell=True, stdout=log_file, stderr=log_file, env=env_vars)
+        POOL.run(host, command, stdout=log_file, stderr=log_file)
     elif return_output:
-        result = subprocess.run(ssh_command, capture_output=True, shell=True, text=True, env=env_vars)
+        result = POOL.run(host, command, capture_output=True, text=True)
         return result
     else:
-        subprocess.run(ssh_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, text=True, env=env_vars)
+        POOL.run(host, command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
 
 if __name__ == '__main__':
     logging.info('Starting script')
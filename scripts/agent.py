@@ -0,0 +1,438 @@
+# Benchmark agent running on every benchmark host.
+# The agent starts and stops udperf processes on request of benchmark.py, streams their stderr,
+# reports their exit status and returns result files. It speaks newline-delimited JSON over a single
+# TCP connection, which benchmark.py reaches through a port forward of the shared SSH connection.
+# This replaces the per-run ssh/shell invocations and the lsof based liveness checks.
+# The agent runs any command it is sent, so a connection has to authenticate first with the token the agent writes
+# to a file only readable by its user. The client reads the token over the SSH connection, other local users cannot.
+import argparse
+import base64
+import hmac
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import secrets
+import subprocess
+import sys
+import threading
+import time
+
+from ssh_pool import POOL
+
+AGENT_PORT = 47000
+AGENT_DIRECTORY = 'udperf-benchmark/scripts' # Relative to the home directory of the remote host
+AGENT_LOG_FILE = '/tmp/udperf-agent.log'
+AGENT_START_TIMEOUT = 10
+STOP_GRACE_PERIOD = 2 # Seconds between SIGTERM and SIGKILL when stopping a process
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+AGENT_TOKEN_FILE = '.udperf-agent-{port}.token' # Relative to the home directory, rewritten by every agent start
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class AgentError(Exception):
+    pass
+
+
+def token_path(port: int) -> str:
+    return AGENT_TOKEN_FILE.format(port=port)
+
+
+def write_token(port: int) -> str:
+    # A new token per agent session, readable only by the user of the agent
+    token = secrets.token_hex(32)
+    path = os.path.join(os.path.expanduser('~'), token_path(port))
+    # Written to a temporary file and renamed, so a client never reads a partial token
+    temporary_path = f'{path}.{os.getpid()}'
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    file_descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(file_descriptor, 'w') as token_file:
+        token_file.write(token)
+    os.replace(temporary_path, path)
+    return token
+
+
+##################################
+# Agent (server side)
+##################################
+
+class ManagedProcess:
+    def __init__(self, name: str, argv: list, env: dict, cwd: str, notify):
+        self.name = name
+        self.stdout = []
+        self.stderr = []
+        self.notify = notify
+        # Every process gets its own session, so stopping it also stops its children
+        self.process = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=cwd, start_new_session=True)
+        self.stdout_thread = threading.Thread(target=self._read_stream, args=(self.process.stdout, self.stdout, 'stdout'), daemon=True)
+        self.stderr_thread = threading.Thread(target=self._read_stream, args=(self.process.stderr, self.stderr, 'stderr'), daemon=True)
+        self.stdout_thread.start()
+        self.stderr_thread.start()
+        threading.Thread(target=self._notify_exit, daemon=True).start()
+
+    def _read_stream(self, stream, lines: list, stream_name: str):
+        for line in iter(stream.readline, b''):
+            decoded_line = line.decode(errors='replace')
+            lines.append(decoded_line)
+            if stream_name == 'stderr':
+                self.notify({'event': 'stderr', 'name': self.name, 'line': decoded_line})
+        stream.close()
+
+    def _notify_exit(self):
+        returncode = self.process.wait()
+        self.notify({'event': 'exit', 'name': self.name, 'returncode': returncode})
+
+    def wait(self, timeout=None):
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None
+        # Make sure all output is collected before it is returned
+        self.stdout_thread.join()
+        self.stderr_thread.join()
+        return self.process.returncode
+
+    def stop(self):
+        if self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGTERM)
+                self.process.wait(timeout=STOP_GRACE_PERIOD)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                self.process.wait()
+            except ProcessLookupError:
+                pass
+        return self.process.returncode
+
+
+class Agent:
+    def __init__(self):
+        self.processes: dict[str, ManagedProcess] = {}
+        self.lock = threading.Lock()
+
+    def ping(self, connection):
+        return {'pid': os.getpid()}
+
+    def start(self, connection, name: str, argv: list, env=None, cwd=None):
+        self.stop(connection, name)
+        process_env = os.environ.copy()
+        process_env.update(env or {})
+        # Relative paths are resolved against the home directory, as it is the case with ssh
+        process_cwd = os.path.expanduser(cwd or '~')
+
+        logging.info(f'Starting {name}: {" ".join(argv)}')
+        process = ManagedProcess(name, argv, process_env, process_cwd, connection.send)
+        with self.lock:
+            self.processes[name] = process
+        return {'pid': process.process.pid}
+
+    def wait(self, connection, name: str, timeout=None):
+        process = self._get_process(name)
+        returncode = process.wait(timeout)
+        return {'returncode': returncode, 'stdout': ''.join(process.stdout), 'stderr': ''.join(process.stderr)}
+
+    def stop(self, connection, name: str):
+        with self.lock:
+            process = self.processes.pop(name, None)
+        if process is None:
+            return {'returncode': None}
+        logging.info(f'Stopping {name}')
+        return {'returncode': process.stop()}
+
+    def stop_all(self, connection):
+        with self.lock:
+            names = list(self.processes.keys())
+        for name in names:
+            self.stop(connection, name)
+        return {'stopped': names}
+
+    def status(self, connection):
+        with self.lock:
+            return {'processes': {name: {'pid': process.process.pid, 'returncode': process.process.poll()} for name, process in self.processes.items()}}
+
+    def read_file(self, connection, path: str, offset=0):
+        with open(os.path.expanduser(os.path.join('~', path)), 'rb') as file:
+            file.seek(offset)
+            data = file.read(READ_CHUNK_SIZE)
+            size = os.fstat(file.fileno()).st_size
+        return {'data': base64.b64encode(data).decode(), 'size': size}
+
+    def read_text(self, connection, paths: list):
+        contents = {}
+        for path in paths:
+            try:
+                with open(path, 'r') as file:
+                    contents[path] = file.read()
+            except OSError:
+                contents[path] = ''
+        return {'contents': contents}
+
+    def _get_process(self, name: str) -> ManagedProcess:
+        with self.lock:
+            if name not in self.processes:
+                raise AgentError(f'No process with name {name}')
+            return self.processes[name]
+
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.write_lock = threading.Lock()
+        self.connected = True
+        logging.info(f'Client connected from {self.client_address}')
+        if not self.authenticate():
+            logging.warning(f'Client {self.client_address} failed to authenticate')
+            self.connected = False
+            return
+        for line in self.rfile:
+            request = json.loads(line)
+            # Requests like wait block, so every request is handled in its own thread
+            threading.Thread(target=self.dispatch, args=(request,), daemon=True).start()
+        self.connected = False
+        logging.info(f'Client {self.client_address} disconnected')
+
+    def authenticate(self) -> bool:
+        # The first request of a connection has to be auth with the token of the agent
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return False
+        token = request.get('args', {}).get('token', '')
+        authenticated = request.get('op') == 'auth' and isinstance(token, str) and hmac.compare_digest(token, self.server.token)
+        if authenticated:
+            self.send({'id': request.get('id'), 'ok': True, 'pid': os.getpid()})
+        else:
+            self.send({'id': request.get('id'), 'ok': False, 'error': 'Authentication failed'})
+        return authenticated
+
+    def dispatch(self, request: dict):
+        operation = getattr(self.server.agent, request.get('op', ''), None)
+        try:
+            if operation is None or request['op'].startswith('_'):
+                raise AgentError(f'Unknown operation {request.get("op")}')
+            response = {'id': request.get('id'), 'ok': True, **operation(self, **request.get('args', {}))}
+        except Exception as e:
+            response = {'id': request.get('id'), 'ok': False, 'error': str(e)}
+        self.send(response)
+
+    def send(self, message: dict):
+        if not self.connected:
+            return
+        with self.write_lock:
+            try:
+                self.wfile.write((json.dumps(message) + '\n').encode())
+                self.wfile.flush()
+            except OSError:
+                self.connected = False
+
+
+class AgentServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, agent: Agent):
+        super().__init__(address, AgentHandler)
+        self.agent = agent
+        # The token is written once the port is bound, so a client which finds it can connect
+        self.token = write_token(address[1])
+
+
+def serve(port: int, bind: str):
+    agent = Agent()
+    with AgentServer((bind, port), agent) as server:
+        logging.info(f'Agent listening on {bind}:{port}')
+        try:
+            server.serve_forever()
+        finally:
+            agent.stop_all(None)
+
+
+##################################
+# Client side
+##################################
+
+class AgentClient:
+    def __init__(self, host=None, port=AGENT_PORT, agent_directory=AGENT_DIRECTORY):
+        self.host = host
+        self.port = port
+        self.agent_directory = agent_directory
+        self.socket = None
+        self.local_port = None # Local end of the port forward to the agent, created once per client
+        self.request_id = 0
+        self.pending: dict[int, dict] = {}
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+
+    def connect(self) -> bool:
+        if self.try_connect():
+            return True
+
+        logging.info(f'No agent reachable on {self.host or "localhost"}, starting agent')
+        self._start_agent()
+        deadline = time.monotonic() + AGENT_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.try_connect():
+                return True
+            time.sleep(0.2)
+
+        logging.error(f'Failed to connect to agent on {self.host or "localhost"}:{self.port}')
+        return False
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def request(self, op: str, request_timeout=None, **args) -> dict:
+        with self.condition:
+            self.request_id += 1
+            request_id = self.request_id
+            client_socket = self.socket
+        if client_socket is None:
+            raise AgentError(f'Not connected to the agent on {self.host or "localhost"}, request {op} failed')
+
+        try:
+            with self.write_lock:
+                client_socket.sendall((json.dumps({'id': request_id, 'op': op, 'args': args}) + '\n').encode())
+        except OSError as e:
+            raise AgentError(f'Failed to send request {op} to the agent: {e}')
+
+        with self.condition:
+            if not self.condition.wait_for(lambda: request_id in self.pending or self.socket is None, timeout=request_timeout):
+                raise AgentError(f'Agent request {op} timed out')
+            if request_id not in self.pending:
+                raise AgentError(f'Connection to agent lost during request {op}')
+            response = self.pending.pop(request_id)
+
+        if not response['ok']:
+            raise AgentError(response['error'])
+        return response
+
+    def start(self, name: str, argv: list, env=None) -> int:
+        return self.request('start', name=name, argv=argv, env=env)['pid']
+
+    def wait(self, name: str, timeout=None) -> dict:
+        return self.request('wait', name=name, timeout=timeout)
+
+    def stop(self, name: str):
+        return self.request('stop', name=name)['returncode']
+
+    def stop_all(self) -> list:
+        return self.request('stop_all')['stopped']
+
+    def read_text(self, paths: list) -> dict[str, str]:
+        return self.request('read_text', paths=paths)['contents']
+
+    def fetch_file(self, path: str, offset=0) -> bytes:
+        data = b''
+        while True:
+            response = self.request('read_file', path=path, offset=offset + len(data))
+            chunk = base64.b64decode(response['data'])
+            data += chunk
+            if not chunk or offset + len(data) >= response['size']:
+                return data
+
+    def try_connect(self) -> bool:
+        if self.host:
+            # The forward also works for an agent started later, so it is not created again on retries
+            if self.local_port is None:
+                self.local_port = POOL.forward(self.host, self.port)
+            if self.local_port is None:
+                return False
+        else:
+            self.local_port = self.port
+
+        token = self._read_token()
+        if token is None:
+            return False
+        try:
+            self.socket = socket.create_connection(('127.0.0.1', self.local_port), timeout=AGENT_START_TIMEOUT)
+            self.socket.settimeout(None)
+        except OSError:
+            self.socket = None
+            return False
+
+        threading.Thread(target=self._read_responses, args=(self.socket,), daemon=True).start()
+        # A forwarded port accepts connections even if the agent is not running, so check it answers
+        try:
+            self.request('auth', request_timeout=AGENT_START_TIMEOUT, token=token)
+        except AgentError as e:
+            logging.debug(f'Connection to agent on {self.host or "localhost"} failed: {e}')
+            self.close()
+            return False
+        return True
+
+    def _read_token(self):
+        # The token file of a running agent, read over the SSH connection for remote hosts
+        if self.host:
+            result = POOL.run(self.host, f'cat {token_path(self.port)}', capture_output=True, text=True)
+            return result.stdout.strip() if result.returncode == 0 else None
+        try:
+            with open(os.path.join(os.path.expanduser('~'), token_path(self.port)), 'r') as token_file:
+                return token_file.read().strip()
+        except OSError:
+            return None
+
+    def _read_responses(self, client_socket: socket.socket):
+        try:
+            for line in client_socket.makefile('rb'):
+                message = json.loads(line)
+                if 'event' in message:
+                    self._handle_event(message)
+                    continue
+                with self.condition:
+                    self.pending[message['id']] = message
+                    self.condition.notify_all()
+        except OSError:
+            pass
+
+        with self.condition:
+            if self.socket is client_socket:
+                self.socket = None
+            self.condition.notify_all()
+
+    def _handle_event(self, event: dict):
+        if event['event'] == 'stderr':
+            logging.debug(f'{self.host or "localhost"} {event["name"]} stderr: {event["line"].rstrip()}')
+        elif event['event'] == 'exit':
+            logging.debug(f'{self.host or "localhost"} {event["name"]} exited with {event["returncode"]}')
+
+    def _start_agent(self):
+        if self.host:
+            command = f'cd {self.agent_directory} && nohup python3 agent.py serve --port {self.port} >> {AGENT_LOG_FILE} 2>&1 < /dev/null &'
+            POOL.run(self.host, command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            with open(AGENT_LOG_FILE, 'a') as log_file:
+                subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', '--port', str(self.port)], stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file, start_new_session=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark agent controlling udperf processes on this host')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help='Run the agent')
+    serve_parser.add_argument('--port', type=int, default=AGENT_PORT, help='Port the agent listens on')
+    serve_parser.add_argument('--bind', default='127.0.0.1', help='Address the agent binds to. By default only reachable through SSH port forwarding')
+    ping_parser = subparsers.add_parser('ping', help='Check if an agent is reachable')
+    ping_parser.add_argument('--host', default=None, help='SSH address of the host running the agent')
+    ping_parser.add_argument('--port', type=int, default=AGENT_PORT, help='Port of the agent')
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.port, args.bind)
+    elif args.command == 'ping':
+        client = AgentClient(args.host, args.port)
+        if client.try_connect():
+            logging.info(f'Agent on {args.host or "localhost"}:{args.port} is reachable')
+            client.close()
+        else:
+            logging.error(f'Agent on {args.host or "localhost"}:{args.port} is not reachable')
+            exit(1)
+
+
+if __name__ == '__main__':
+    main()
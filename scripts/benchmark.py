@@ -1,8 +1,11 @@
+import asyncio
 from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
 from datetime import datetime
+from typing import Optional, TypedDict
 import json
 import os
-import signal
+import shlex
 import subprocess
 import argparse
 import json
@@ -10,6 +13,26 @@ import time
 import logging
 import yaml
 
+from agent import AGENT_PORT, AgentClient, AgentError
+from build_cache import BUILD_VARIANTS, DEFAULT_BUILD, build_local_binary, ensure_binary, file_checksum, local_binary_path, planned_binary, resolve_build_variant, udperf_arguments
+from confidence import confidence_interval, relative_half_width
+from executor import RUN_TIMEOUT_BUFFER, RunProcess, execute_run
+from journal import completed_units, journal_path, load_events, record, resolve_campaign, unit_key
+from loss_counters import COUNTERS_PREFIX, counter_deltas, read_loss_counters
+from nic_stats import QUEUE_IMBALANCE_WARNING, QUEUES_PREFIX, RSS_QUEUES, nic_deltas, read_ethtool_stats
+from perf_stat import PERF_COLUMNS, perf_command, perf_metrics, perf_output_path, parse_perf_stat
+from planner import REPETITION_OVERHEAD, count_reconfigurations, estimate_run, format_duration, measured_overhead, order_runs, previous_runs_files, udperf_flags, validate_run
+from readiness import expected_receiver_sockets, wait_for_sockets
+from results import ResultTail, append_run_record, copy_result_rows, read_result_file, repetition_rows, repetition_value
+from results_index import append_index_entry, host_fingerprint, index_path, load_index, rows_path, run_hash, store_rows
+from search import KNEE_BUDGET, LOSS_THRESHOLD, SEARCH_MAX_STEPS, SEARCH_PRECISION, find_knee, find_max_lossless_rate
+from settle import DEFAULT_THRESHOLDS, wait_until_settled
+from sampler import SAMPLE_INTERVAL, SOURCES, sampler_command
+from ssh_pool import POOL
+from supervisor import reap_host
+from sync import SYNC_FOLDER, sync_results, sync_targets
+from sweep import SWEEP_KEY, count_runs, expand_cli_values, expand_sweep, split_test, sweep_dimensions
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 PATH_TO_RESULTS_FOLDER = './results/udperf'
 PATH_TO_udperf_REPO = '/root/udperf'
@@ -17,6 +40,13 @@ udperf_REPO = 'https://github.com/PickingUpPieces/udperf'
 udperf_REPO_BRANCH = 'develop'
 PATH_TO_udperf_BIN = '/target/release/udperf'
 MAX_FAILED_ATTEMPTS = 3
+REVISION_SEPARATOR = '@' # Separates test name and udperf revision/build variant in the test label of multi-build campaigns
+VARIANT_SEPARATOR = '+' # Separates revision and build variant, if both are compared
+# Adaptive repetitions
+CI_TARGET = 0.02
+MIN_REPETITIONS = 3
+MAX_REPETITIONS = 10
+DEFAULT_SAMPLERS = [] # Sources of sampler.py started on both hosts for every run, off by default since sampling loads the hosts
 
 # If the sender config is an empty dictionary {}, use the default sender config
 DEFAULT_CONFIG_SENDER = {
@@ -27,57 +57,170 @@ DEFAULT_CONFIG_SENDER = {
     "bandwidth": 100000
 }
 
+
+class Run(TypedDict):
+    # A run of a test with the merged global, test and run parameters, see build_run
+    run_name: str
+    repetitions: int
+    sender: dict
+    receiver: dict
+
+
+@dataclass
+class Session:
+    # Hosts, agents and result paths shared by all repetitions of a benchmark config
+    config_file: str
+    csv_file_name: str
+    results_folder: str # On the hosts, udperf, the samplers and perf write their files there
+    summary_folder: str # On the orchestrator, the runs, search, counters and queues files
+    ssh_sender: Optional[str]
+    ssh_receiver: Optional[str]
+    agent_sender: Optional[AgentClient]
+    agent_receiver: Optional[AgentClient]
+    settle_hosts: list[tuple]
+    settle_thresholds: dict
+    journal: str
+    campaign: str
+    samplers: list[str] = field(default_factory=list)
+    interfaces: dict = field(default_factory=dict) # Role -> network interface, if known
+    rss_queues: int = RSS_QUEUES
+    perf_stat: bool = False
+    run_counters: dict = field(default_factory=dict) # (test label, run name, repetition) -> row of the counters file
+    result_tails: dict = field(default_factory=dict) # Role -> ResultTail of its result file
+
+    def roles(self) -> list[tuple]:
+        # (role, ssh address, agent) of both hosts
+        return [('receiver', self.ssh_receiver, self.agent_receiver), ('sender', self.ssh_sender, self.agent_sender)]
+
+    def result_text(self, role: str, test_name: str, run_name: str, repetition_id: int) -> str:
+        # Rows of the result file of the role which contain the repetition, without reading the whole file after every repetition
+        if role not in self.result_tails:
+            _, host, agent = next(entry for entry in self.roles() if entry[0] == role)
+            self.result_tails[role] = ResultTail(f'{self.results_folder}{role}-{self.csv_file_name}', host, agent)
+        return self.result_tails[role].repetition_text(test_name, run_name, repetition_id)
+
+
+@dataclass
+class RunResult:
+    # Summary of a run and build, one row of the runs file
+    test_name: str
+    run_name: str
+    build: str
+    pair: Optional[str]
+    repetitions: int
+    failed: bool
+    memoized: bool
+    time: float
+    duration_seconds: float
+    measured_repetitions: int = 0 # Repetitions run in duration_seconds, without the resumed and reused ones
+    data_rate_gbit_mean: Optional[float] = None
+    data_rate_gbit_ci95: Optional[float] = None
+    data_rate_gbit_ci95_relative: Optional[float] = None
+    ci_target_reached: Optional[bool] = None
+    perf: dict = field(default_factory=dict) # Means of the perf stat counters and metrics over the repetitions
+
+    def summary(self) -> dict:
+        summary = {key: value for key, value in asdict(self).items() if value is not None and key != 'perf'}
+        return {**summary, **self.perf}
+
+
 def parse_config_file(json_file_path: str):
     with open(os.path.abspath(json_file_path), 'r') as json_file:
         data = json.load(json_file)
 
     logging.debug('Read test config: %s', data)
 
+    # Build variants are not a test, see parse_build_variants
+    data.pop('builds', None)
     global_parameters = data.pop('parameters', data)
     logging.debug('Global parameters: %s', global_parameters)
     repetitions = global_parameters.pop('repetitions', 1)
 
     test_configs = []
 
-    for test_name, test_runs in data.items():
-        logging.debug('Processing test %s', test_name)
-        test_parameters = test_runs.pop('parameters', {})
-        logging.debug('Test specific parameters: %s', test_parameters)
-
-        test_config = {
-            'test_name': test_name,
-            'runs': [],
-        }
-
-        for run_name, run_config in test_runs.items():
-            logging.debug('Processing run "%s" with config: %s', run_name, run_config)
-            if not run_config["sender"]:
-                logging.info(f'{test_name}-{run_name}: Sender config is empty, using default sender config')
-                run_config["sender"] = DEFAULT_CONFIG_SENDER
-                # TODO: Or set parallel later from run_config_receiver
-                run_config["sender"]["parallel"] = run_config["receiver"].get("parallel", 1)
-
-            # Add test parameters first
-            run_config_sender = {**test_parameters, **run_config['sender']}
-            run_config_receiver = {**test_parameters, **run_config['receiver']}
-
-            # Add global parameters at last
-            run_config_sender = {**global_parameters, **run_config_sender}
-            run_config_receiver = {**global_parameters, **run_config_receiver}
-
-            run = {
-                'run_name': run_name,
-                'repetitions': run_config.get('repetitions', repetitions),
-                'sender': run_config_sender,
-                'receiver': run_config_receiver 
+    for config_test_name, config_test_runs in data.items():
+        # Tests with a sweep are expanded lazily, see sweep.py
+        for test_name, test_runs in split_test(config_test_name, config_test_runs):
+            logging.debug('Processing test %s', test_name)
+            test_runs = dict(test_runs)
+            test_parameters = test_runs.pop('parameters', {})
+            logging.debug('Test specific parameters: %s', test_parameters)
+            sweep = test_runs.pop(SWEEP_KEY, None)
+            if sweep is not None:
+                # Validate the sweep before the benchmark starts
+                sweep_dimensions(sweep)
+
+            test_config = {
+                'test_name': test_name,
+                'run_count': len(test_runs) + (count_runs(sweep) if sweep is not None else 0),
+                'runs': generate_runs(test_name, test_runs, sweep, test_parameters, global_parameters, repetitions),
             }
-            logging.debug('Complete run config: %s', run)
+            test_configs.append(test_config)
 
-            test_config["runs"].append(run)
+    return test_configs
 
-        test_configs.append(test_config)
+def generate_runs(test_name: str, test_runs: dict, sweep, test_parameters: dict, global_parameters: dict, repetitions: int):
+    for run_name, run_config in test_runs.items():
+        yield build_run(test_name, run_name, run_config, test_parameters, global_parameters, repetitions)
+
+    if sweep is not None:
+        for run_name, run_config, sweep_parameters in expand_sweep(sweep):
+            yield build_run(test_name, run_name, run_config, {**test_parameters, **sweep_parameters}, global_parameters, repetitions)
+
+def build_run(test_name: str, run_name: str, run_config: dict, test_parameters: dict, global_parameters: dict, repetitions: int) -> Run:
+    logging.debug('Processing run "%s" with config: %s', run_name, run_config)
+    run_config_sender = run_config["sender"]
+    if not run_config_sender:
+        logging.info(f'{test_name}-{run_name}: Sender config is empty, using default sender config')
+        # The sender uses as many threads as the receiver
+        run_config_sender = {**DEFAULT_CONFIG_SENDER, 'parallel': {**global_parameters, **test_parameters, **run_config["receiver"]}.get("parallel", 1)}
+
+    # Add test parameters first
+    run_config_sender = {**test_parameters, **run_config_sender}
+    run_config_receiver = {**test_parameters, **run_config['receiver']}
+
+    # Add global parameters at last
+    run_config_sender = {**global_parameters, **run_config_sender}
+    run_config_receiver = {**global_parameters, **run_config_receiver}
+
+    run: Run = {
+        'run_name': run_name,
+        'repetitions': run_config.get('repetitions', repetitions),
+        'sender': run_config_sender,
+        'receiver': run_config_receiver
+    }
+    logging.debug('Complete run config: %s', run)
+    return run
+
+def parse_build_variants(json_file_path: str, base_build: dict):
+    # The optional "builds" entry of a config lists predefined variants by name or maps variant names to build options, e.g.
+    # "builds": ["release", "native", "lto", "pgo"] or "builds": {"release": {}, "pgo-recvmmsg": {"pgo": {"receiver": {...}, "sender": {...}}}}
+    with open(os.path.abspath(json_file_path), 'r') as json_file:
+        variants = json.load(json_file).get('builds')
+
+    if variants is None:
+        return {base_build['profile']: base_build}
+    if isinstance(variants, list):
+        unknown_variants = [name for name in variants if name not in BUILD_VARIANTS]
+        if unknown_variants:
+            logging.error(f'Unknown build variants {unknown_variants}, predefined are {list(BUILD_VARIANTS)}')
+            return None
+        variants = {name: BUILD_VARIANTS[name] for name in variants}
+
+    builds = {}
+    for name, spec in variants.items():
+        build = resolve_build_variant(base_build, spec)
+        if build is None:
+            logging.error(f'Invalid build variant {name}: {spec}')
+            return None
+        builds[name] = build
+    logging.debug('Build variants: %s', builds)
+    return builds
+
+def result_failed(result) -> bool:
+    # Run summaries are RunResults, dicts in the search modes
+    return result.failed if isinstance(result, RunResult) else bool(result.get('failed'))
 
-    return test_configs
 
 def load_json(json_str):
     try:
@@ -86,125 +229,48 @@ def load_json(json_str):
         return None
 
 
-def run_test_sender(run_config, test_name: str, file_name: str, results_folder: str, ssh_sender=None, repetition_id=1) -> bool:
-    logging.debug('Running sender test with config: %s', run_config)
-
-    # Build sender command
-    sender_command = [udperf_binary, 'sender', '--output-format=file', f'--output-file-path=\"{results_folder}sender-{file_name}\"', f'--label-test=\"{test_name}\"', f'--label-run=\"{run_config["run_name"]}\"', f'--repetition-id={repetition_id}']
-    
-    for k, v in run_config["sender"].items():
-        if v is not False:
-            if v is True:
-                sender_command.append(f'--{k}')
-            else:
-                sender_command.append(f'--{k}')
-                sender_command.append(f'{v}')
-    
-    command_str = ' '.join(sender_command)
-    logging.debug('Starting sender with command: %s', command_str)
-
-    env_vars = os.environ.copy()
-    env_vars['RUST_LOG'] = 'error'
-    # Ensure SSH_AUTH_SOCK is forwarded if available
-    if 'SSH_AUTH_SOCK' in os.environ:
-        env_vars['SSH_AUTH_SOCK'] = os.environ['SSH_AUTH_SOCK']
-
-    if ssh_sender:
-        # Modify the command to be executed over SSH
-        ssh_command = f"ssh -o LogLevel=quiet -o StrictHostKeyChecking=no {ssh_sender} '{command_str}'"
-        sender_process = subprocess.Popen(ssh_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env_vars)
-    else:
-        # Execute command locally
-        sender_process = subprocess.Popen(command_str, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env={'RUST_LOG': 'error'})
-
-    # Wait for the sender to finish
-    sender_output, sender_error = sender_process.communicate()
-    if sender_output:
-        logging.debug('Sender output: %s', sender_output.decode())
-    if sender_error:
-        logging.error('Sender error: %s', sender_error.decode())
-        # Only write to log file if SSH is not used
-        if ssh_sender is None:
-            log_file_name = file_name.replace('.csv', '.log')
-            log_file_path = f'{results_folder}sender-{log_file_name}'
-
-            with open(log_file_path, 'a') as log_file:
-                log_file.write("Test: " + test_name + " Run: " + run_config["run_name"] + '\n')
-                log_file.write("Config: " + str(run_config) + '\n')
-                log_file.write(sender_error.decode())
+def build_udperf_command(mode: str, run_config, test_name: str, file_name: str, results_folder: str, repetition_id=1, binary=None) -> list[str]:
+    command = [binary or PATH_TO_udperf_REPO + PATH_TO_udperf_BIN, mode, '--output-format=file', f'--output-file-path={results_folder}{mode}-{file_name}', f'--label-test={test_name}', f'--label-run={run_config["run_name"]}', f'--repetition-id={repetition_id}']
+    return command + udperf_arguments(run_config[mode])
+
+def udperf_process(mode: str, session: Session, run: dict, test_name: str, repetition_id=1, binary=None) -> RunProcess:
+    command = build_udperf_command(mode, run, test_name, session.csv_file_name, session.results_folder, repetition_id, binary)
+    if session.perf_stat:
+        command = perf_command(command, perf_output_path(session.results_folder, mode, session.csv_file_name))
+    logging.debug(f'{mode.capitalize()} command: %s', shlex.join(command))
+    if mode == 'sender':
+        return RunProcess('sender', command, session.ssh_sender, session.agent_sender, after_ready=True)
+    return RunProcess('receiver', command, session.ssh_receiver, session.agent_receiver)
+
+def sample_interval(run: dict) -> float:
+    return run["receiver"].get("interval") or run["sender"].get("interval") or SAMPLE_INTERVAL
+
+def sampler_processes(session: Session, run: dict, test_name: str, repetition_id=1) -> list[RunProcess]:
+    # One sampler per host, at the udperf interval of the run. Both are started with the receiver and stopped after the sender finished
+    if not session.samplers:
+        return []
+    interval = sample_interval(run)
+    # The receiver binds these ports and the sender sends to them
+    ports = sorted(expected_receiver_sockets(run["receiver"]))
+    processes = []
+    for role, host, agent in session.roles():
+        command = sampler_command(session.samplers, interval, session.results_folder, role, session.csv_file_name, test_name, str(run["run_name"]), repetition_id, ports, host)
+        processes.append(RunProcess(f'{role}-sampler', command, host, agent, background=True))
+    return processes
+
+def write_error_log(process: RunProcess, run: dict, test_name: str, file_name: str, results_folder: str):
+    # Only written if SSH is not used
+    if process.host is not None or not process.stderr_lines:
+        return
+    log_file_path = f'{results_folder}{process.name}-{file_name.replace(".csv", ".log")}'
+    with open(log_file_path, 'a') as log_file:
+        log_file.write("Test: " + test_name + " Run: " + run["run_name"] + '\n')
+        log_file.write("Config: " + str(run) + '\n')
+        log_file.write(''.join(process.stderr_lines))
 
-        return False
-
-    return True
-
-def run_test_receiver(run_config, test_name: str, file_name: str, results_folder: str, ssh_receiver=None, repetition_id=1) -> bool:
-    logging.debug('Running receiver test with config: %s', run_config)
-    # Replace with file name
-    receiver_command = [udperf_binary, 'receiver', '--output-format=file', f'--output-file-path=\"{results_folder}receiver-{file_name}\"', f'--label-test=\"{test_name}\"', f'--label-run=\"{run_config["run_name"]}\"', f'--repetition-id={repetition_id}']
-    
-    for k, v in run_config['receiver'].items():
-        if v is not False:
-            if v is True:
-                receiver_command.append(f'--{k}')
-            else:
-                receiver_command.append(f'--{k}')
-                receiver_command.append(f'{v}')
-    
-    command_str = ' '.join(receiver_command)
-    logging.debug('Starting receiver with command: %s', command_str)
-
-    env_vars = os.environ.copy()
-    env_vars['RUST_LOG'] = 'error'
-    # Ensure SSH_AUTH_SOCK is forwarded if available
-    if 'SSH_AUTH_SOCK' in os.environ:
-        env_vars['SSH_AUTH_SOCK'] = os.environ['SSH_AUTH_SOCK']
-
-    if ssh_receiver:
-        # Modify the command to be executed over SSH
-        ssh_command = f"ssh -o LogLevel=quiet -o StrictHostKeyChecking=no {ssh_receiver} '{command_str}'"
-        receiver_process = subprocess.Popen(ssh_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env_vars)
-    else:
-        # Execute command locally
-        receiver_process = subprocess.Popen(command_str, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env={'RUST_LOG': 'error'})
-
-    # Wait for the receiver to finish
-    try:
-        receiver_output, receiver_error = receiver_process.communicate(timeout=(run_config["sender"]["time"] + 10)) # Add 10 seconds as buffer to the sender time
-    except subprocess.TimeoutExpired:
-        logging.error('Receiver process timed out')
-        return False
-
-    # Check if the receiver finished 
-    receiver_did_not_finish = False
-    if receiver_process.poll() is None:
-        logging.error('Receiver did not finish, retrying test')
-        receiver_process.kill()
-        receiver_did_not_finish = True
-    
-    if receiver_output:
-        logging.debug('Receiver output: %s', receiver_output.decode())
-    if receiver_error:
-        logging.error('Receiver error: %s', receiver_error.decode())
-        # Only write to log file if SSH is not used
-        if ssh_receiver is None:
-            log_file_name = file_name.replace('.csv', '.log')
-            log_file_path = f'{results_folder}receiver-{log_file_name}'
-        
-            with open(log_file_path, 'a') as log_file:
-                log_file.write("Test: " + test_name + " Run: " + run_config["run_name"] + '\n')
-                log_file.write("Config: " + str(run_config) + '\n')
-                log_file.write(receiver_error.decode())
-        return False
-
-    if receiver_did_not_finish:
-        return False
-
-    logging.debug('Returning results: %s', receiver_output)
-    return True
- 
 def test_ssh_connection(ssh_address: str):
     try:
-        result = subprocess.run(['ssh', '-o LogLevel=quiet', '-o StrictHostKeyChecking=no', ssh_address, 'echo ok'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
+        result = POOL.run(ssh_address, 'echo ok', stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
         if result.stdout.decode().strip() == 'ok':
             logging.info(f"SSH connection to {ssh_address} successful.")
             return True
@@ -224,183 +290,766 @@ def get_file_name(file_name: str) -> str:
     formatted_datetime = dt_object.strftime("%m-%d-%H:%M")
     return f"{file_name}-{formatted_datetime}.csv"
 
-def kill_receiver_process(port: str, ssh_receiver=None):
-    logging.info(f'Killing receiver process on port {port}, if still running')
-    try:
-        if ssh_receiver is None:
-            # Use lsof and grep to find processes listening on UDP ports in the range 45000 to 45019
-            command = "lsof -iUDP | grep ':450[0-1][0-9]' | awk '{print $2}'"
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        else:
-            # Execute the command remotely if an SSH receiver is specified
-            command = "lsof -iUDP | grep ':450[0-1][0-9]' | awk '{print $2}'"
-            result = subprocess.run(['ssh', '-o LogLevel=quiet', '-o StrictHostKeyChecking=no', ssh_receiver, command], capture_output=True, text=True)
-  
-        if result.stdout.strip() != '':
-            logging.info(f'Found processes: {result.stdout.strip()}')
-        pids: list[str] = result.stdout.strip().split('\n')
-
-        for pid in pids:
-            if pid:
-                logging.warning(f'Killing process {pid} on port {port}')
-                if ssh_receiver is None:
-                    os.kill(int(pid), signal.SIGTERM)
-                else:
-                    subprocess.run(['ssh', '-o LogLevel=quiet', '-o StrictHostKeyChecking=no', ssh_receiver, f'kill -9 {pid}'], capture_output=True, text=True)
-    except Exception as e:
-        logging.error(f'Failed to kill process on port {port}: {e}')
+def reap_processes(host=None, agent=None):
+    # Stops the processes of previous runs which are still running on the host. Only processes started by the agent or the supervisor are touched
+    if agent:
+        # The agent knows every process it started, no need to search for them
+        try:
+            stopped = agent.stop_all()
+            if stopped:
+                logging.info(f'Agent stopped processes: {stopped}')
+        except AgentError as e:
+            logging.error(f'Agent failed to stop processes: {e}')
+        return
+
+    stopped = reap_host(host)
+    if stopped:
+        logging.warning(f'Stopped processes left behind on {host or "localhost"}: {stopped}')
+
+def reap_session_processes(session: Session):
+    for host, agent in {(session.ssh_receiver, session.agent_receiver), (session.ssh_sender, session.agent_sender)}:
+        reap_processes(host, agent)
+
+def read_session_counters(session: Session) -> dict:
+    # Drop counters of both hosts and the NIC statistics of the hosts with a known interface
+    counters = {}
+    for role, host, agent in session.roles():
+        interface = session.interfaces.get(role)
+        counters[role] = {'loss': read_loss_counters(host, interface, agent), 'nic': read_ethtool_stats(host, interface) if interface else None}
+    return counters
+
+def record_run_counters(session: Session, run: dict, test_label: str, repetition_id: int, before: dict, after: dict, start_timestamps=None):
+    # Counter deltas of a repetition on both hosts, one row in the counters file next to the run summaries.
+    # The per-queue NIC deltas are written to the queues file, one row per host and queue.
+    # The start times of receiver and sender let visualize/join_samples.py join the samples of sampler.py to the udperf intervals by time
+    labels = {'test_name': test_label, 'run_name': run['run_name'], 'repetition_id': repetition_id}
+    row = dict(labels)
+    if start_timestamps:
+        row.update({f'{role}_start_timestamp': round(timestamp, 3) for role, timestamp in start_timestamps.items()})
+        row['interval'] = sample_interval(run)
+    queue_rows = []
+    # The n-tuple rules steer every port of the receiver to its own queue, so a run only spreads over as many queues as it has ports
+    queues_in_use = min(len(expected_receiver_sockets(run['receiver'])), session.rss_queues)
+    for role in before:
+        if before[role]['loss'] is not None and after[role]['loss'] is not None:
+            row.update(counter_deltas(before[role]['loss'], after[role]['loss'], f'{role}_'))
+        if before[role]['nic'] is not None and after[role]['nic'] is not None:
+            # The receiver spreads the traffic over its RSS queues, the sender over its XPS queues
+            direction = 'rx' if role == 'receiver' else 'tx'
+            columns, queues = nic_deltas(before[role]['nic'], after[role]['nic'], direction, queues_in_use, f'{role}_')
+            row.update(columns)
+            queue_rows += [{**labels, 'role': role, **queue} for queue in queues if queue['queue'] < session.rss_queues or queue[f'{direction}_packets']]
+            max_mean = columns[f'{role}_{direction}_queue_max_mean']
+            if max_mean is not None and max_mean > QUEUE_IMBALANCE_WARNING:
+                logging.warning(f'Unbalanced {direction} queues on the {role}: queue {columns[f"{role}_{direction}_queue_busiest_queue"]} carried {max_mean}x the mean packets '
+                                f'of {queues_in_use} queues (Jain index {columns[f"{role}_{direction}_queue_jain_index"]})')
+    if session.perf_stat:
+        # Per datagram the receiver received or the sender sent, as counted by the UDP counters of the host
+        for role, host, agent in session.roles():
+            text = read_result_file(perf_output_path(session.results_folder, role, session.csv_file_name), host, agent)
+            packets = row.get('receiver_udp_in_datagrams' if role == 'receiver' else 'sender_udp_out_datagrams')
+            row.update(perf_metrics(parse_perf_stat(text), packets, f'{role}_'))
+    session.run_counters[(test_label, str(run['run_name']), repetition_id)] = row
+    append_run_record(f'{session.summary_folder}{COUNTERS_PREFIX}{session.csv_file_name}', row)
+    for queue_row in queue_rows:
+        append_run_record(f'{session.summary_folder}{QUEUES_PREFIX}{session.csv_file_name}', queue_row)
+    if 'receiver_udp_rcvbuf_errors' in row:
+        logging.info(f'Drops on the receiver: socket buffer {row["receiver_udp_rcvbuf_errors"]}, backlog {row["receiver_softnet_dropped"]}, NIC {row["receiver_nic_rx_dropped"]}')
+
+def perf_means(session: Session, test_label: str, run_name, repetitions: int) -> dict:
+    # Means of the perf stat columns over the measured repetitions of a run
+    rows = [session.run_counters[key] for key in ((test_label, str(run_name), repetition_id) for repetition_id in range(1, repetitions + 1)) if key in session.run_counters]
+    columns = {column for row in rows for column in row if column.startswith(('receiver_', 'sender_')) and column.split('_', 1)[1] in PERF_COLUMNS}
+    means = {}
+    for column in sorted(columns):
+        values = [row[column] for row in rows if row.get(column) is not None]
+        means[column] = round(sum(values) / len(values), 3)
+    return means
+
+def run_repetition(session: Session, run: dict, test_label: str, repetition_id: int, binary=None) -> bool:
+    # Runs one repetition of a run with retries. session holds the hosts, agents and result paths of the benchmark
+    run_timeout = run["sender"]["time"] + RUN_TIMEOUT_BUFFER
+    unit = {'campaign': session.campaign, 'config_file': session.config_file, 'test_name': test_label, 'run_name': run['run_name'], 'repetition_id': repetition_id}
+    # Release the sender as soon as all receiver sockets are bound
+    expected_sockets = expected_receiver_sockets(run["receiver"])
+    start_timestamps = {}
+    async def receiver_ready(abort):
+        ready = await asyncio.to_thread(wait_for_sockets, session.ssh_receiver, expected_sockets, abort=abort, agent=session.agent_receiver)
+        start_timestamps['sender'] = time.time()
+        return ready
+
+    for attempt in range(0,MAX_FAILED_ATTEMPTS): # Retries, in case of an error
+        record(session.journal, 'started', **unit, attempt=attempt + 1)
+        reap_session_processes(session)
+        logging.debug('Wait until system under test has normalized...')
+        settle_time = wait_until_settled(session.settle_hosts, session.settle_thresholds)
+        logging.info(f'Settle time before run {run["run_name"]} repetition {repetition_id}: {settle_time:.2f}s')
+        logging.info('Starting test run %s', run['run_name'])
+        processes = [udperf_process(mode, session, run, test_label, repetition_id, binary) for mode in ('receiver', 'sender')]
+        processes += sampler_processes(session, run, test_label, repetition_id)
+        counters_before = read_session_counters(session)
+        start = time.monotonic()
+        start_timestamps['receiver'] = time.time()
+        if execute_run(processes, run_timeout, receiver_ready):
+            logging.info(f'Test run "{run["run_name"]}" finished successfully')
+            record_run_counters(session, run, test_label, repetition_id, counters_before, read_session_counters(session), start_timestamps)
+            record(session.journal, 'done', **unit, attempt=attempt + 1)
+            return True
 
-def main():
-    logging.debug('Starting main function')
+        logging.error(f'Test run {run["run_name"]} failed after {time.monotonic() - start:.2f}s (test: {test_label}; config {session.config_file}), retrying')
+        for process in processes:
+            write_error_log(process, run, test_label, session.csv_file_name, session.results_folder)
+        reap_session_processes(session)
+        record(session.journal, 'failed', **unit, attempt=attempt + 1)
+
+    logging.error(f'Maximum number of failed attempts reached for test run {run["run_name"]} (test: {test_label})')
+    return False
+
+def measure_repetition(session: Session, run: dict, test_label: str, repetition_id: int, columns=('data_rate_gbit',)):
+    # Reads the values of a finished repetition from the receiver result file, None if a value is missing
+    text = session.result_text('receiver', test_label, run['run_name'], repetition_id)
+    values = {column: repetition_value(text, test_label, run['run_name'], repetition_id, column) for column in columns}
+    return None if None in values.values() else values
+
+def memoized_entries(index: dict, key: str, run: dict, options):
+    # Returns the index entries of previous repetitions which can replace the run, or None if it has to be measured
+    entries = index.get(key, [])
+    if options.force or not entries:
+        return None
+    if options.adaptive:
+        entries = entries[-options.max_repetitions:]
+        if len(entries) >= options.min_repetitions and relative_half_width([entry['data_rate_gbit'] for entry in entries]) <= options.ci_target:
+            return entries
+        return None
+    return entries[-run["repetitions"]:] if len(entries) >= run["repetitions"] else None
+
+def index_repetition(session: Session, run: dict, test_label: str, repetition_id: int, key: str, index_file: str, data_rate: float) -> bool:
+    # Adds a measured repetition to the results index, with a local copy of its rows of both hosts
+    entry = {'hash': key, 'test_name': test_label, 'run_name': run['run_name'], 'repetition_id': repetition_id}
+    for role, _, _ in session.roles():
+        fieldnames, rows = repetition_rows(session.result_text(role, test_label, run['run_name'], repetition_id), test_label, run['run_name'], repetition_id)
+        entry[f'{role}_file'] = rows_path(index_file, key, role)
+        if not rows or not store_rows(entry[f'{role}_file'], fieldnames, rows):
+            logging.warning(f'Repetition {repetition_id} of {test_label}/{run["run_name"]} is not added to the results index, its {role} rows could not be stored')
+            return False
+    append_index_entry(index_file, {**entry, 'data_rate_gbit': data_rate})
+    return True
+
+def reuse_repetitions(session: Session, run: dict, test_label: str, entries: list[dict]):
+    # Copies the rows of memoized repetitions into the current result files. Returns their data rates, or None on failure
+    missing = [entry[f'{mode}_file'] for entry in entries for mode in ('receiver', 'sender') if not os.path.exists(entry[f'{mode}_file'])]
+    if missing:
+        logging.warning(f'Rows of {test_label}/{run["run_name"]} in the results index are missing ({", ".join(missing)}), measuring the run again')
+        return None
 
+    data_rates = []
+    for repetition_id, entry in enumerate(entries, start=1):
+        labels = {'test_name': test_label, 'run_name': run['run_name'], 'repetition_id': repetition_id}
+        for mode, host in (('receiver', session.ssh_receiver), ('sender', session.ssh_sender)):
+            target = f'{session.results_folder}{mode}-{session.csv_file_name}'
+            if not copy_result_rows(entry[f'{mode}_file'], target, entry['test_name'], entry['run_name'], entry['repetition_id'], labels, host):
+                logging.warning(f'Failed to reuse the repetitions of {test_label}/{run["run_name"]} from the results index, measuring the run again')
+                return None
+        data_rates.append(entry['data_rate_gbit'])
+    return data_rates
+
+def search_lossless_rate(session: Session, run: dict, test_label: str, binary, options) -> dict:
+    # Binary search on the bandwidth of the sender for the highest rate with a packet loss below the threshold
+    high = options.search_max_bandwidth or run["sender"].get("bandwidth") or DEFAULT_CONFIG_SENDER["bandwidth"]
+    repetition_ids = iter(range(1, options.search_max_steps + 1))
+    failed_steps = []
+
+    def measure(bandwidth):
+        probe_run = {**run, 'run_name': f'{run["run_name"]} bandwidth {bandwidth}', 'sender': {**run["sender"], 'bandwidth': bandwidth}}
+        repetition_id = next(repetition_ids)
+        values = measure_repetition(session, probe_run, test_label, repetition_id, ('packet_loss', 'data_rate_gbit')) if run_repetition(session, probe_run, test_label, repetition_id, binary) else None
+        if values is None:
+            failed_steps.append(bandwidth)
+        return values
+
+    rate, curve = find_max_lossless_rate(measure, options.search_min_bandwidth, high, options.loss_threshold, options.search_precision, options.search_max_steps)
+    logging.info(f'Maximum lossless bandwidth of {test_label}/{run["run_name"]}: {rate} (loss threshold {options.loss_threshold}%)')
+
+    # The loss curve is written next to the results, one row per measured bandwidth
+    for point in curve:
+        append_run_record(f'{session.summary_folder}search-{session.csv_file_name}', {'test_name': test_label, 'run_name': run['run_name'], 'bandwidth': point['rate'], 'packet_loss': point['packet_loss'], 'data_rate_gbit': point['data_rate_gbit'], 'lossless': point['lossless']})
+    lossless_points = [point for point in curve if point['rate'] == rate]
+    # A search stopped by a failed measurement is incomplete, it is searched again on resume
+    return {'max_lossless_bandwidth': rate, 'data_rate_gbit_mean': lossless_points[0]['data_rate_gbit'] if lossless_points else None, 'search_steps': len(curve), 'failed': bool(failed_steps)}
+
+def set_run_parameter(run: dict, parameter: str, value) -> dict:
+    # Sets the parameter on the sides which configure it, on both sides otherwise
+    sides = [side for side in ('receiver', 'sender') if parameter in run[side]] or ['receiver', 'sender']
+    return {**run, 'run_name': str(value), **{side: {**run[side], parameter: value} for side in sides}}
+
+def search_knee(session: Session, runs: list, test_label: str, binary, options) -> dict:
+    # Adaptive sampling of a scaling parameter. Without --knee-values, the values of the runs of the test are the candidates
+    if options.knee_values:
+        candidates = expand_cli_values(options.knee_values)
+    else:
+        candidates = [run['receiver'].get(options.knee_parameter, run['sender'].get(options.knee_parameter)) for run in runs]
+        candidates = [value for value in candidates if value is not None]
+    if not candidates:
+        logging.error(f'No values of {options.knee_parameter} found in test {test_label}, use --knee-values')
+        return {'failed': True}
+
+    def measure(value):
+        run = set_run_parameter(runs[0], options.knee_parameter, value)
+        data_rates = []
+        for repetition_id in range(1, run["repetitions"] + 1):
+            if run_repetition(session, run, test_label, repetition_id, binary):
+                values = measure_repetition(session, run, test_label, repetition_id)
+                if values is not None:
+                    data_rates.append(values['data_rate_gbit'])
+        return sum(data_rates) / len(data_rates) if data_rates else None
+
+    result = find_knee(measure, candidates, options.knee_budget)
+    logging.info(f'Scaling of {test_label} over {options.knee_parameter}: knee {result["knee"]}, peak efficiency {result["peak_efficiency"]}, peak {result["peak"]}')
+    for value, data_rate in result['points']:
+        append_run_record(f'{session.summary_folder}search-{session.csv_file_name}', {'test_name': test_label, 'run_name': str(value), options.knee_parameter: value, 'data_rate_gbit': data_rate})
+    return {'knee_parameter': options.knee_parameter, 'knee': result['knee'], 'peak_efficiency': result['peak_efficiency'], 'peak': result['peak'], 'search_steps': len(result['points']), 'failed': not result['points']}
+
+def print_plan(units: list[tuple], builds: dict, ssh_receiver, csv_file_name: str, results_folder: str, previous_runs: list[str]):
+    # Dry run: command lines, parameter validation and estimated duration of the planned runs.
+    # The binaries are not built in a dry run, so the parameters are only validated if the first one already exists
+    binary = next(iter(builds.values()))
+    flags = udperf_flags(binary, ssh_receiver)
+    overhead = measured_overhead(previous_runs)
+    invalid_runs = 0
+    total = 0.0
+
+    for index, (test_name, run) in enumerate(units):
+        duration = estimate_run(run, len(builds), overhead if overhead is not None else REPETITION_OVERHEAD)
+        total += duration
+        print(f'[{index + 1}/{len(units)}] {test_name} / {run["run_name"]}: {run["repetitions"]} repetitions x {len(builds)} builds, ~{format_duration(duration)}')
+        for mode in ('receiver', 'sender'):
+            print(f'    {shlex.join(build_udperf_command(mode, run, test_name, csv_file_name, results_folder, binary=binary))}')
+        invalid_parameters = validate_run(run, flags) if flags is not None else []
+        if invalid_parameters:
+            invalid_runs += 1
+            print(f'    INVALID: not a flag of udperf: {", ".join(invalid_parameters)}')
+
+    print(f'{len(units)} runs, {count_reconfigurations(units)} host reconfigurations, estimated duration {format_duration(total)} '
+          f'({"measured" if overhead is not None else "default"} overhead of {overhead if overhead is not None else REPETITION_OVERHEAD:.1f}s per repetition)')
+    if flags is None:
+        print('Parameters not validated, the help of udperf could not be read')
+    elif invalid_runs:
+        print(f'{invalid_runs} runs with invalid parameters')
+
+@dataclass
+class BenchmarkOptions:
+    # Options of a benchmark, the fields match the command line options of benchmark.py
+    udperf_bin: str = PATH_TO_udperf_REPO + PATH_TO_udperf_BIN
+    udperf_repo: str = PATH_TO_udperf_REPO
+    results_folder: str = PATH_TO_RESULTS_FOLDER
+    summary_folder: Optional[str] = None
+    ssh_sender: Optional[str] = None
+    ssh_receiver: Optional[str] = None
+    agent: bool = False
+    agent_port: int = AGENT_PORT
+    udperf_revisions: list[str] = field(default_factory=lambda: [udperf_REPO_BRANCH])
+    cargo_profile: str = DEFAULT_BUILD['profile']
+    cargo_features: list[str] = field(default_factory=lambda: list(DEFAULT_BUILD['features']))
+    receiver_interface: Optional[str] = None
+    sender_interface: Optional[str] = None
+    settle_max_wait: float = DEFAULT_THRESHOLDS['max_wait']
+    settle_max_cpu: float = DEFAULT_THRESHOLDS['cpu_percent']
+    settle_max_softirqs: float = DEFAULT_THRESHOLDS['softirq_rate']
+    settle_max_packets: float = DEFAULT_THRESHOLDS['packet_rate']
+    search: Optional[str] = None
+    loss_threshold: float = LOSS_THRESHOLD
+    search_min_bandwidth: int = 0
+    search_max_bandwidth: Optional[int] = None
+    search_precision: float = SEARCH_PRECISION
+    search_max_steps: int = SEARCH_MAX_STEPS
+    knee_parameter: str = 'parallel'
+    knee_values: Optional[list[str]] = None
+    knee_budget: int = KNEE_BUDGET
+    reorder: bool = False
+    shuffle: bool = False
+    seed: Optional[int] = None
+    resume: bool = False
+    campaign: Optional[str] = None
+    only_run: Optional[list[list[str]]] = None
+    pair: Optional[str] = None
+    sync_folder: str = SYNC_FOLDER
+    no_sync: bool = False
+    dry_run: bool = False
+    adaptive: bool = False
+    ci_target: float = CI_TARGET
+    min_repetitions: int = MIN_REPETITIONS
+    max_repetitions: int = MAX_REPETITIONS
+    force: bool = False
+    samplers: list[str] = field(default_factory=lambda: list(DEFAULT_SAMPLERS))
+    rss_queues: int = RSS_QUEUES
+    perf_stat: bool = False
+
+    @property
+    def settle_thresholds(self) -> dict:
+        return {'max_wait': self.settle_max_wait, 'cpu_percent': self.settle_max_cpu, 'softirq_rate': self.settle_max_softirqs, 'packet_rate': self.settle_max_packets}
+
+
+class Benchmark:
+    # Runs benchmark configs on one receiver/sender pair. The SSH connections, agents, host fingerprints and udperf binaries
+    # are set up once and shared by all configs, so a campaign pays the setup only once
+    def __init__(self, options: BenchmarkOptions):
+        self.options = options
+        self.agent_sender = None
+        self.agent_receiver = None
+        self.fingerprints = None
+        self.binaries = {} # (revision, build options) -> binary
+        self.checksums = {} # binary -> SHA-256
+        self.local_binary_compiled = False
+
+    def connect(self) -> bool:
+        options = self.options
+        if (options.ssh_sender is None) != (options.ssh_receiver is None):
+            logging.error('SSH connection to sender AND receiver must be provided.')
+            return False
+        for role, host in (('sender', options.ssh_sender), ('receiver', options.ssh_receiver)):
+            if host is not None and not test_ssh_connection(host):
+                logging.error(f'SSH connection to {role} failed.')
+                return False
+        if options.ssh_sender is not None and options.ssh_sender == options.ssh_receiver:
+            logging.info('Since ssh_sender and ssh_receiver are the same, assuming remote LOCALHOST.')
+
+        if options.agent and not options.dry_run:
+            self.agent_sender = AgentClient(options.ssh_sender, options.agent_port)
+            # Sender and receiver processes have different names, so a single agent can run both
+            self.agent_receiver = self.agent_sender if options.ssh_sender == options.ssh_receiver else AgentClient(options.ssh_receiver, options.agent_port)
+            for agent in {self.agent_sender, self.agent_receiver}:
+                if not agent.connect():
+                    logging.error(f'Connection to agent on {agent.host or "localhost"} failed.')
+                    return False
+
+        self.refresh_fingerprints()
+        return True
+
+    def refresh_fingerprints(self):
+        # The fingerprints contain the MTU, so they are read again after the hosts were reconfigured
+        options = self.options
+        fingerprints = [host_fingerprint(options.ssh_receiver, options.receiver_interface), host_fingerprint(options.ssh_sender, options.sender_interface)]
+        self.fingerprints = fingerprints if None not in fingerprints else None
+
+    def close(self):
+        for agent in {self.agent_sender, self.agent_receiver} - {None}:
+            agent.close()
+        POOL.log_stats()
+
+    def provide_builds(self, config_file: str, hosts=None):
+        # Maps the label of every benchmarked revision and build variant of the config to its binary, None on failure.
+        # Locally, the working tree of the repository is benchmarked. By default, the binaries are provided on receiver and sender.
+        # A dry run only computes the paths the binaries will have, nothing is built or shipped
+        options = self.options
+        base_build = {**DEFAULT_BUILD, 'profile': options.cargo_profile, 'features': options.cargo_features}
+        build_variants = parse_build_variants(config_file, base_build)
+        if build_variants is None:
+            return None
+
+        builds = {}
+        if options.ssh_receiver is None:
+            if options.dry_run:
+                return {'local': options.udperf_bin} if list(build_variants.values()) == [DEFAULT_BUILD] else {variant: local_binary_path(build) for variant, build in build_variants.items()}
+            if list(build_variants.values()) == [DEFAULT_BUILD]:
+                if not self.local_binary_compiled:
+                    logging.info('Compiling binary in release mode. Assuming it is part of udperf repository.')
+                    subprocess.run(['cargo', 'build', '--release'], check=True, cwd=options.udperf_repo)
+                    self.local_binary_compiled = True
+                builds['local'] = options.udperf_bin
+                return builds
+            for variant, build in build_variants.items():
+                key = ('worktree', json.dumps(build, sort_keys=True))
+                if key not in self.binaries:
+                    self.binaries[key] = build_local_binary(options.udperf_repo, build)
+                if self.binaries[key] is None:
+                    logging.error(f'Failed to build the build variant {variant} of udperf.')
+                    return None
+                logging.info(f'Using udperf Binary for build variant {variant}: {self.binaries[key]}')
+                builds[variant] = self.binaries[key]
+            return builds
+
+        # Build once per commit and build options, the binary is reused from the cache on all hosts afterwards
+        for revision in options.udperf_revisions:
+            for variant, build in build_variants.items():
+                key = (revision, json.dumps(build, sort_keys=True))
+                if options.dry_run:
+                    binary = self.binaries.get(key) or planned_binary(hosts or [options.ssh_receiver, options.ssh_sender], udperf_REPO, revision, build)
+                else:
+                    if self.binaries.get(key) is None:
+                        self.binaries[key] = ensure_binary(hosts or [options.ssh_receiver, options.ssh_sender], options.udperf_repo, udperf_REPO, revision, build)
+                    binary = self.binaries[key]
+                if binary is None:
+                    logging.error(f'Failed to provide the udperf binary for revision {revision} and build variant {variant} on all hosts.')
+                    return None
+                # Only the compared dimensions are part of the label
+                labels = ([revision] if len(options.udperf_revisions) > 1 else []) + ([variant] if len(build_variants) > 1 else [])
+                label = VARIANT_SEPARATOR.join(labels) or revision
+                logging.info(f'Using {"planned" if options.dry_run else "cached"} udperf Binary for {label}: {binary}')
+                builds[label] = binary
+        return builds
+
+    def binary_checksums(self, builds: dict):
+        # Checksums of the binaries of the builds, None if one cannot be read
+        for binary in builds.values():
+            if self.checksums.get(binary) is None:
+                self.checksums[binary] = file_checksum(self.options.ssh_receiver, binary)
+        checksums = {label: self.checksums[binary] for label, binary in builds.items()}
+        return checksums if None not in checksums.values() else None
+
+    def plan(self, config_file: str, only_runs=None):
+        # Returns the runs per test and the ordered (test name, run) units of the config, None if the config is invalid
+        try:
+            test_configs = parse_config_file(config_file)
+        except ValueError as e:
+            logging.error(f'Invalid sweep in config {config_file}: {e}')
+            return None
+        logging.info('Read %d test configs with %d runs', len(test_configs), sum(config['run_count'] for config in test_configs))
+
+        # All runs are expanded up front, so they can be ordered and planned
+        test_runs = [(config["test_name"], list(config["runs"])) for config in test_configs]
+        if only_runs:
+            # The scheduler dispatches single runs of a config to a host pair
+            selected = {tuple(selection) for selection in only_runs}
+            test_runs = [(test_name, [run for run in runs if (test_name, str(run['run_name'])) in selected]) for test_name, runs in test_runs]
+            test_runs = [(test_name, runs) for test_name, runs in test_runs if runs]
+        units = [(test_name, run) for test_name, runs in test_runs for run in runs]
+        if self.options.reorder or self.options.shuffle:
+            reconfigurations = count_reconfigurations(units)
+            units = order_runs(units, self.options.shuffle, self.options.seed)
+            logging.info(f'Reordered runs, host reconfigurations between runs: {reconfigurations} -> {count_reconfigurations(units)}')
+        return test_runs, units
+
+    def run_config(self, config_file: str, csv_file_name=None, only_runs=None):
+        # Runs all tests of a config. Returns the run summaries (RunResult, dicts in the search modes), None if the config could not be run
+        options = self.options
+        results_folder = options.results_folder
+        summary_folder = options.summary_folder or results_folder
+        csv_file_name = csv_file_name or get_file_name(os.path.splitext(os.path.basename(config_file))[0])
+
+        # Every repetition is recorded in the journal. A resumed campaign writes to the result files of the interrupted one,
+        # so the repetitions already on the hosts are reused. With only some of the runs, the config is not a unit of the journal
+        partial = bool(only_runs or options.only_run)
+        journal_file = journal_path(summary_folder)
+        campaign = resolve_campaign(journal_file, options.campaign, options.resume, config_file=config_file)
+        journal_events = load_events(journal_file) if options.resume else []
+        completed = completed_units(journal_events, campaign)
+        config_unit = {'campaign': campaign, 'config_file': config_file}
+        if options.resume:
+            if unit_key(config_unit) in completed:
+                logging.info(f'Config {config_file} is already completed in campaign {campaign}, nothing to resume')
+                return []
+            resumed_csv_file_names = [event['csv_file_name'] for event in journal_events if event.get('campaign') == campaign and event.get('config_file') == config_file and 'csv_file_name' in event]
+            if resumed_csv_file_names:
+                csv_file_name = resumed_csv_file_names[-1]
+                logging.info(f'Resuming campaign {campaign} of config {config_file}, {len(completed)} units already completed')
+
+        logging.info('Using udperf Repository: %s', options.udperf_repo)
+        logging.info('Reading config file: %s', config_file)
+        logging.info('Results file name: %s', csv_file_name)
+        logging.info('Results folder: %s', results_folder)
+        logging.info('Summary folder: %s', summary_folder)
+
+        planned = self.plan(config_file, only_runs or options.only_run)
+        builds = self.provide_builds(config_file)
+        if planned is None or builds is None:
+            return None
+        test_runs, units = planned
+        if options.dry_run:
+            print_plan(units, builds, options.ssh_receiver, csv_file_name, results_folder, previous_runs_files(summary_folder, config_file))
+            return []
+        if options.ssh_receiver is None:
+            # Create directory for test results
+            os.makedirs(results_folder, exist_ok=True)
+
+        runs_file = f'{summary_folder}runs-{csv_file_name}'
+        os.makedirs(summary_folder, exist_ok=True)
+        if not partial:
+            record(journal_file, 'started', **config_unit, csv_file_name=csv_file_name)
+
+        settle_hosts = [(options.ssh_receiver, options.receiver_interface, self.agent_receiver)]
+        if options.ssh_sender != options.ssh_receiver:
+            settle_hosts.append((options.ssh_sender, options.sender_interface, self.agent_sender))
+        session = Session(config_file, csv_file_name, results_folder, summary_folder, options.ssh_sender, options.ssh_receiver, self.agent_sender, self.agent_receiver,
+                          settle_hosts, options.settle_thresholds, journal_file, campaign, options.samplers,
+                          {'receiver': options.receiver_interface, 'sender': options.sender_interface}, options.rss_queues, options.perf_stat)
+
+        if options.search == 'knee':
+            results = self.run_knee_searches(session, test_runs, builds, runs_file, completed, config_unit)
+        else:
+            results = self.run_units(session, units, builds, runs_file, completed, config_unit)
+
+        # The config is only completed if all its runs are, so --resume measures the failed runs again
+        if not partial:
+            record(journal_file, 'failed' if any(result_failed(result) for result in results) else 'done', **config_unit)
+        logging.info(f"Results stored in: {results_folder}receiver-{csv_file_name}")
+        logging.info(f"Results stored in: {results_folder}sender-{csv_file_name}")
+        logging.info(f"Summary per run stored in: {runs_file}")
+        logging.info(f"Drop counters and queue balance per repetition stored in: {summary_folder}{COUNTERS_PREFIX}{csv_file_name}")
+        return results
+
+    def run_knee_searches(self, session: Session, test_runs: list[tuple], builds: dict, runs_file: str, completed: set, config_unit: dict) -> list[dict]:
+        results = []
+        pair = {'pair': self.options.pair} if self.options.pair else {}
+        for index, (test_name, runs) in enumerate(test_runs):
+            logging.info(f'Searching knee of test {test_name} ({index + 1}/{len(test_runs)}) from config {session.config_file}')
+            # The runs of the test only provide the base configuration and the candidate values
+            configure_pacing(runs[0], session.ssh_sender)
+            for label, binary in builds.items():
+                test_label = f'{test_name}{REVISION_SEPARATOR}{label}' if len(builds) > 1 else test_name
+                test_unit = {**config_unit, 'test_name': test_label}
+                if unit_key(test_unit) in completed:
+                    logging.info(f'Knee of test {test_label} already searched, skipping')
+                    continue
+                result = {'test_name': test_label, 'build': label, **pair, **search_knee(session, runs, test_label, binary, self.options)}
+                append_run_record(runs_file, result)
+                record(session.journal, 'failed' if result['failed'] else 'done', **test_unit)
+                results.append(result)
+        return results
+
+    def run_units(self, session: Session, units: list[tuple], builds: dict, runs_file: str, completed: set, config_unit: dict) -> list:
+        options = self.options
+        results = []
+        pair = {'pair': options.pair} if options.pair else {}
+
+        # Runs already measured with the same config, binaries and hosts are taken from the results index instead of measuring them again
+        results_index_file = index_path(session.summary_folder)
+        results_index = load_index(results_index_file)
+        binary_checksums = self.binary_checksums(builds)
+        memoize = self.fingerprints is not None and binary_checksums is not None
+        if not memoize:
+            logging.warning('Failed to identify the hosts or binaries, all runs are measured and not added to the results index')
+
+        # The results of the previous run are copied to the orchestrator in the background while the next run is configured.
+        # The copy loads the hosts and the network, so it has to finish before the hosts settle for the next measurement
+        sync_executor = ThreadPoolExecutor(max_workers=1)
+        sync_future = None
+        targets = sync_targets(session.ssh_receiver, session.ssh_sender, options.sync_folder) if session.ssh_receiver is not None and not options.no_sync else []
+
+        previous_test_name = None
+        for index, (test_name, run) in enumerate(units):
+            if test_name != previous_test_name:
+                logging.info('-------------------')
+                logging.info(f'Running test {test_name} from config {session.config_file}')
+                logging.info('-------------------')
+                previous_test_name = test_name
+
+            logging.info(f'Run {run["run_name"]} ({index + 1}/{len(units)}) config: {run}')
+
+            test_labels = {label: f'{test_name}{REVISION_SEPARATOR}{label}' if len(builds) > 1 else test_name for label in builds}
+            run_units = {label: {**config_unit, 'test_name': test_labels[label], 'run_name': run['run_name']} for label in builds}
+            if all(unit_key(run_unit) in completed for run_unit in run_units.values()):
+                logging.info(f'Run {run["run_name"]} already completed, skipping')
+                continue
+
+            if targets:
+                sync_future = sync_executor.submit(sync_results, targets, session.results_folder)
+
+            configure_pacing(run, session.ssh_sender, force=options.search == 'lossless')
+            if sync_future is not None:
+                try:
+                    sync_future.result()
+                except Exception as e:
+                    logging.error(f'Failed to synchronize the results: {e}')
+
+            if options.search == 'lossless':
+                for label, binary in builds.items():
+                    if unit_key(run_units[label]) in completed:
+                        continue
+                    result = {'test_name': test_labels[label], 'run_name': run['run_name'], 'build': label, **pair, **search_lossless_rate(session, run, test_labels[label], binary, options), 'loss_threshold': options.loss_threshold}
+                    append_run_record(runs_file, result)
+                    record(session.journal, 'failed' if result['failed'] else 'done', **run_units[label])
+                    results.append(result)
+                continue
+
+            # In adaptive mode, the number of repetitions depends on the confidence interval of the measured data rates
+            max_repetitions = options.max_repetitions if options.adaptive else run["repetitions"]
+            data_rates = {label: [] for label in builds}
+            durations = {label: 0.0 for label in builds}
+            measured_repetitions = {label: 0 for label in builds}
+            failed_builds = set()
+            run_keys = {label: run_hash(run, binary_checksums[label], self.fingerprints) for label in builds} if memoize else {}
+            memoized_builds = set()
+
+            # Builds which failed too often, reached the confidence target or were measured before are not run again for the following repetitions
+            active_builds = {label: binary for label, binary in builds.items() if unit_key(run_units[label]) not in completed}
+            for label, key in run_keys.items():
+                if label not in active_builds:
+                    continue
+                entries = memoized_entries(results_index, key, run, options)
+                reused_data_rates = reuse_repetitions(session, run, test_labels[label], entries) if entries else None
+                if reused_data_rates is not None:
+                    logging.info(f'Reusing {len(entries)} repetitions of {test_labels[label]}/{run["run_name"]} from the results index')
+                    data_rates[label] = reused_data_rates
+                    memoized_builds.add(label)
+                    del active_builds[label]
+
+            for i in range(max_repetitions):
+                if not active_builds:
+                    break
+                logging.info('Run repetition: %i/%i', i+1, max_repetitions)
+                # Interleave the builds per repetition, so they are measured under the same host conditions
+                for label, binary in list(active_builds.items()):
+                    if len(builds) > 1:
+                        logging.info(f'Running build {label}')
+                    resumed = unit_key({**run_units[label], 'repetition_id': i+1}) in completed
+                    if resumed:
+                        logging.info(f'Repetition {i+1} of {test_labels[label]}/{run["run_name"]} already completed, reading its results')
+                    else:
+                        start = time.monotonic()
+                        success = run_repetition(session, run, test_labels[label], i+1, binary)
+                        durations[label] += time.monotonic() - start
+                        measured_repetitions[label] += 1
+                        if not success:
+                            logging.error(f'Dont execute next repetition of build {label}.')
+                            failed_builds.add(label)
+                            del active_builds[label]
+                            continue
+
+                    values = measure_repetition(session, run, test_labels[label], i+1)
+                    if values is not None:
+                        data_rates[label].append(values['data_rate_gbit'])
+                        if memoize and not resumed:
+                            index_repetition(session, run, test_labels[label], i+1, run_keys[label], results_index_file, values['data_rate_gbit'])
+                    if options.adaptive and len(data_rates[label]) >= options.min_repetitions:
+                        ci_width = relative_half_width(data_rates[label])
+                        logging.info(f'Confidence interval of {test_labels[label]}/{run["run_name"]} after {i+1} repetitions: +-{ci_width * 100:.2f}%')
+                        if ci_width <= options.ci_target:
+                            del active_builds[label]
+
+            for label in builds:
+                if unit_key(run_units[label]) in completed:
+                    continue
+                # Runs without a measured repetition failed as well, e.g. if no data rate could be read
+                result = RunResult(test_name=test_labels[label], run_name=run['run_name'], build=label, pair=options.pair, repetitions=len(data_rates[label]), failed=label in failed_builds or not data_rates[label],
+                                   memoized=label in memoized_builds, time=run["sender"]["time"], duration_seconds=round(durations[label], 2),
+                                   measured_repetitions=measured_repetitions[label])
+                if data_rates[label]:
+                    mean, half_width = confidence_interval(data_rates[label])
+                    result.data_rate_gbit_mean, result.data_rate_gbit_ci95 = mean, half_width
+                    result.data_rate_gbit_ci95_relative = half_width / mean if mean else None
+                if options.perf_stat:
+                    result.perf = perf_means(session, test_labels[label], run['run_name'], max_repetitions)
+                if options.adaptive:
+                    result.ci_target_reached = result.data_rate_gbit_ci95_relative is not None and result.data_rate_gbit_ci95_relative <= options.ci_target
+                append_run_record(runs_file, result.summary())
+                record(session.journal, 'failed' if result.failed else 'done', **run_units[label])
+                results.append(result)
+
+        sync_executor.shutdown()
+        if targets:
+            sync_results(targets, session.results_folder)
+            logging.info(f"Results synchronized to: {options.sync_folder}")
+        return results
+
+
+def argument_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description='Benchmark udperf.')
     parser.add_argument('config_file', nargs='?', help='Path to the JSON configuration file')
     parser.add_argument('results_file', nargs='?', default='test_results.csv', help='Path to the CSV file to write the results')
     parser.add_argument('--results-folder', default=PATH_TO_RESULTS_FOLDER, help='Path to results folder')
+    parser.add_argument('--summary-folder', default=None, help='Local folder of the run summaries, drop counters, queue balance, search points, journal and results index. Defaults to the results folder')
     parser.add_argument('--udperf-bin', default=PATH_TO_udperf_REPO + PATH_TO_udperf_BIN, help='Path to the udperf binary')
     parser.add_argument('--udperf-repo', default=PATH_TO_udperf_REPO, help='Path to the udperf repository')
     parser.add_argument('--yaml', help='Path to the YAML configuration file')  # Add YAML config file option
     parser.add_argument('--ssh-sender', default=None, help='SSH address of the sender machine')
     parser.add_argument('--ssh-receiver', default=None, help='SSH address of the receiver machine')
+    parser.add_argument('--agent', action='store_true', help='Control udperf through the benchmark agent on each host instead of one SSH command per run')
+    parser.add_argument('--agent-port', type=int, default=AGENT_PORT, help='Port of the benchmark agent on each host')
+    parser.add_argument('--udperf-revisions', nargs='+', default=[udperf_REPO_BRANCH], help='Branches, tags or commits of udperf to benchmark on remote hosts. With multiple revisions, their runs are interleaved and the revision is added to the test label')
+    parser.add_argument('--cargo-profile', default=DEFAULT_BUILD['profile'], help='Cargo profile used to build udperf, the build variants of a config are based on it')
+    parser.add_argument('--cargo-features', nargs='*', default=DEFAULT_BUILD['features'], help='Cargo features used to build udperf, the build variants of a config are based on it')
+    parser.add_argument('--receiver-interface', default=None, help='Network interface of the receiver, used to sample NIC counters and to read its NIC statistics per run')
+    parser.add_argument('--sender-interface', default=None, help='Network interface of the sender, used to sample NIC counters and to read its NIC statistics per run')
+    parser.add_argument('--settle-max-wait', type=float, default=DEFAULT_THRESHOLDS['max_wait'], help='Maximum seconds to wait for the hosts to settle before each run')
+    parser.add_argument('--settle-max-cpu', type=float, default=DEFAULT_THRESHOLDS['cpu_percent'], help='Busy CPU percent below which a host counts as settled')
+    parser.add_argument('--settle-max-softirqs', type=float, default=DEFAULT_THRESHOLDS['softirq_rate'], help='NET_RX/NET_TX softirqs per second below which a host counts as settled')
+    parser.add_argument('--settle-max-packets', type=float, default=DEFAULT_THRESHOLDS['packet_rate'], help='Packets per second below which a host counts as settled')
+    parser.add_argument('--search', choices=['lossless', 'knee'], default=None, help='Search mode instead of fixed repetitions. lossless: binary search for the highest sender bandwidth with a packet loss below --loss-threshold. knee: adaptive sampling of --knee-parameter per test')
+    parser.add_argument('--loss-threshold', type=float, default=LOSS_THRESHOLD, help='Packet loss in percent up to which a bandwidth counts as lossless')
+    parser.add_argument('--search-min-bandwidth', type=int, default=0, help='Lower bound of the bandwidth search')
+    parser.add_argument('--search-max-bandwidth', type=int, default=None, help='Upper bound of the bandwidth search, defaults to the bandwidth of the run')
+    parser.add_argument('--search-precision', type=float, default=SEARCH_PRECISION, help='Stop the search when the bandwidth interval is smaller than this fraction of the upper bound')
+    parser.add_argument('--search-max-steps', type=int, default=SEARCH_MAX_STEPS, help='Maximum number of measurements per search')
+    parser.add_argument('--knee-parameter', choices=['parallel', 'uring-ring-size', 'with-mmsg-amount'], default='parallel', help='Parameter sampled in the knee search')
+    parser.add_argument('--knee-values', nargs='+', default=None, help='Candidate values of the knee search in sweep syntax, e.g. 1..16 or 1 2 ... 1024. Defaults to the values of the runs of each test')
+    parser.add_argument('--knee-budget', type=int, default=KNEE_BUDGET, help='Maximum number of sampled values per test in the knee search')
+    parser.add_argument('--reorder', action='store_true', help='Group the runs of all tests by pacing and affinity, so the hosts are reconfigured as rarely as possible')
+    parser.add_argument('--shuffle', action='store_true', help='Shuffle the runs within each group of --reorder')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for --shuffle')
+    parser.add_argument('--resume', action='store_true', help='Continue the last campaign of the config from the journal in the summary folder, completed repetitions are read from the existing result files')
+    parser.add_argument('--campaign', default=None, help='Id of the campaign in the journal, set by udperf.py and run.py')
+    parser.add_argument('--only-run', nargs=2, action='append', metavar=('TEST_NAME', 'RUN_NAME'), default=None, help='Run only the given run of a test, can be repeated')
+    parser.add_argument('--pair', default=None, help='Name of the host pair, added to the run summaries')
+    parser.add_argument('--sync-folder', default=SYNC_FOLDER, help='Local folder to which the result files of the hosts are synchronized after every run')
+    parser.add_argument('--no-sync', action='store_true', help='Do not synchronize the result files during the benchmark')
+    parser.add_argument('--dry-run', action='store_true', help='Print the planned runs with their udperf command lines, validate the parameters and estimate the duration without running anything')
+    parser.add_argument('--adaptive', action='store_true', help='Repeat each run until the 95%% confidence interval of data_rate_gbit is narrow enough, instead of a fixed number of repetitions')
+    parser.add_argument('--ci-target', type=float, default=CI_TARGET, help='Relative half width of the confidence interval at which adaptive repetitions stop, e.g. 0.02 for +-2%%')
+    parser.add_argument('--min-repetitions', type=int, default=MIN_REPETITIONS, help='Minimum number of repetitions in adaptive mode')
+    parser.add_argument('--max-repetitions', type=int, default=MAX_REPETITIONS, help='Maximum number of repetitions in adaptive mode')
+    parser.add_argument('--force', action='store_true', help='Measure all runs, even if the results index contains enough repetitions with identical config, binary and hosts')
+    parser.add_argument('--samplers', nargs='*', choices=list(SOURCES), default=list(DEFAULT_SAMPLERS), help='Host counters sampled per udperf interval on both hosts during every run, see sampler.py. By default, no samplers are started since sampling loads the hosts')
+    parser.add_argument('--perf-stat', action='store_true', help='Run receiver and sender under perf stat and store their hardware counters, IPC and misses per packet per repetition and run')
+    parser.add_argument('--rss-queues', type=int, default=RSS_QUEUES, help='Number of NIC queues the traffic should be spread over (see map_irqs.sh), used for the queue balance of each run')
+    return parser
+
+
+def options_from_args(args: argparse.Namespace) -> BenchmarkOptions:
+    return BenchmarkOptions(**{option.name: getattr(args, option.name) for option in fields(BenchmarkOptions)})
 
-    args = parser.parse_args()
 
-    global udperf_binary
+def main():
+    logging.debug('Starting main function')
+    args = argument_parser().parse_args()
+    options = options_from_args(args)
+    config_file = args.config_file
+    csv_file_name = args.results_file
 
     # If YAML config is provided, parse it and use its parameters
     if args.yaml:
         with open(args.yaml, 'r') as yaml_file:
             yaml_config = yaml.safe_load(yaml_file)
             # Use values from YAML config, potentially overriding other command-line arguments
-            udperf_binary = yaml_config.get('udperf_bin', PATH_TO_udperf_REPO + PATH_TO_udperf_BIN)
-            udperf_repo = yaml_config.get('udperf_repo', PATH_TO_udperf_REPO)
-            results_folder = yaml_config.get('results_folder', PATH_TO_RESULTS_FOLDER)
+            options.udperf_repo = yaml_config.get('udperf_repo', PATH_TO_udperf_REPO)
+            options.results_folder = yaml_config.get('results_folder', PATH_TO_RESULTS_FOLDER)
             csv_file_name = yaml_config.get('results_file', 'test_results.csv')
             config_file = yaml_config.get('config_file')
-            ssh_sender = yaml_config.get('ssh_sender', None)
-            ssh_receiver = yaml_config.get('ssh_receiver', None)
+            options.ssh_sender = yaml_config.get('ssh_sender', None)
+            options.ssh_receiver = yaml_config.get('ssh_receiver', None)
+            options.agent = yaml_config.get('agent', False)
+            options.agent_port = yaml_config.get('agent_port', AGENT_PORT)
 
-    else:
-        udperf_binary = args.udperf_bin
-        udperf_repo = args.udperf_repo 
-        results_folder = args.results_folder
-        config_file = args.config_file
-        ssh_sender = args.ssh_sender
-        ssh_receiver = args.ssh_receiver
-        if config_file is None:
-            logging.error("Config file must be supplied!")
-            return
-        csv_file_name = args.results_file
-
-    udperf_binary = udperf_repo + PATH_TO_udperf_BIN
-
-    if csv_file_name == 'test_results.csv':
-        csv_file_name = get_file_name(os.path.splitext(os.path.basename(config_file))[0])
+    if config_file is None:
+        logging.error("Config file must be supplied!")
+        return
 
+    options.udperf_bin = options.udperf_repo + PATH_TO_udperf_BIN
     logging.debug('Parsed arguments: %s', args)
-    logging.info('Using udperf Repository: %s', udperf_repo)
-    logging.info('Using udperf Binary: %s', udperf_binary)
-    logging.info('Reading config file: %s', config_file)
-    logging.info('Results file name: %s', csv_file_name)
-    logging.info('Results folder: %s', results_folder)
-
-    test_configs = parse_config_file(config_file)
-    logging.info('Read %d test configs', len(test_configs))
-
-    # Check SSH connections if applicable
-    if ssh_sender is not None:
-        logging.debug("Testing SSH connection to sender...")
-        if not test_ssh_connection(ssh_sender):
-            logging.error("SSH connection to sender failed. Exiting.")
-            exit(1)
-
-    if ssh_receiver is not None:
-        logging.debug("Testing SSH connection to receiver...")
-        if not test_ssh_connection(ssh_receiver):
-            logging.error("SSH connection to receiver failed. Exiting.")
-            exit(1)
-
-    if ssh_sender is None and ssh_receiver is not None or ssh_receiver is None and ssh_sender is not None:
-        logging.error('SSH connection to sender AND receiver must be provided. Exiting.')
-        exit(1)
-
-    if ssh_sender is None and ssh_receiver is None:
-        logging.info('Compiling binary in release mode. Assuming it is part of udperf repository.')
-        subprocess.run(['cargo', 'build', '--release'], check=True, cwd=args.udperf_repo)
-
-        # Create directory for test results
-        os.makedirs(results_folder, exist_ok=True)
-    elif ssh_sender == ssh_receiver:
-        logging.info('Since ssh_sender and ssh_receiver are the same, assuming remote LOCALHOST.')
-        setup_remote_repo_and_compile(ssh_sender, udperf_repo, udperf_REPO)
-    else:
-        setup_remote_repo_and_compile(ssh_sender, udperf_repo, udperf_REPO)
-        setup_remote_repo_and_compile(ssh_receiver, udperf_repo, udperf_REPO)
-
-
-    for index, config in enumerate(test_configs):
-        logging.info('-------------------')
-        logging.info(f'Running test {config["test_name"]} ({index + 1}/{len(test_configs)}) from config {config_file}')
-        logging.debug('Processing config: %s', config)
-        logging.info('-------------------')
-
-        test_name = config["test_name"]
-
-        for run in config["runs"]:
-            logging.info(f'Run {run["run_name"]} config: {run}')
-            thread_timeout = run["sender"]["time"] + 15
-
-            # FIXME: Currently interface is hardcoded to ens6f0np0
-            if run["sender"]["ip"] == "127.0.0.1" or run["sender"]["ip"] == "0.0.0.0":
-                logging.warning("Pacing is not possible on localhost/loopback.")
-            elif run["sender"].get("bandwidth", 0) == 0:
-                logging.info('Disabling pacing on hardcoded interface ens6f0np0')
-                change_pacing(False, ssh_sender, "ens6f0np0")
-            else:
-                logging.info('Enabling pacing on hardcoded interface ens6f0np0')
-                change_pacing(True, ssh_sender, "ens6f0np0")
-
-            for i in range(run["repetitions"]):
-                logging.info('Run repetition: %i/%i', i+1, run["repetitions"])
-                failed_attempts = 0  # Initialize failed attempts counter
-                for _ in range(0,MAX_FAILED_ATTEMPTS): # Retries, in case of an error
-                    kill_receiver_process(run["receiver"]["port"], ssh_receiver)
-                    logging.debug('Wait for some seconds so system under test can normalize...')
-                    time.sleep(1)
-                    logging.info('Starting test run %s', run['run_name'])
-                    with ThreadPoolExecutor(max_workers=2) as executor:
-                        future_receiver = executor.submit(run_test_receiver, run, test_name, csv_file_name, results_folder, ssh_receiver, repetition_id=i+1)
-                        time.sleep(1) # Wait for receiver to be ready
-                        future_sender = executor.submit(run_test_sender, run, test_name, csv_file_name, results_folder, ssh_sender, repetition_id=i+1)
-
-                        if future_receiver.result(timeout=thread_timeout) and future_sender.result(timeout=thread_timeout):
-                            logging.info(f'Test run "{run["run_name"]}" finished successfully')
-                            break
-                        else:
-                            logging.error(f'Test run {run["run_name"]} failed (test: {test_name}; config {config_file}), retrying')
-                            kill_receiver_process(run["receiver"]["port"], ssh_receiver)
-                            failed_attempts += 1
-
-                if failed_attempts == MAX_FAILED_ATTEMPTS:
-                    logging.error('Maximum number of failed attempts reached. Dont execute next repetition.')
-                    break
+    logging.info('Using udperf Binary: %s', options.udperf_bin)
 
-    logging.info(f"Results stored in: {results_folder}receiver-{csv_file_name}")
-    logging.info(f"Results stored in: {results_folder}sender-{csv_file_name}")
+    benchmark = Benchmark(options)
+    if not benchmark.connect():
+        logging.error('Exiting.')
+        exit(1)
+    results = benchmark.run_config(config_file, None if csv_file_name == 'test_results.csv' else csv_file_name)
+    benchmark.close()
+    if options.dry_run:
+        POOL.close_all()
+    if results is None:
+        exit(1)
 
 
-def setup_remote_repo_and_compile(ssh_target, path_to_repo, repo_url):
-    logging.info(f"Setting up repository and compile code on {ssh_target}")
-    repo_update_result = execute_command_on_host(ssh_target, f'cd {path_to_repo} && git checkout {udperf_REPO_BRANCH} && git pull')
-    
-    if repo_update_result:
-        logging.info(f"Repository at {path_to_repo} successfully updated.")
+def configure_pacing(run: dict, ssh_sender=None, force=False):
+    # Pacing is needed if the sender bandwidth is limited. force enables it for runs whose bandwidth is set later
+    # FIXME: Currently interface is hardcoded to ens6f0np0
+    if run["sender"]["ip"] == "127.0.0.1" or run["sender"]["ip"] == "0.0.0.0":
+        logging.warning("Pacing is not possible on localhost/loopback.")
+    elif run["sender"].get("bandwidth", 0) == 0 and not force:
+        logging.info('Disabling pacing on hardcoded interface ens6f0np0')
+        change_pacing(False, ssh_sender, "ens6f0np0")
     else:
-        logging.info(f"Repository does not exist or is not a Git repo at {path_to_repo}. Attempting to clone.")
-        execute_command_on_host(ssh_target, f'mkdir -p {path_to_repo} && git clone {repo_url} {path_to_repo}')
-        execute_command_on_host(ssh_target, f'cd {path_to_repo} && git checkout {udperf_REPO_BRANCH}')
-
-    execute_command_on_host(ssh_target, f'cd {path_to_repo} && source "$HOME/.cargo/env" && cargo build --release')
+        logging.info('Enabling pacing on hardcoded interface ens6f0np0')
+        change_pacing(True, ssh_sender, "ens6f0np0")
 
 
 def change_pacing(enable: bool, host=None, interface=None) -> bool:
@@ -411,13 +1060,7 @@ def change_pacing(enable: bool, host=None, interface=None) -> bool:
 
     if host and interface:
         # Check current qdisc settings
-        env_vars = os.environ.copy()
-        # Ensure SSH_AUTH_SOCK is forwarded if available
-        if 'SSH_AUTH_SOCK' in os.environ:
-            env_vars['SSH_AUTH_SOCK'] = os.environ['SSH_AUTH_SOCK']
-
-        ssh_command = f"ssh -o LogLevel=quiet -o StrictHostKeyChecking=no {host} '{check_command}'"
-        check_result = subprocess.run(ssh_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, env=env_vars)
+        check_result = POOL.run(host, check_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         
         if enable and add_check in str(check_result.stdout):
             logging.info(f"Pacing already enabled on {interface}, skipping.")
@@ -451,13 +1094,7 @@ def change_pacing(enable: bool, host=None, interface=None) -> bool:
 def execute_command_on_host(host: str, command: str) -> bool:
     logging.info(f"Executing {command} on {host}")
     try:
-        env_vars = os.environ.copy()
-        # Ensure SSH_AUTH_SOCK is forwarded if available
-        if 'SSH_AUTH_SOCK' in os.environ:
-            env_vars['SSH_AUTH_SOCK'] = os.environ['SSH_AUTH_SOCK']
-
-        ssh_command = f"ssh -o LogLevel=quiet -o StrictHostKeyChecking=no {host} '{command}'"
-        result = subprocess.run(ssh_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, env=env_vars)
+        result = POOL.run(host, command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         
         if result.returncode == 0:
             logging.info(f"Command {command} completed successfully on {host}: {result.stdout}")
@@ -0,0 +1,310 @@
+# Content-addressed cache for udperf binaries.
+# A binary is identified by the commit it is built from, its build options (Cargo profile, features, RUSTFLAGS)
+# and the Rust toolchain of the build host, so a toolchain upgrade builds the binaries again.
+# It is built once on a single host, shipped to the other hosts over the shared SSH connections and
+# stored in CACHE_DIRECTORY on every host, so later benchmark runs skip the build entirely.
+# Build variants (target-cpu=native, LTO, PGO) are part of the build options and therefore cached separately.
+# Binaries for target-cpu=native only run on the CPU they were built for. Their key contains the CPU models of all hosts,
+# and if the models differ, every host builds its own binary instead of getting a copy.
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+
+from ssh_pool import POOL
+
+CACHE_DIRECTORY = '.cache/udperf-bin' # Relative to the home directory of each host
+NATIVE_RUSTFLAG = 'target-cpu=native'
+PGO_DIRECTORY = '/tmp/udperf-pgo' # Profiles of the PGO training runs, suffixed with the cache key
+PGO_TRAINING_TIMEOUT = 60 # Additional seconds a PGO training run may take longer than its configured time
+DEFAULT_BUILD = {
+    'profile': 'release',
+    'features': [],
+    'rustflags': '',
+    'lto': '',   # Overrides the LTO setting of the Cargo profile, e.g. fat or thin
+    'pgo': None, # Training run for profile-guided optimization: {'receiver': {udperf options}, 'sender': {udperf options}}
+}
+
+# Predefined build variants, a benchmark config can list them by name in its "builds" entry
+BUILD_VARIANTS = {
+    'release': {},
+    'native': {'rustflags': '-C target-cpu=native'},
+    'lto': {'lto': 'fat'},
+    'pgo': {'pgo': True}, # Uses the default PGO training run
+}
+
+# The PGO training run is executed over loopback on the build host
+DEFAULT_PGO_TRAINING = {
+    'receiver': {'ip': '127.0.0.1', 'port': 45001, 'time': 10, 'io-model': 'select', 'exchange-function': 'mmsg', 'with-gsro': True},
+    'sender': {'ip': '127.0.0.1', 'port': 45001, 'time': 10, 'io-model': 'select', 'exchange-function': 'mmsg', 'with-gsro': True},
+}
+
+
+def udperf_arguments(options: dict) -> list[str]:
+    arguments = []
+    for k, v in options.items():
+        if v is not False:
+            arguments.append(f'--{k}')
+            if v is not True:
+                arguments.append(f'{v}')
+    return arguments
+
+
+def resolve_build_variant(base_build: dict, spec: dict):
+    # Returns the complete build options of a variant, or None if the variant spec is invalid
+    unknown_keys = set(spec) - set(DEFAULT_BUILD)
+    if unknown_keys:
+        logging.error(f'Unknown build options {sorted(unknown_keys)}, supported are {list(DEFAULT_BUILD)}')
+        return None
+
+    build = {**base_build, **spec}
+    if build['pgo']:
+        training = build['pgo'] if isinstance(build['pgo'], dict) else {}
+        build['pgo'] = {mode: {**DEFAULT_PGO_TRAINING[mode], **training.get(mode, {})} for mode in DEFAULT_PGO_TRAINING}
+    return build
+
+
+def resolve_revision(repo_url: str, revision: str, host=None):
+    if re.fullmatch(r'[0-9a-f]{40}', revision):
+        return revision
+
+    # Try on the orchestrator first, the hosts have network access to the repository in any case
+    command = f'git ls-remote {repo_url} {revision}'
+    result = subprocess.run(command, shell=True, capture_output=True, text=True)
+    if (result.returncode != 0 or not result.stdout.strip()) and host is not None:
+        result = POOL.run(host, command, capture_output=True, text=True)
+
+    for line in result.stdout.splitlines():
+        commit, ref = line.split()
+        if ref in (revision, f'refs/heads/{revision}', f'refs/tags/{revision}'):
+            return commit
+
+    logging.error(f'Failed to resolve revision {revision} of {repo_url}: {result.stderr}')
+    return None
+
+
+def cache_key(commit: str, build: dict = DEFAULT_BUILD, toolchain: str = '', cpu_models=None) -> str:
+    build_spec = {**DEFAULT_BUILD, **build, 'toolchain': toolchain}
+    if cpu_models:
+        build_spec['cpu_models'] = sorted(set(cpu_models))
+    build_spec = json.dumps(build_spec, sort_keys=True)
+    return f'{commit[:12]}-{hashlib.sha256(build_spec.encode()).hexdigest()[:12]}'
+
+
+def binary_path(key: str) -> str:
+    return f'{CACHE_DIRECTORY}/{key}/udperf'
+
+
+def execute(host, command: str, **kwargs) -> subprocess.CompletedProcess:
+    if host is None:
+        return subprocess.run(['bash', '-c', command], cwd=os.path.expanduser('~'), **kwargs)
+    return POOL.run(host, command, **kwargs)
+
+
+def rustc_version(host):
+    # e.g. "rustc 1.79.0 (129f3b996 2024-06-10)", None if no toolchain is installed
+    result = execute(host, 'source "$HOME/.cargo/env" 2>/dev/null; rustc --version', capture_output=True, text=True)
+    if result.returncode != 0 or not result.stdout.strip():
+        logging.error(f'Failed to read the rustc version of {host or "localhost"}: {result.stderr}')
+        return None
+    return result.stdout.strip()
+
+
+def is_native_build(build: dict) -> bool:
+    return NATIVE_RUSTFLAG in build.get('rustflags', '')
+
+
+def cpu_model(host):
+    # Architecture and CPU model, e.g. "x86_64 Intel(R) Xeon(R) Gold 6326 CPU @ 2.90GHz"
+    result = execute(host, 'echo "$(uname -m) $(grep -m 1 -E "^(model name|CPU part)" /proc/cpuinfo | cut -d: -f2-)"', capture_output=True, text=True)
+    if result.returncode != 0:
+        logging.error(f'Failed to read the CPU model of {host or "localhost"}: {result.stderr}')
+        return None
+    return ' '.join(result.stdout.split())
+
+
+def has_binary(host, key: str) -> bool:
+    return execute(host, f'test -x {binary_path(key)}', stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+
+
+def cargo_command(build: dict, rustflags: str = '') -> str:
+    environment = []
+    rustflags = ' '.join(flags for flags in (build['rustflags'], rustflags) if flags)
+    if rustflags:
+        environment.append(f'RUSTFLAGS="{rustflags}"')
+    if build['lto']:
+        environment.append(f'CARGO_PROFILE_{build["profile"].upper().replace("-", "_")}_LTO={build["lto"]}')
+
+    command = f'cargo build --profile {build["profile"]}'
+    if build['features']:
+        command += f' --features {",".join(build["features"])}'
+    return ' '.join(environment + [command])
+
+
+def pgo_commands(build: dict, binary: str, key: str) -> list[str]:
+    # Build an instrumented binary, train it with a receiver and sender over loopback,
+    # merge the profiles and build again with the merged profile
+    pgo_directory = f'{PGO_DIRECTORY}-{key}'
+    receiver, sender = build['pgo']['receiver'], build['pgo']['sender']
+    timeout = int(float(sender.get('time', 0))) + PGO_TRAINING_TIMEOUT
+    port = int(receiver.get('port', 45001))
+    receiver_arguments = ' '.join(udperf_arguments(receiver))
+    sender_arguments = ' '.join(udperf_arguments(sender))
+
+    return [
+        f'rm -rf {pgo_directory}',
+        'rustup component add llvm-tools-preview',
+        cargo_command(build, f'-Cprofile-generate={pgo_directory}'),
+        f'(timeout {timeout} {binary} receiver {receiver_arguments} & receiver_pid=$!; '
+        # Start the sender once the receiver socket is bound
+        f'for _ in $(seq 100); do grep -q ":{port:04X} " /proc/net/udp /proc/net/udp6 && break; sleep 0.1; done; '
+        f'timeout {timeout} {binary} sender {sender_arguments}; wait $receiver_pid)',
+        f'"$(ls "$(rustc --print sysroot)"/lib/rustlib/*/bin/llvm-profdata | head -n 1)" merge -o {pgo_directory}/merged.profdata {pgo_directory}',
+        cargo_command(build, f'-Cprofile-use={pgo_directory}/merged.profdata'),
+    ]
+
+
+def build_command(path_to_repo: str, repo_url, commit, key: str, build: dict) -> str:
+    # Without a commit, the working tree of path_to_repo is built as it is
+    build = {**DEFAULT_BUILD, **build}
+    profile = build['profile']
+    # Cargo stores the dev profile in target/debug, all other profiles in target/<profile>
+    target_directory = 'debug' if profile == 'dev' else profile
+    binary = f'target/{target_directory}/udperf'
+
+    cache_directory = f'$HOME/{CACHE_DIRECTORY}/{key}'
+    commands = [f'cd {path_to_repo}'] if commit is None else [
+        f'(test -d {path_to_repo}/.git || (mkdir -p {path_to_repo} && git clone {repo_url} {path_to_repo}))',
+        f'cd {path_to_repo}',
+        'git fetch --quiet origin',
+        f'git checkout --quiet --detach {commit}',
+    ]
+    commands.append('source "$HOME/.cargo/env"')
+    commands += pgo_commands(build, binary, key) if build['pgo'] else [cargo_command(build)]
+    return ' && '.join(commands + [
+        f'mkdir -p {cache_directory}',
+        f'cp {binary} {cache_directory}/udperf.tmp',
+        f'mv {cache_directory}/udperf.tmp {cache_directory}/udperf',
+    ])
+
+
+def build_binary(host, path_to_repo: str, repo_url: str, commit: str, key: str, build: dict) -> bool:
+    logging.info(f'Building udperf {key} on {host or "localhost"}')
+    result = execute(host, build_command(path_to_repo, repo_url, commit, key, build), capture_output=True, text=True)
+    if result.returncode != 0:
+        logging.error(f'Building udperf {key} on {host or "localhost"} failed: {result.stderr}')
+        return False
+    return True
+
+
+def file_checksum(host, path: str):
+    result = execute(host, f'sha256sum {path}', capture_output=True, text=True)
+    return result.stdout.split()[0] if result.returncode == 0 and result.stdout else None
+
+
+def checksum(host, key: str):
+    return file_checksum(host, binary_path(key))
+
+
+def ship_binary(source_host, target_host, key: str) -> bool:
+    logging.info(f'Shipping udperf {key} from {source_host or "localhost"} to {target_host or "localhost"}')
+    path = binary_path(key)
+    receive_command = f'mkdir -p $(dirname {path}) && cat > {path}.tmp && chmod +x {path}.tmp && mv {path}.tmp {path}'
+
+    if source_host is None:
+        send_process = subprocess.Popen(['cat', path], stdout=subprocess.PIPE, cwd=os.path.expanduser('~'))
+    else:
+        send_process = POOL.popen(source_host, f'cat {path}', stdout=subprocess.PIPE)
+    receive_result = execute(target_host, receive_command, stdin=send_process.stdout, capture_output=True, text=True)
+    send_process.stdout.close()
+    send_process.wait()
+
+    if send_process.returncode != 0 or receive_result.returncode != 0:
+        logging.error(f'Shipping udperf {key} to {target_host or "localhost"} failed: {receive_result.stderr}')
+        return False
+    if checksum(source_host, key) != checksum(target_host, key):
+        logging.error(f'Checksum of udperf {key} on {target_host or "localhost"} does not match')
+        execute(target_host, f'rm -f {path}')
+        return False
+    return True
+
+
+def binary_key(hosts: list, repo_url: str, revision: str, build: dict = DEFAULT_BUILD):
+    # Returns the commit, the cache key and the CPU models of the hosts the key depends on, None on failure.
+    # Only reads from the hosts, nothing is built
+    commit = resolve_revision(repo_url, revision, hosts[0])
+    if commit is None:
+        return None
+
+    # The binary is built on the first host, unless another host already has it
+    toolchain = rustc_version(hosts[0])
+    if toolchain is None:
+        return None
+    cpu_models = []
+    if is_native_build(build):
+        with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+            cpu_models = list(executor.map(cpu_model, hosts))
+        if None in cpu_models:
+            return None
+    return commit, cache_key(commit, build, toolchain, cpu_models), cpu_models
+
+
+def planned_binary(hosts: list, repo_url: str, revision: str, build: dict = DEFAULT_BUILD):
+    # Path the binary of ensure_binary will have, without building or shipping it. None on failure
+    planned = binary_key(list(dict.fromkeys(hosts)), repo_url, revision, build)
+    return binary_path(planned[1]) if planned is not None else None
+
+
+def ensure_binary(hosts: list, path_to_repo: str, repo_url: str, revision: str, build: dict = DEFAULT_BUILD):
+    # Returns the path of the binary relative to the home directory of the hosts, or None on failure
+    hosts = list(dict.fromkeys(hosts))
+    planned = binary_key(hosts, repo_url, revision, build)
+    if planned is None:
+        return None
+    commit, key, cpu_models = planned
+    with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+        available = dict(zip(hosts, executor.map(lambda host: has_binary(host, key), hosts)))
+
+    missing_hosts = [host for host, has_key in available.items() if not has_key]
+    if not missing_hosts:
+        logging.info(f'udperf {revision} ({key}) found in cache on all hosts, skipping build')
+        return binary_path(key)
+
+    if len(set(cpu_models)) > 1:
+        # A binary for another CPU could crash with SIGILL, so the hosts build for their own CPU
+        logging.info(f'CPU models of the hosts differ, building udperf {revision} ({key}) on {missing_hosts}')
+        with ThreadPoolExecutor(max_workers=len(missing_hosts)) as executor:
+            built = list(executor.map(lambda host: build_binary(host, path_to_repo, repo_url, commit, key, build), missing_hosts))
+        return binary_path(key) if all(built) else None
+
+    source_hosts = [host for host, has_key in available.items() if has_key]
+    if source_hosts:
+        source_host = source_hosts[0]
+    else:
+        # Build only once, the other hosts get a copy of the binary
+        source_host = missing_hosts.pop(0)
+        if not build_binary(source_host, path_to_repo, repo_url, commit, key, build):
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(len(missing_hosts), 1)) as executor:
+        shipped = list(executor.map(lambda host: ship_binary(source_host, host, key), missing_hosts))
+    if not all(shipped):
+        return None
+
+    logging.info(f'udperf {revision} ({key}) available on all hosts')
+    return binary_path(key)
+
+
+def local_binary_path(build: dict = DEFAULT_BUILD) -> str:
+    return os.path.join(os.path.expanduser('~'), binary_path(cache_key('worktree', build)))
+
+
+def build_local_binary(path_to_repo: str, build: dict = DEFAULT_BUILD):
+    # Builds the local working tree. It may contain uncommitted changes, so it is always rebuilt
+    key = cache_key('worktree', build)
+    if not build_binary(None, os.path.abspath(path_to_repo), None, None, key, build):
+        return None
+    return local_binary_path(build)
@@ -0,0 +1,31 @@
+# Confidence intervals for the adaptive repetitions of benchmark.py.
+# Uses the two-sided 95% quantiles of Student's t-distribution, so no further dependencies are needed on the hosts.
+import math
+import statistics
+
+# Degrees of freedom -> t quantile. Between two entries, the quantile of the lower entry is used (conservative)
+T_QUANTILES_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+    11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086,
+    25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980,
+}
+Z_95 = 1.960
+
+
+def t_quantile(degrees_of_freedom: int) -> float:
+    if degrees_of_freedom > max(T_QUANTILES_95):
+        return Z_95
+    return T_QUANTILES_95[max(df for df in T_QUANTILES_95 if df <= degrees_of_freedom)]
+
+
+def confidence_interval(values: list[float]) -> tuple[float, float]:
+    # Returns mean and half width of the 95% confidence interval of the mean
+    mean = statistics.mean(values)
+    if len(values) < 2:
+        return mean, math.inf
+    return mean, t_quantile(len(values) - 1) * statistics.stdev(values) / math.sqrt(len(values))
+
+
+def relative_half_width(values: list[float]) -> float:
+    mean, half_width = confidence_interval(values)
+    return half_width / abs(mean) if mean != 0 else math.inf
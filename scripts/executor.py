@@ -0,0 +1,168 @@
+# Asynchronous executor for the processes of one benchmark run: receiver, sender and any samplers.
+# All processes of a run share a single deadline. As soon as one process fails, the others are cancelled and killed,
+# so a failed attempt costs seconds instead of waiting for the timeout of the other side.
+# stdout and stderr are streamed line by line to the log while the processes run.
+# Every process runs under supervisor.py in its own process group. Closing its stdin stops the group,
+# so cancelling a run also stops its remote processes, and processes left behind by a crash can be reaped.
+import asyncio
+from dataclasses import dataclass, field
+import logging
+import shlex
+from typing import Optional
+
+from agent import AgentClient, AgentError
+from ssh_pool import POOL
+from supervisor import STOP_GRACE_PERIOD, supervised_command
+
+RUN_TIMEOUT_BUFFER = 10 # Seconds a run may take longer than the sender time, including the start barrier
+
+
+@dataclass
+class RunProcess:
+    name: str # Unique within a run, also the name of the process in the agent
+    command: list[str]
+    host: Optional[str] = None
+    agent: Optional[AgentClient] = None
+    env: dict = field(default_factory=lambda: {'RUST_LOG': 'error'})
+    after_ready: bool = False # Started only after the ready check passed, e.g. the sender after the receiver bound its sockets
+    background: bool = False # Stopped when all other processes finished, its failure does not fail the run (samplers)
+    stderr_lines: list[str] = field(default_factory=list)
+
+    @property
+    def label(self) -> str:
+        return f'{self.host or "localhost"} {self.name}'
+
+
+async def stream_lines(stream: asyncio.StreamReader, process: RunProcess, lines=None, level=logging.DEBUG):
+    while line := await stream.readline():
+        decoded_line = line.decode(errors='replace')
+        logging.log(level, f'{process.label}: {decoded_line.rstrip()}')
+        if lines is not None:
+            lines.append(decoded_line)
+
+
+async def start_subprocess(process: RunProcess) -> asyncio.subprocess.Process:
+    command = supervised_command(process.name, process.command, process.host, stop_on_eof=True)
+    if process.host:
+        return await POOL.create_subprocess(process.host, shlex.join(command), stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    return await asyncio.create_subprocess_exec(*command, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, env=process.env)
+
+
+async def run_subprocess(process: RunProcess) -> bool:
+    try:
+        child = await start_subprocess(process)
+    except OSError as e:
+        logging.error(f'Failed to start {process.label}: {e}')
+        return False
+
+    try:
+        await asyncio.gather(stream_lines(child.stdout, process), stream_lines(child.stderr, process, process.stderr_lines, logging.ERROR))
+        returncode = await child.wait()
+    except asyncio.CancelledError:
+        if child.returncode is None:
+            logging.info(f'Stopping {process.label}')
+            # The supervisor stops the process group once its stdin is closed
+            child.stdin.close()
+            try:
+                await asyncio.wait_for(child.wait(), STOP_GRACE_PERIOD + 1)
+            except asyncio.TimeoutError:
+                child.kill()
+                await child.wait()
+        raise
+    finally:
+        if child.stdin is not None:
+            child.stdin.close()
+
+    if returncode != 0:
+        logging.error(f'{process.label} exited with {returncode}')
+    return returncode == 0 and not process.stderr_lines
+
+
+async def run_agent_process(process: RunProcess) -> bool:
+    # The agent streams stderr itself, the output is returned when the process exited
+    agent = process.agent
+    try:
+        await asyncio.to_thread(agent.start, process.name, process.command, process.env)
+        result = await asyncio.to_thread(agent.wait, process.name)
+    except AgentError as e:
+        logging.error(f'Agent failed to run {process.label}: {e}')
+        return False
+    except asyncio.CancelledError:
+        logging.info(f'Stopping {process.label}')
+        try:
+            await asyncio.to_thread(agent.stop, process.name)
+        except AgentError as e:
+            logging.error(f'Agent failed to stop {process.label}: {e}')
+        raise
+
+    if result['stdout']:
+        logging.debug(f'{process.label} output: %s', result['stdout'])
+    if result['stderr']:
+        process.stderr_lines.append(result['stderr'])
+        logging.error(f'{process.label} error: %s', result['stderr'])
+    if result['returncode'] != 0:
+        logging.error(f'{process.label} exited with {result["returncode"]}')
+    return result['returncode'] == 0 and not result['stderr']
+
+
+def run_process(process: RunProcess):
+    return run_agent_process(process) if process.agent else run_subprocess(process)
+
+
+async def supervise(processes: list[RunProcess], ready, tasks: dict) -> bool:
+    def start(process: RunProcess):
+        tasks[asyncio.create_task(run_process(process))] = process
+
+    def names(pending) -> list[str]:
+        return [tasks[task].label for task in pending if task in tasks]
+
+    try:
+        for process in processes:
+            if not process.after_ready:
+                start(process)
+
+        if any(process.after_ready for process in processes):
+            if ready is not None:
+                # The ready check is aborted as soon as one of the started processes exits
+                started = list(tasks)
+                ready_task = asyncio.create_task(ready(lambda: any(task.done() for task in started)))
+                tasks[ready_task] = None
+                await asyncio.wait([ready_task, *started], return_when=asyncio.FIRST_COMPLETED)
+                if not ready_task.done():
+                    logging.error(f'{names(task for task in started if task.done())} exited before the ready check passed')
+                    return False
+                if not ready_task.result():
+                    return False
+                del tasks[ready_task]
+            for process in processes:
+                if process.after_ready:
+                    start(process)
+
+        pending = {task for task, process in tasks.items() if not process.background}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.result():
+                    if pending:
+                        logging.error(f'{tasks[task].label} failed, stopping {names(pending)}')
+                    return False
+        return True
+    finally:
+        # Structured cancellation: no process of the run outlives it, background processes are stopped here
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_processes(processes: list[RunProcess], timeout: float, ready=None) -> bool:
+    # ready(abort) is awaited before the processes with after_ready are started, abort() tells if a started process already exited
+    tasks = {}
+    try:
+        return await asyncio.wait_for(supervise(processes, ready, tasks), timeout)
+    except asyncio.TimeoutError:
+        logging.error(f'Run of {[process.label for process in tasks.values() if process is not None]} timed out after {timeout}s')
+        return False
+
+
+def execute_run(processes: list[RunProcess], timeout: float, ready=None) -> bool:
+    return asyncio.run(run_processes(processes, timeout, ready))
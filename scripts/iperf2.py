@@ -5,10 +5,15 @@ import datetime
 import json
 import logging
 import os
-import signal
+import shlex
 import subprocess
 import time
 
+from readiness import wait_for_sockets
+from settle import wait_until_settled
+from ssh_pool import POOL
+from supervisor import reap_host, supervised_command
+
 #DEFAULT_SOCKET_BUFFER_SIZE = 212992
 DEFAULT_SOCKET_BUFFER_SIZE = 2129920
 DEFAULT_MEASUREMENT_TIME = 30
@@ -91,24 +96,27 @@ NUM_REPORT_STRUCTS = 40000
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def udp_mode(config: dict) -> bool:
+    # The server and the readiness barrier have to agree on the protocol
+    return config['parameter'].get('--udp', 'False') != 'False'
+
 def run_test_server(config: dict, test_name: str, file_name: str, ssh_server: str, results_folder: str, env_vars: dict) -> bool:
     logging.info(f"{test_name}: Running iperf2 server on {ssh_server}")
 
     command_str = f"{PATH_TO_BINARY} -s {DEFAULT_PARAMETER} -w {config['parameter']['--window']} -t {int(config['parameter']['--time']) + 3} --len {config['parameter']['--len']} --NUM_REPORT_STRUCTS {NUM_REPORT_STRUCTS}"
 
-    if config['parameter'].get('--udp', 'False') != 'False':
+    if udp_mode(config):
         logging.info(f"Running server in UDP mode")
         command_str += " --udp"
 
     logging.info(f"Executing command: {command_str}")
 
     if ssh_server:
-        # Modify the command to be executed over SSH
-        ssh_command = f"ssh -o LogLevel=quiet -o StrictHostKeyChecking=no {ssh_server} '{command_str}'"
-        server_process = subprocess.Popen(ssh_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env_vars)
+        # Execute the command over the shared SSH connection
+        server_process = POOL.popen(ssh_server, shlex.join(supervised_command('iperf2-server', command_str.split(), ssh_server)), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     else:
         # Execute command locally
-        server_process = subprocess.Popen(command_str, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        server_process = subprocess.Popen(supervised_command('iperf2-server', command_str.split()), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
     # Wait for the server to finish
     try:
@@ -154,12 +162,11 @@ def run_test_client(config: dict, test_name: str, file_name: str, ssh_client: st
     logging.info(f"Executing command: {command_str}")
 
     if ssh_client:
-        # Modify the command to be executed over SSH
-        ssh_command = f"ssh -o LogLevel=quiet -o StrictHostKeyChecking=no {ssh_client} '{command_str}'"
-        client_process = subprocess.Popen(ssh_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env_vars)
+        # Execute the command over the shared SSH connection
+        client_process = POOL.popen(ssh_client, shlex.join(supervised_command('iperf2-client', command_str.split(), ssh_client)), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
     else:
         # Execute command locally
-        client_process = subprocess.Popen(command_str, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        client_process = subprocess.Popen(supervised_command('iperf2-client', command_str.split()), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
     try:
         client_output, client_error = client_process.communicate() 
@@ -223,6 +230,10 @@ def main():
     os.makedirs(RESULTS_FOLDER, exist_ok=True)
     mtu_changed = False
 
+    settle_hosts = [(args.server_hostname, args.server_interface, None)]
+    if args.client_hostname != args.server_hostname:
+        settle_hosts.append((args.client_hostname, args.client_interface, None))
+
     logging.warning(f"Changing MTU to {MTU_DEFAULT}")
     change_mtu(MTU_DEFAULT, args.server_hostname, args.server_interface, env_vars)
     change_mtu(MTU_DEFAULT, args.client_hostname, args.client_interface, env_vars)
@@ -246,12 +257,18 @@ def main():
 
             failed_attempts = 0
             for _ in range(0,MAX_FAILED_ATTEMPTS): # Retries, in case of an error
-                kill_server_process(SERVER_PORT, args.server_hostname)
-                logging.info('Wait for some seconds so system under test can normalize...')
-                time.sleep(3)
+                kill_server_process(args.server_hostname)
+                logging.info('Wait until system under test has normalized...')
+                settle_time = wait_until_settled(settle_hosts)
+                logging.info(f'Settle time before test {config["test_name"]} with {i} threads: {settle_time:.2f}s')
                 with ThreadPoolExecutor(max_workers=2) as executor:
                     future_server = executor.submit(run_test_server, config, config['test_name'], file_name, args.server_hostname, RESULTS_FOLDER, env_vars)
-                    time.sleep(1) # Wait for server to be ready
+                    # Release the client as soon as the server socket is bound
+                    if not wait_for_sockets(args.server_hostname, {SERVER_PORT: 1}, "udp" if udp_mode(config) else "tcp", abort=future_server.done):
+                        logging.error(f'Server of test run {config["test_name"]} did not become ready, retrying')
+                        kill_server_process(args.server_hostname)
+                        failed_attempts += 1
+                        continue
                     future_client = executor.submit(run_test_client, config, config['test_name'], file_name, args.client_hostname, RESULTS_FOLDER, env_vars)
 
                     if future_server.result(timeout=thread_timeout) and future_client.result(timeout=thread_timeout):
@@ -274,6 +291,7 @@ def main():
 
     logging.info(f"Results stored in: {RESULTS_FOLDER}server-{file_name}")
     logging.info(f"Results stored in: {RESULTS_FOLDER}client-{file_name}")
+    POOL.log_stats()
 
 
 ##################################
@@ -306,13 +324,7 @@ def setup_remote_repo_and_compile(ssh_target, path_to_repo):
 def execute_command_on_host(host: str, command: str) -> bool:
     logging.info(f"Executing {command} on {host}")
     try:
-        env_vars = os.environ.copy()
-        # Ensure SSH_AUTH_SOCK is forwarded if available
-        if 'SSH_AUTH_SOCK' in os.environ:
-            env_vars['SSH_AUTH_SOCK'] = os.environ['SSH_AUTH_SOCK']
-
-        ssh_command = f"ssh -o LogLevel=quiet -o StrictHostKeyChecking=no {host} '{command}'"
-        result = subprocess.run(ssh_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, env=env_vars)
+        result = POOL.run(host, command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         
         if result.returncode == 0:
             logging.info(f"Command {command} completed successfully on {host}: {result.stdout}")
@@ -327,39 +339,18 @@ def execute_command_on_host(host: str, command: str) -> bool:
 
 def change_mtu(mtu: int, host: str, interface: str, env_vars: dict) -> bool:
     try:
-        ssh_command = f"ssh -o LogLevel=quiet -o StrictHostKeyChecking=no {host} 'sudo ifconfig {interface} mtu {mtu} up'"
-        subprocess.run(ssh_command, stdout=subprocess.PIPE, shell=True, stderr=subprocess.PIPE, check=True, env=env_vars)
+        POOL.run(host, f'sudo ifconfig {interface} mtu {mtu} up', stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
         logging.info(f"MTU changed to {mtu} for {interface} interface")
         return True
     except subprocess.CalledProcessError as e:
         logging.error(f"Failed to change MTU: {e}")
         return False
 
-def kill_server_process(port: str, ssh_server: str):
-    logging.info(f'Killing server process on port {port}, if still running')
-    try:
-        if ssh_server is None:
-            # Use lsof and grep to find processes listening on UDP ports in the range 45000 to 45019
-            command = "lsof -iUDP | grep ':450[0-1][0-9]' | awk '{print $2}'"
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        else:
-            # Execute the command remotely if an SSH server is specified
-            command = "lsof -iUDP | grep ':450[0-1][0-9]' | awk '{print $2}'"
-            result = subprocess.run(['ssh', '-o LogLevel=quiet', '-o StrictHostKeyChecking=no', ssh_server, command], capture_output=True, text=True)
-  
-        if result.stdout.strip() != '':
-            logging.info(f'Found processes: {result.stdout.strip()}')
-        pids: list[str] = result.stdout.strip().split('\n')
-
-        for pid in pids:
-            if pid:
-                logging.warning(f'Killing process {pid} on port {port}')
-                if ssh_server is None:
-                    os.kill(int(pid), signal.SIGTERM)
-                else:
-                    subprocess.run(['ssh', '-o LogLevel=quiet', '-o StrictHostKeyChecking=no', ssh_server, f'kill -9 {pid}'], capture_output=True, text=True)
-    except Exception as e:
-        logging.error(f'Failed to kill process on port {port}: {e}')
+def kill_server_process(ssh_server: str):
+    # Stops iperf2 processes of previous attempts, only processes started by the supervisor are touched
+    stopped = reap_host(ssh_server)
+    if stopped:
+        logging.warning(f'Stopped processes left behind on {ssh_server or "localhost"}: {stopped}')
 
 def handle_output(config: dict, output: str, file_path: str, mode: str):
     logging.debug(f"Writing output to file: {file_path}")
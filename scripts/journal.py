@@ -0,0 +1,84 @@
+# Append-only journal of a benchmark campaign, used to resume it after a crash of the orchestrator or a host.
+# Every line is a JSON event with a state ("started", "done", "failed") and a timestamp. Units are identified by their campaign,
+# config file, test, run, repetition and attempt; coarser units (a config, a test of run.py) leave out the finer fields.
+# The campaign id is created by the outermost script (run.py, udperf.py or benchmark.py) and passed down with --campaign.
+# Each event is flushed and synced before the next step starts, so a crash loses at most the event being written.
+import json
+import logging
+import os
+import time
+
+JOURNAL_FILE_NAME = 'journal.jsonl'
+UNIT_FIELDS = ['campaign', 'config_file', 'test_name', 'run_name', 'repetition_id']
+
+
+def journal_path(results_folder: str) -> str:
+    return os.path.join(results_folder, JOURNAL_FILE_NAME)
+
+
+def new_campaign_id() -> str:
+    return time.strftime('%Y%m%d-%H%M%S')
+
+
+def record(path: str, state: str, **unit):
+    # Journal failures must not abort the campaign
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps({**unit, 'state': state, 'timestamp': time.time()}) + '\n'
+        with open(path, 'ab+') as file:
+            # Terminate an incomplete last line of a crashed campaign, so it does not corrupt this event
+            if file.seek(0, os.SEEK_END) > 0:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b'\n':
+                    line = '\n' + line
+            file.write(line.encode())
+            file.flush()
+            os.fsync(file.fileno())
+    except OSError as e:
+        logging.error(f'Failed to write {state} of {unit} to journal {path}: {e}')
+
+
+def load_events(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    events = []
+    with open(path, 'r') as file:
+        for line in file:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                # The last line of a crashed campaign may be incomplete
+                continue
+    return events
+
+
+def unit_key(event: dict) -> tuple:
+    return tuple(event.get(field) for field in UNIT_FIELDS)
+
+
+def completed_units(events: list[dict], campaign: str) -> set[tuple]:
+    # Units of the campaign whose last event is "done"
+    states = {}
+    for event in events:
+        if event.get('campaign') == campaign:
+            states[unit_key(event)] = event.get('state')
+    return {key for key, state in states.items() if state == 'done'}
+
+
+def last_campaign(events: list[dict], **fields):
+    # Id of the last campaign with an event matching the given fields, None if there is none
+    for event in reversed(events):
+        if 'campaign' in event and all(event.get(field) == value for field, value in fields.items()):
+            return event['campaign']
+    return None
+
+
+def resolve_campaign(path: str, campaign=None, resume=False, **fields) -> str:
+    # The campaign given by the calling script, the last campaign of the journal when resuming, or a new one
+    if campaign is None and resume:
+        campaign = last_campaign(load_events(path), **fields)
+        if campaign is None:
+            logging.warning(f'No campaign to resume found in journal {path}, starting a new one')
+    return campaign or new_campaign_id()
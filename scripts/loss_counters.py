@@ -0,0 +1,51 @@
+# Kernel drop counters which explain the packet loss of a run.
+# Before and after every run, benchmark.py reads them on both hosts and stores the deltas per repetition in
+# counters-<results file>, next to the run summaries. The counters tell where a lost packet was dropped:
+# - udp_rcvbuf_errors: the receive buffer of the socket was full (udp_in_errors includes them)
+# - softnet_dropped: the per-CPU backlog of the network stack was full, softnet_time_squeeze counts NET_RX runs which ran out of budget
+# - nic_rx_dropped: the NIC or its driver dropped the packet (drop and fifo counters of /proc/net/dev)
+import logging
+
+from procfs import parse_net_dev, parse_snmp, parse_softnet_stat, read_proc_files
+
+LOSS_PATHS = ['/proc/net/softnet_stat', '/proc/net/snmp', '/proc/net/dev']
+COUNTERS_PREFIX = 'counters-' # counters-<results file>, one row per repetition
+
+# Counter of the Udp line in /proc/net/snmp -> column
+UDP_COUNTERS = {
+    'InDatagrams': 'udp_in_datagrams',
+    'OutDatagrams': 'udp_out_datagrams',
+    'RcvbufErrors': 'udp_rcvbuf_errors',
+    'SndbufErrors': 'udp_sndbuf_errors',
+    'InErrors': 'udp_in_errors',
+    'NoPorts': 'udp_no_ports',
+}
+LOSS_COLUMNS = list(UDP_COUNTERS.values()) + ['softnet_dropped', 'softnet_time_squeeze', 'nic_rx_dropped', 'nic_tx_dropped']
+
+
+def parse_loss_counters(contents: dict[str, str], interface=None) -> dict[str, int]:
+    # Totals of the host, contents are the LOSS_PATHS as read by read_proc_files
+    udp = parse_snmp(contents['/proc/net/snmp']).get('Udp', {})
+    softnet = parse_softnet_stat(contents['/proc/net/softnet_stat']).values()
+    net_dev = parse_net_dev(contents['/proc/net/dev'])
+    # Without a known interface, the drops of all interfaces except loopback are counted
+    interfaces = [interface] if interface in net_dev else [name for name in net_dev if name != 'lo']
+
+    counters = {column: udp.get(counter, 0) for counter, column in UDP_COUNTERS.items()}
+    counters['softnet_dropped'] = sum(cpu['dropped'] for cpu in softnet)
+    counters['softnet_time_squeeze'] = sum(cpu['time_squeeze'] for cpu in softnet)
+    counters['nic_rx_dropped'] = sum(net_dev[name]['rx_drop'] + net_dev[name]['rx_fifo'] for name in interfaces)
+    counters['nic_tx_dropped'] = sum(net_dev[name]['tx_drop'] + net_dev[name]['tx_fifo'] for name in interfaces)
+    return counters
+
+
+def read_loss_counters(host=None, interface=None, agent=None):
+    contents = read_proc_files(host, LOSS_PATHS, agent)
+    if not contents['/proc/net/snmp']:
+        logging.error(f'Failed to read the drop counters of {host or "localhost"}')
+        return None
+    return parse_loss_counters(contents, interface)
+
+
+def counter_deltas(before: dict, after: dict, prefix: str = '') -> dict:
+    return {prefix + column: after[column] - before[column] for column in LOSS_COLUMNS}
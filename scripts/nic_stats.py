@@ -0,0 +1,89 @@
+# NIC statistics of the configured interface, read with "ethtool -S" before and after every run.
+# The counters are parsed into per-queue rx/tx packets and bytes and the drop and pause counters of the NIC.
+# From the per-queue deltas, the balance of the RSS queues (receiver) and XPS queues (sender) is computed:
+# max/mean of the queue packets and Jain's fairness index (1 for an even spread, 1/n if a single queue carries all traffic).
+# Queue counter names differ between drivers, e.g. rx0_packets (mlx5), rx_queue_0_packets (ice, ixgbe, virtio),
+# rx-0.packets (i40e) and "[0]: rx_ucast_packets" (bnxt).
+import logging
+import re
+
+from build_cache import execute
+
+RSS_QUEUES = 12 # Queues configured by map_irqs.sh, the n-tuple rules steer the ports 45001-45012 to the queues 0-11
+QUEUE_IMBALANCE_WARNING = 1.5 # max/mean of the queue packets above which a run is reported as unbalanced
+QUEUES_PREFIX = 'queues-' # queues-<results file>, one row per repetition, host and queue
+
+QUEUE_COUNTER = re.compile(r'^(rx|tx)[-_]?(?:queue[-_]?)?(\d+)[._](packets|bytes)$')
+BNXT_QUEUE_COUNTER = re.compile(r'^\[(\d+)\]: (rx|tx)_ucast_(packets|bytes)$')
+PER_QUEUE = re.compile(r'^(\[\d+\]|(rx|tx)[-_]?(queue[-_]?)?\d+[._])')
+DROP_COUNTER = re.compile(r'drop|discard|miss|pause|out_of_buffer|no_buf')
+
+
+def read_ethtool_stats(host, interface: str):
+    result = execute(host, f'ethtool -S {interface}', capture_output=True, text=True)
+    if result.returncode != 0:
+        logging.error(f'Failed to read the NIC statistics of {interface} on {host or "localhost"}: {result.stderr}')
+        return None
+    return parse_ethtool_stats(result.stdout)
+
+
+def parse_ethtool_stats(text: str) -> dict[str, int]:
+    # "NIC statistics:" followed by one "name: value" line per counter
+    stats = {}
+    for line in text.splitlines()[1:]:
+        name, _, value = line.strip().rpartition(': ')
+        if name and value.isdigit():
+            stats[name] = int(value)
+    return stats
+
+
+def queue_counters(stats: dict[str, int]) -> dict[int, dict[str, int]]:
+    # Queue -> {rx_packets, rx_bytes, tx_packets, tx_bytes}
+    queues = {}
+    for name, value in stats.items():
+        if match := QUEUE_COUNTER.match(name):
+            direction, queue, unit = match.groups()
+        elif match := BNXT_QUEUE_COUNTER.match(name):
+            queue, direction, unit = match.groups()
+        else:
+            continue
+        counters = queues.setdefault(int(queue), {'rx_packets': 0, 'rx_bytes': 0, 'tx_packets': 0, 'tx_bytes': 0})
+        counters[f'{direction}_{unit}'] += value
+    return queues
+
+
+def drop_counters(stats: dict[str, int]) -> dict[str, int]:
+    # Drop and pause counters of the whole NIC, the per-queue variants are left out
+    return {name: value for name, value in stats.items() if DROP_COUNTER.search(name) and not PER_QUEUE.match(name)}
+
+
+def queue_balance(packets: list[int]) -> dict:
+    # Balance of the packets over the queues, None if no packets were counted
+    total = sum(packets)
+    if not packets or total == 0:
+        return {'max_mean': None, 'jain_index': None, 'busiest_queue': None}
+    mean = total / len(packets)
+    return {
+        'max_mean': round(max(packets) / mean, 3),
+        'jain_index': round(total ** 2 / (len(packets) * sum(count ** 2 for count in packets)), 3),
+        'busiest_queue': packets.index(max(packets)),
+    }
+
+
+def nic_deltas(before: dict[str, int], after: dict[str, int], direction: str, rss_queues: int = RSS_QUEUES, prefix: str = '') -> tuple[dict, list[dict]]:
+    # Returns the drop/pause counters and the balance of the direction (rx or tx) as columns of the run,
+    # and one row per queue with the rx/tx deltas of the queue
+    queues_before, queues_after = queue_counters(before), queue_counters(after)
+    queue_rows = []
+    for queue in sorted(queues_after):
+        if queue in queues_before:
+            queue_rows.append({'queue': queue, **{name: value - queues_before[queue][name] for name, value in queues_after[queue].items()}})
+
+    drops_before = drop_counters(before)
+    columns = {f'{prefix}ethtool_{name}': value - drops_before[name] for name, value in drop_counters(after).items() if name in drops_before}
+    # Only the configured queues count for the balance, traffic on other queues bypassed the n-tuple rules
+    packets = {row['queue']: row[f'{direction}_packets'] for row in queue_rows}
+    balance = queue_balance([packets.get(queue, 0) for queue in range(rss_queues)]) if packets else queue_balance([])
+    columns.update({f'{prefix}{direction}_queue_{name}': value for name, value in balance.items()})
+    columns[f'{prefix}{direction}_packets_outside_queues'] = sum(count for queue, count in packets.items() if queue >= rss_queues)
+    return columns, queue_rows
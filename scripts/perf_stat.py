@@ -0,0 +1,66 @@
+# Hardware performance counters of the udperf processes with "perf stat".
+# With --perf-stat, benchmark.py starts the receiver and sender under perf stat, so the counters cover exactly the lifetime
+# of each process. perf writes them to a file next to the results on the host, which is read after every run.
+# The counters are stored per repetition in the counters file, together with the IPC and the misses per UDP datagram.
+# perf prints its warnings (e.g. unsupported events) to stderr, where the executor would take them as an error of udperf,
+# so its stderr goes to a log next to the counters and udperf gets the original stderr back.
+import logging
+import shlex
+
+PERF_EVENTS = ['cycles', 'instructions', 'cache-references', 'cache-misses', 'LLC-load-misses', 'context-switches']
+# Columns of the counters and the derived metrics, see event_column and perf_metrics
+PERF_COLUMNS = ['cycles', 'instructions', 'cache_references', 'cache_misses', 'llc_load_misses', 'context_switches',
+                'ipc', 'cycles_per_packet', 'cache_misses_per_packet', 'llc_load_misses_per_packet']
+PERF_EXTENSION = '.perf.log' # Not a result CSV, so it is not plotted by visualize.py
+PERF_STDERR_EXTENSION = '.perf-stderr.log'
+
+
+def perf_output_path(results_folder: str, mode: str, file_name: str) -> str:
+    # receiver-<results file without .csv>.perf.log, overwritten by every run
+    return f'{results_folder}{mode}-{file_name.removesuffix(".csv")}{PERF_EXTENSION}'
+
+
+def perf_command(command: list[str], output_path: str) -> list[str]:
+    # sh keeps the stderr of udperf as fd 3 and redirects the stderr of perf, udperf is started with fd 3 as its stderr again
+    stderr_path = output_path.removesuffix(PERF_EXTENSION) + PERF_STDERR_EXTENSION
+    perf = ['perf', 'stat', '-x', ',', '--no-big-num', '-e', ','.join(PERF_EVENTS), '-o', output_path, '--', 'sh', '-c', 'exec 2>&3 3>&-; exec "$@"', command[0]] + command
+    return ['sh', '-c', f'exec 3>&2 2>{shlex.quote(stderr_path)}; exec "$@"', 'perf'] + perf
+
+
+def event_column(event: str) -> str:
+    # cycles:u -> cycles, cpu_core/cycles/ (hybrid CPUs) -> cycles, LLC-load-misses -> llc_load_misses
+    event = event.split(':')[0]
+    if '/' in event:
+        event = event.split('/')[1]
+    return event.lower().replace('-', '_')
+
+
+def parse_perf_stat(text: str) -> dict[str, int]:
+    # CSV lines of perf stat -x ,: value,unit,event,run time,percentage,... Comments start with #.
+    # Events which were not counted or are not supported are left out, the counts of hybrid CPUs are added up
+    counters = {}
+    for line in text.splitlines():
+        fields = line.split(',')
+        if line.startswith('#') or len(fields) < 3:
+            continue
+        value, event = fields[0], fields[2]
+        try:
+            count = int(float(value))
+        except ValueError:
+            logging.debug(f'perf stat did not count {event}: {value}')
+            continue
+        column = event_column(event)
+        counters[column] = counters.get(column, 0) + count
+    return counters
+
+
+def perf_metrics(counters: dict[str, int], packets=None, prefix: str = '') -> dict:
+    # Counters and derived metrics of a process, packets is the number of UDP datagrams it received or sent
+    metrics = {f'{prefix}{column}': count for column, count in counters.items()}
+    if counters.get('cycles'):
+        metrics[f'{prefix}ipc'] = round(counters.get('instructions', 0) / counters['cycles'], 3)
+    if packets:
+        for column in ('cycles', 'cache_misses', 'llc_load_misses'):
+            if column in counters:
+                metrics[f'{prefix}{column}_per_packet'] = round(counters[column] / packets, 3)
+    return metrics
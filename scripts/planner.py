@@ -0,0 +1,120 @@
+# Campaign planning for udperf.py and benchmark.py.
+# Orders configs and runs so that costly host reconfigurations (MTU, fq pacing, affinity) happen as rarely as possible,
+# validates the run parameters against the flags of the udperf binary and estimates the wall time of a campaign.
+import csv
+import glob
+import logging
+import os
+import random
+import re
+import subprocess
+
+from ssh_pool import POOL
+
+JUMBOFRAMES_KEYWORD = 'jumboframes' # Configs with this keyword in their file name run with MTU_MAX
+# Fixed overheads in seconds, used if no measured overheads from previous campaigns are available
+REPETITION_OVERHEAD = 4.0 # Settle phase, process start and readiness barrier per repetition
+OVERHEAD_CAMPAIGNS = 3 # Run summaries of the latest campaigns of a config from which the overhead is measured
+
+# Run parameters which require a host reconfiguration when they change between two runs
+RECONFIGURATION_PARAMETERS = ['with-core-affinity', 'with-numa-affinity']
+
+
+def requires_jumboframes(config_file: str) -> bool:
+    return JUMBOFRAMES_KEYWORD in os.path.basename(config_file)
+
+
+def order_configs(config_files: list[str], shuffle=False, seed=None) -> list[str]:
+    # Configs with the default MTU first, then all jumboframes configs, so the MTU is changed only twice
+    groups = [[config for config in config_files if not requires_jumboframes(config)], [config for config in config_files if requires_jumboframes(config)]]
+    if shuffle:
+        shuffler = random.Random(seed)
+        for group in groups:
+            shuffler.shuffle(group)
+    return groups[0] + groups[1]
+
+
+def reconfiguration_key(run: dict) -> tuple:
+    # Pacing is enabled for every run with a limited sender bandwidth, see configure_pacing in benchmark.py
+    pacing = run["sender"].get("bandwidth", 0) != 0
+    return (pacing,) + tuple((run["sender"].get(parameter), run["receiver"].get(parameter)) for parameter in RECONFIGURATION_PARAMETERS)
+
+
+def order_runs(units: list[tuple], shuffle=False, seed=None) -> list[tuple]:
+    # units: list of (test name, run). Runs with the same reconfiguration key are grouped,
+    # the groups keep the order of their first run. With shuffle, the runs are shuffled within each group
+    groups = {}
+    for unit in units:
+        groups.setdefault(reconfiguration_key(unit[1]), []).append(unit)
+    if shuffle:
+        shuffler = random.Random(seed)
+        for group in groups.values():
+            shuffler.shuffle(group)
+    return [unit for group in groups.values() for unit in group]
+
+
+def count_reconfigurations(units: list[tuple]) -> int:
+    keys = [reconfiguration_key(run) for _, run in units]
+    return sum(1 for previous, current in zip(keys, keys[1:]) if previous != current)
+
+
+def read_udperf_help(binary: str, arguments: str = '--help', host=None):
+    command = f'{binary} {arguments}'
+    try:
+        if host is None:
+            result = subprocess.run(command, shell=True, capture_output=True, text=True)
+        else:
+            result = POOL.run(host, command, capture_output=True, text=True)
+    except OSError as e:
+        logging.error(f'Failed to run {command}: {e}')
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def udperf_flags(binary: str, host=None):
+    # Flags per mode. The modes are subcommands, if they do not have an own help, the help of the binary is used
+    flags = {}
+    for mode in ('sender', 'receiver'):
+        help_text = read_udperf_help(binary, f'{mode} --help', host) or read_udperf_help(binary, '--help', host)
+        if help_text is None:
+            logging.error(f'Failed to read the help of {binary} on {host or "localhost"}')
+            return None
+        flags[mode] = set(re.findall(r'--([a-z0-9][a-z0-9-]*)', help_text))
+    return flags
+
+
+def validate_run(run: dict, flags: dict[str, set]) -> list[str]:
+    # Returns the parameters of the run which are not a flag of udperf
+    return sorted(f'{mode}: {parameter}' for mode in ('sender', 'receiver') for parameter in run[mode] if parameter not in flags[mode])
+
+
+def previous_runs_files(summary_folder: str, config_file: str, count: int = OVERHEAD_CAMPAIGNS) -> list[str]:
+    # Run summaries of earlier campaigns of the config, runs-<config>-<timestamp>.csv (runs-<config>-<pair>-<campaign>.csv of scheduler.py), newest last
+    config_name = os.path.splitext(os.path.basename(config_file))[0]
+    runs_files = glob.glob(os.path.join(summary_folder, f'runs-{glob.escape(config_name)}-*.csv'))
+    return sorted(runs_files, key=os.path.getmtime)[-count:]
+
+
+def measured_overhead(runs_files: list[str]):
+    # Mean overhead per repetition of previous campaigns, from the duration recorded in the run summaries of benchmark.py.
+    # The duration only covers the repetitions measured in the campaign, resumed and reused ones took no time
+    overheads = []
+    for runs_file in runs_files:
+        with open(runs_file, 'r', newline='') as file:
+            for record in csv.DictReader(file):
+                try:
+                    repetitions = int(record.get('measured_repetitions') or record['repetitions'])
+                    if repetitions > 0 and record.get('memoized') != 'True':
+                        overheads.append(float(record['duration_seconds']) / repetitions - float(record['time']))
+                except (KeyError, TypeError, ValueError):
+                    continue
+    return max(sum(overheads) / len(overheads), 0.0) if overheads else None
+
+
+def estimate_run(run: dict, builds: int = 1, repetition_overhead: float = REPETITION_OVERHEAD) -> float:
+    return builds * run["repetitions"] * (float(run["sender"].get("time", 0)) + repetition_overhead)
+
+
+def format_duration(seconds: float) -> str:
+    hours, remainder = divmod(int(seconds), 3600)
+    return f'{hours}h {remainder // 60:02d}m {remainder % 60:02d}s'
@@ -0,0 +1,170 @@
+# Helpers to read and parse /proc files on the local host or on a remote host.
+# Remote files are read with a single command over the shared SSH connection or through the benchmark agent.
+import logging
+
+from ssh_pool import POOL
+
+FILE_SEPARATOR = '### udperf-procfs '
+
+# Socket states in /proc/net/{tcp,udp}
+TCP_LISTEN = '0A'
+UDP_UNCONNECTED = '07'
+
+
+def read_proc_files(host, paths: list[str], agent=None) -> dict[str, str]:
+    if agent is not None:
+        return agent.read_text(paths)
+
+    if host is None:
+        contents = {}
+        for path in paths:
+            try:
+                with open(path, 'r') as file:
+                    contents[path] = file.read()
+            except OSError:
+                contents[path] = ''
+        return contents
+
+    # Read all files with one remote command, separated by a marker line
+    command = '; '.join(f"echo '{FILE_SEPARATOR}{path}'; cat {path} 2>/dev/null" for path in paths)
+    result = POOL.run(host, command, capture_output=True, text=True)
+    if result.returncode != 0 and not result.stdout:
+        logging.error(f'Failed to read {paths} on {host}: {result.stderr}')
+        return {path: '' for path in paths}
+    return split_proc_output(result.stdout, paths)
+
+
+def split_proc_output(output: str, paths: list[str]) -> dict[str, str]:
+    contents = {path: '' for path in paths}
+    current_path = None
+    lines = []
+    for line in output.splitlines(keepends=True):
+        if line.startswith(FILE_SEPARATOR):
+            if current_path is not None:
+                contents[current_path] = ''.join(lines)
+            current_path = line[len(FILE_SEPARATOR):].strip()
+            lines = []
+        else:
+            lines.append(line)
+    if current_path is not None:
+        contents[current_path] = ''.join(lines)
+    return contents
+
+
+def parse_socket_table(text: str) -> list[dict]:
+    # Format of /proc/net/{tcp,tcp6,udp,udp6}:
+    #   sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode ref pointer drops
+    #    0: 00000000:AFC9 00000000:0000 07 00000000:00000000 00:00000000 00000000     0        0 12345 2 0000000000000000 0
+    sockets = []
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 10:
+            continue
+        local_address, local_port = fields[1].rsplit(':', 1)
+        remote_address, remote_port = fields[2].rsplit(':', 1)
+        tx_queue, rx_queue = fields[4].split(':')
+        sockets.append({
+            'local_address': local_address,
+            'local_port': int(local_port, 16),
+            'remote_address': remote_address,
+            'remote_port': int(remote_port, 16),
+            'state': fields[3],
+            'tx_queue': int(tx_queue, 16),
+            'rx_queue': int(rx_queue, 16),
+            'inode': int(fields[9]),
+            'drops': int(fields[12]) if len(fields) > 12 else 0,
+        })
+    return sockets
+
+
+def count_bound_sockets(host, protocol: str = 'udp', agent=None) -> dict[int, int]:
+    paths = [f'/proc/net/{protocol}', f'/proc/net/{protocol}6']
+    contents = read_proc_files(host, paths, agent)
+
+    counts = {}
+    for path in paths:
+        for entry in parse_socket_table(contents[path]):
+            # TCP sockets are only ready when listening, UDP sockets as soon as they are bound
+            if protocol == 'tcp' and entry['state'] != TCP_LISTEN:
+                continue
+            counts[entry['local_port']] = counts.get(entry['local_port'], 0) + 1
+    return counts
+
+
+def parse_stat(text: str) -> dict[str, list[int]]:
+    # Lines of /proc/stat starting with cpu: cpu user nice system idle iowait irq softirq steal guest guest_nice
+    cpus = {}
+    for line in text.splitlines():
+        if line.startswith('cpu'):
+            fields = line.split()
+            cpus[fields[0]] = [int(value) for value in fields[1:]]
+    return cpus
+
+
+def cpu_busy_percent(before: list[int], after: list[int]) -> float:
+    deltas = [a - b for a, b in zip(after, before)]
+    total = sum(deltas[:8]) # guest times are already part of user and nice
+    idle = deltas[3] + deltas[4] # idle + iowait
+    return (total - idle) / total * 100 if total > 0 else 0.0
+
+
+def parse_softirqs(text: str) -> dict[str, dict[int, int]]:
+    # Softirq -> CPU -> count. The columns are matched to the CPUn header, since offline CPUs leave gaps in the numbering
+    lines = text.splitlines()
+    if not lines:
+        return {}
+    cpus = [int(name[len('CPU'):]) for name in lines[0].split()]
+    softirqs = {}
+    for line in lines[1:]:
+        fields = line.split()
+        if fields and fields[0].endswith(':'):
+            softirqs[fields[0][:-1]] = dict(zip(cpus, (int(value) for value in fields[1:])))
+    return softirqs
+
+
+NET_DEV_FIELDS = ['rx_bytes', 'rx_packets', 'rx_errs', 'rx_drop', 'rx_fifo', 'rx_frame', 'rx_compressed', 'rx_multicast',
+                  'tx_bytes', 'tx_packets', 'tx_errs', 'tx_drop', 'tx_fifo', 'tx_colls', 'tx_carrier', 'tx_compressed']
+
+
+def parse_net_dev(text: str) -> dict[str, dict[str, int]]:
+    interfaces = {}
+    for line in text.splitlines()[2:]:
+        if ':' not in line:
+            continue
+        name, values = line.split(':', 1)
+        interfaces[name.strip()] = dict(zip(NET_DEV_FIELDS, (int(value) for value in values.split())))
+    return interfaces
+
+
+def parse_snmp(text: str) -> dict[str, dict[str, int]]:
+    # /proc/net/snmp consists of pairs of lines per protocol: a header line and a value line
+    protocols = {}
+    lines = text.splitlines()
+    for header, values in zip(lines[0::2], lines[1::2]):
+        protocol, names = header.split(':', 1)
+        _, numbers = values.split(':', 1)
+        protocols[protocol] = dict(zip(names.split(), (int(number) for number in numbers.split())))
+    return protocols
+
+
+def parse_softnet_stat(text: str) -> dict[int, dict[str, int]]:
+    # One line of hex values per online CPU: processed dropped time_squeeze ... Since Linux 5.10 the 13th value is the CPU,
+    # older kernels only list the online CPUs in order
+    cpus = {}
+    for index, line in enumerate(text.splitlines()):
+        fields = [int(value, 16) for value in line.split()]
+        if len(fields) < 3:
+            continue
+        cpu = fields[12] if len(fields) > 12 else index
+        cpus[cpu] = {'processed': fields[0], 'dropped': fields[1], 'time_squeeze': fields[2]}
+    return cpus
+
+
+def parse_sockstat(text: str) -> dict[str, dict[str, int]]:
+    # Lines of /proc/net/sockstat like "UDP: inuse 4 mem 12", mem is counted in pages
+    protocols = {}
+    for line in text.splitlines():
+        protocol, _, values = line.partition(':')
+        fields = values.split()
+        protocols[protocol] = {name: int(value) for name, value in zip(fields[0::2], fields[1::2]) if value.isdigit()}
+    return protocols
@@ -0,0 +1,45 @@
+# Start barrier between receiver and sender.
+# Instead of sleeping a fixed time after starting the receiver, wait until every socket the receiver
+# is expected to open is bound on the receiver host, then release the sender immediately.
+import logging
+import time
+
+from procfs import count_bound_sockets
+
+READY_TIMEOUT = 10 # Seconds to wait for all receiver sockets
+POLL_INTERVAL = 0.05
+
+
+def expected_receiver_sockets(receiver_config: dict) -> dict[int, int]:
+    port = int(receiver_config.get('port', 45001))
+    parallel = int(receiver_config.get('parallel', 1))
+    multiplex_port = receiver_config.get('multiplex-port-receiver', 'individual')
+
+    if multiplex_port == 'sharding':
+        # All threads bind their own socket to the same port (SO_REUSEPORT)
+        return {port: parallel}
+    elif multiplex_port == 'sharing':
+        # All threads share a single socket
+        return {port: 1}
+    else:
+        # Every thread binds its own socket to its own port
+        return {port + i: 1 for i in range(parallel)}
+
+
+def wait_for_sockets(host, expected: dict[int, int], protocol: str = 'udp', timeout: float = READY_TIMEOUT, abort=None, agent=None) -> bool:
+    start = time.monotonic()
+    missing = expected
+
+    while time.monotonic() - start < timeout:
+        counts = count_bound_sockets(host, protocol, agent)
+        missing = {port: (counts.get(port, 0), amount) for port, amount in expected.items() if counts.get(port, 0) < amount}
+        if not missing:
+            logging.info(f'Receiver on {host or "localhost"} ready after {time.monotonic() - start:.2f}s')
+            return True
+        if abort is not None and abort():
+            logging.error(f'Receiver on {host or "localhost"} exited before all sockets were bound. Missing {protocol} sockets (port: (bound, expected)): {missing}')
+            return False
+        time.sleep(POLL_INTERVAL)
+
+    logging.error(f'Receiver on {host or "localhost"} not ready after {timeout}s. Missing {protocol} sockets (port: (bound, expected)): {missing}')
+    return False
@@ -0,0 +1,140 @@
+# Reading the udperf result files during a benchmark and recording a summary per run.
+# udperf writes one row per interval and a summary row (interval_id 0) per repetition into its result CSV.
+# It only appends to the file, so after every repetition only the new rows are read from the hosts (ResultTail).
+import csv
+from dataclasses import dataclass
+import io
+import logging
+import os
+import shlex
+from typing import Optional
+
+from agent import AgentClient, AgentError
+from ssh_pool import POOL
+
+
+def read_result_file(path: str, host=None, agent=None, offset: int = 0) -> str:
+    # Content of the file from the byte offset on
+    try:
+        if agent is not None:
+            return agent.fetch_file(path, offset).decode()
+        if host is None:
+            with open(path, 'rb') as file:
+                file.seek(offset)
+                return file.read().decode()
+    except (AgentError, OSError) as e:
+        logging.error(f'Failed to read result file {path} on {host or "localhost"}: {e}')
+        return ''
+
+    result = POOL.run(host, f'tail -c +{offset + 1} {path}', capture_output=True, text=True)
+    if result.returncode != 0:
+        logging.error(f'Failed to read result file {path} on {host}: {result.stderr}')
+    return result.stdout
+
+
+@dataclass
+class ResultTail:
+    # Rows appended to a result file since it was read the last time, with the header of the file
+    path: str
+    host: Optional[str] = None
+    agent: Optional[AgentClient] = None
+    offset: int = 0 # Bytes read so far, up to the last complete row
+    header: str = ''
+    text: str = '' # Header and the rows of the last read
+
+    def read(self):
+        data = read_result_file(self.path, self.host, self.agent, self.offset)
+        complete = data[:data.rfind('\n') + 1]
+        if not complete:
+            return
+        if self.offset == 0:
+            header, _, complete = complete.partition('\n')
+            self.header = header + '\n'
+            self.offset = len(self.header.encode())
+        self.offset += len(complete.encode())
+        self.text = self.header + complete
+
+    def repetition_text(self, test_name: str, run_name: str, repetition_id: int) -> str:
+        # Result rows which contain the repetition. Rows read before, e.g. of a resumed repetition, are read from the whole file
+        self.read()
+        if repetition_rows(self.text, test_name, run_name, repetition_id)[1]:
+            return self.text
+        return read_result_file(self.path, self.host, self.agent)
+
+
+def repetition_rows(text: str, test_name: str, run_name: str, repetition_id: int) -> tuple[list[str], list[dict]]:
+    # Header and rows of a repetition in a result file
+    reader = csv.DictReader(io.StringIO(text))
+    rows = [row for row in reader if row.get('test_name') == test_name and row.get('run_name') == str(run_name) and row.get('repetition_id', '1') == str(repetition_id)]
+    return list(reader.fieldnames or []), rows
+
+
+def repetition_value(text: str, test_name: str, run_name: str, repetition_id: int, column: str = 'data_rate_gbit'):
+    # Value of the summary row of a repetition, or the mean of its intervals if there is no summary row
+    _, rows = repetition_rows(text, test_name, run_name, repetition_id)
+    if not rows:
+        return None
+
+    try:
+        summary_rows = [row for row in rows if row.get('interval_id') == '0']
+        if summary_rows:
+            # A failed attempt may have left rows of the same repetition, the last attempt counts
+            return float(summary_rows[-1][column])
+        return sum(float(row[column]) for row in rows) / len(rows)
+    except (KeyError, ValueError):
+        logging.error(f'Result rows of {test_name}/{run_name} repetition {repetition_id} have no valid {column}')
+        return None
+
+
+def copy_result_rows(source: str, target: str, test_name: str, run_name: str, repetition_id: int, labels: dict, host=None) -> bool:
+    # Copies the rows of an already measured repetition from a local file of the results index into the result file
+    # of the current campaign on the host, with the labels replaced
+    fieldnames, rows = repetition_rows(read_result_file(source), test_name, run_name, repetition_id)
+    if not rows:
+        logging.error(f'No rows of {test_name}/{run_name} repetition {repetition_id} found in {source}')
+        return False
+
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames, lineterminator='\n')
+    writer.writerows({**row, **{k: v for k, v in labels.items() if k in row}} for row in rows)
+    header = ','.join(fieldnames)
+
+    if host is None:
+        new_file = not os.path.exists(target) or os.path.getsize(target) == 0
+        with open(target, 'a') as file:
+            file.write(f'{header}\n' if new_file else '')
+            file.write(output.getvalue())
+        return True
+
+    # The header is only written if udperf did not create the file yet
+    command = f'mkdir -p "$(dirname {shlex.quote(target)})" && (test -s {shlex.quote(target)} || echo {shlex.quote(header)} > {shlex.quote(target)}) && cat >> {shlex.quote(target)}'
+    result = POOL.run(host, command, input=output.getvalue(), capture_output=True, text=True)
+    if result.returncode != 0:
+        logging.error(f'Failed to copy rows of {test_name}/{run_name} to {target} on {host}: {result.stderr}')
+        return False
+    return True
+
+
+def append_run_record(path: str, record: dict):
+    # Appends a row to the local runs CSV. The file is rewritten if a record brings new columns
+    rows = []
+    existing_fieldnames = []
+    if os.path.exists(path):
+        with open(path, 'r', newline='') as file:
+            reader = csv.DictReader(file)
+            rows = list(reader)
+            existing_fieldnames = list(reader.fieldnames or [])
+    fieldnames = existing_fieldnames + [key for key in record if key not in existing_fieldnames]
+
+    if existing_fieldnames and fieldnames == existing_fieldnames:
+        with open(path, 'a', newline='') as file:
+            csv.DictWriter(file, fieldnames=fieldnames).writerow(record)
+        return
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows + [record])
@@ -0,0 +1,84 @@
+# Local index of measured repetitions, used by benchmark.py to skip runs which were already measured with identical inputs.
+# A run is identified by a hash of its merged receiver and sender config, the checksum of the udperf binary and a fingerprint
+# of the hosts (kernel, CPU, memory, MTU). The index is an append-only JSON-lines file in the summary folder,
+# every line describes one successful repetition and the local copies of its result rows. The rows are kept in the folder
+# results-index next to it, because the result files on the hosts are deleted when run.py collects them.
+import csv
+import hashlib
+import json
+import logging
+import os
+import time
+
+from build_cache import execute
+
+INDEX_FILE_NAME = 'results-index.jsonl'
+INDEX_ROWS_FOLDER = 'results-index' # <run hash>-<nanoseconds>-<role>.csv, the rows of one repetition per file
+
+FINGERPRINT_COMMAND = ' && '.join([
+    'hostname',
+    'uname -r',
+    "grep -m 1 'model name' /proc/cpuinfo",
+    'nproc',
+    "grep MemTotal /proc/meminfo",
+])
+
+
+def index_path(results_folder: str) -> str:
+    return os.path.join(results_folder, INDEX_FILE_NAME)
+
+
+def rows_path(index_file: str, key: str, role: str) -> str:
+    return os.path.join(os.path.dirname(index_file), INDEX_ROWS_FOLDER, f'{key[:16]}-{time.time_ns()}-{role}.csv')
+
+
+def store_rows(path: str, fieldnames: list[str], rows: list[dict]) -> bool:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=fieldnames, lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(rows)
+    except OSError as e:
+        logging.error(f'Failed to store the rows of the results index in {path}: {e}')
+        return False
+    return True
+
+
+def host_fingerprint(host=None, interface=None):
+    # Returns a hash of the properties of a host which influence the results, or None if they cannot be read
+    command = FINGERPRINT_COMMAND + (f' && cat /sys/class/net/{interface}/mtu' if interface else '')
+    result = execute(host, command, capture_output=True, text=True)
+    if result.returncode != 0:
+        logging.error(f'Failed to read the fingerprint of {host or "localhost"}: {result.stderr}')
+        return None
+    return hashlib.sha256(result.stdout.encode()).hexdigest()[:16]
+
+
+def run_hash(run: dict, binary_checksum: str, fingerprints: list[str]) -> str:
+    # The run name and the number of repetitions do not change the measurement
+    spec = json.dumps({'receiver': run['receiver'], 'sender': run['sender'], 'binary': binary_checksum, 'hosts': fingerprints}, sort_keys=True, default=str)
+    return hashlib.sha256(spec.encode()).hexdigest()
+
+
+def load_index(path: str) -> dict[str, list[dict]]:
+    # Maps each run hash to its measured repetitions. Lines of an interrupted write are skipped
+    index = {}
+    if not os.path.exists(path):
+        return index
+    with open(path, 'r') as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+                index.setdefault(entry['hash'], []).append(entry)
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+    return index
+
+
+def append_index_entry(path: str, entry: dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a') as file:
+        file.write(json.dumps({**entry, 'timestamp': time.time()}) + '\n')
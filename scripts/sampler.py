@@ -0,0 +1,205 @@
+# Per-run sampler of host counters, started by benchmark.py on both hosts next to the udperf receiver and sender.
+# Every --interval seconds (the udperf interval of the run) the /proc files of the selected sources are read and one row
+# per CPU (or socket) and interval is appended to a CSV file per source, tagged with test, run and repetition like the udperf results.
+# interval_id counts the intervals since the start of the run, like the interval_id of udperf, and timestamp is the unix time
+# at the end of the interval, so the samples can be joined to the udperf CSV (visualize/join_samples.py).
+# The sampler runs until it is stopped; every row is flushed, so an interrupted run keeps the samples taken so far.
+import argparse
+import csv
+import os
+import sys
+import time
+
+from loss_counters import LOSS_COLUMNS, LOSS_PATHS, counter_deltas, parse_loss_counters
+from procfs import parse_socket_table, parse_sockstat, parse_softirqs, parse_softnet_stat, parse_stat
+
+SAMPLE_INTERVAL = 0.5 # Seconds, if the run has no udperf interval
+SAMPLES_EXTENSION = '.samples.csv' # Keeps the sample files apart from the udperf result CSVs
+REMOTE_SAMPLER = 'udperf-benchmark/scripts/sampler.py' # Next to agent.py, relative to the home directory of the remote host
+BENCHMARK_PORTS = range(45000, 45020) # Ports used by udperf and iperf, if none are given
+
+LABEL_COLUMNS = ['test_name', 'run_name', 'repetition_id', 'interval_id', 'timestamp']
+CPU_COLUMNS = ['cpu', 'busy_percent', 'user_percent', 'system_percent', 'irq_percent', 'softirq_percent', 'net_rx_per_second', 'net_tx_per_second']
+DROP_COLUMNS = ['cpu', 'softnet_processed_per_second'] + LOSS_COLUMNS
+SOCKET_COLUMNS = ['socket', 'local_port', 'remote_port', 'rx_queue_bytes', 'tx_queue_bytes', 'drops', 'udp_inuse', 'udp_mem_pages', 'udp_mem_pressure_pages']
+SOCKET_PATHS = ['/proc/net/udp', '/proc/net/udp6', '/proc/net/sockstat', '/proc/sys/net/ipv4/udp_mem']
+
+
+def percent(part: int, total: int) -> float:
+    return round(part / total * 100, 2) if total > 0 else 0.0
+
+
+def softirq_delta(before: dict[int, int], after: dict[int, int], cpu: str) -> int:
+    if cpu == 'all':
+        return sum(after.values()) - sum(before.values())
+    return after.get(int(cpu), 0) - before.get(int(cpu), 0)
+
+
+def cpu_rows(before: dict, after: dict, elapsed: float, ports: set) -> list[dict]:
+    # One row per CPU and one for the whole host (cpu "all"). Fields of /proc/stat: user nice system idle iowait irq softirq steal
+    stat_before, stat_after = parse_stat(before['/proc/stat']), parse_stat(after['/proc/stat'])
+    softirqs_before, softirqs_after = parse_softirqs(before['/proc/softirqs']), parse_softirqs(after['/proc/softirqs'])
+    rows = []
+    for name, values in stat_after.items():
+        if name not in stat_before:
+            continue
+        deltas = [a - b for a, b in zip(values, stat_before[name])]
+        total = sum(deltas[:8])
+        cpu = 'all' if name == 'cpu' else name[len('cpu'):]
+        net_rx, net_tx = (softirq_delta(softirqs_before.get(softirq, {}), softirqs_after.get(softirq, {}), cpu) for softirq in ('NET_RX', 'NET_TX'))
+        rows.append({
+            'cpu': cpu,
+            'busy_percent': percent(total - deltas[3] - deltas[4], total),
+            'user_percent': percent(deltas[0] + deltas[1], total),
+            'system_percent': percent(deltas[2], total),
+            'irq_percent': percent(deltas[5], total),
+            'softirq_percent': percent(deltas[6], total),
+            'net_rx_per_second': round(net_rx / elapsed),
+            'net_tx_per_second': round(net_tx / elapsed),
+        })
+    return rows
+
+
+def drop_rows(before: dict, after: dict, elapsed: float, ports: set) -> list[dict]:
+    # Backlog drops per CPU, and all drop counters of the interval for the whole host (cpu "all")
+    softnet_before, softnet_after = parse_softnet_stat(before['/proc/net/softnet_stat']), parse_softnet_stat(after['/proc/net/softnet_stat'])
+    rows = [{'cpu': 'all', 'softnet_processed_per_second': round((sum(cpu['processed'] for cpu in softnet_after.values()) - sum(cpu['processed'] for cpu in softnet_before.values())) / elapsed),
+             **counter_deltas(parse_loss_counters(before), parse_loss_counters(after))}]
+    for cpu, values in softnet_after.items():
+        if cpu not in softnet_before:
+            continue
+        rows.append({
+            'cpu': str(cpu),
+            'softnet_processed_per_second': round((values['processed'] - softnet_before[cpu]['processed']) / elapsed),
+            'softnet_dropped': values['dropped'] - softnet_before[cpu]['dropped'],
+            'softnet_time_squeeze': values['time_squeeze'] - softnet_before[cpu]['time_squeeze'],
+        })
+    return rows
+
+
+def benchmark_sockets(contents: dict, ports: set) -> dict[int, dict]:
+    # UDP sockets of the benchmark by inode: bound to a benchmark port (receiver) or connected to one (sender)
+    sockets = {}
+    for path in ('/proc/net/udp', '/proc/net/udp6'):
+        for entry in parse_socket_table(contents[path]):
+            if entry['local_port'] in ports or entry['remote_port'] in ports:
+                sockets[entry['inode']] = entry
+    return sockets
+
+
+def socket_rows(before: dict, after: dict, elapsed: float, ports: set) -> list[dict]:
+    # Receive queue occupancy at the end of the interval and drops during the interval per socket,
+    # and the UDP memory of the host (socket "all"), which is limited by the pressure threshold of net.ipv4.udp_mem
+    sockets_before, sockets_after = benchmark_sockets(before, ports), benchmark_sockets(after, ports)
+    udp = parse_sockstat(after['/proc/net/sockstat']).get('UDP', {})
+    udp_mem = after['/proc/sys/net/ipv4/udp_mem'].split()
+    rows = []
+    for inode, entry in sockets_after.items():
+        rows.append({
+            'socket': str(inode),
+            'local_port': entry['local_port'],
+            'remote_port': entry['remote_port'],
+            'rx_queue_bytes': entry['rx_queue'],
+            'tx_queue_bytes': entry['tx_queue'],
+            # A socket opened during the interval dropped all of its packets in it
+            'drops': entry['drops'] - sockets_before[inode]['drops'] if inode in sockets_before else entry['drops'],
+        })
+    rows.insert(0, {
+        'socket': 'all',
+        'rx_queue_bytes': sum(row['rx_queue_bytes'] for row in rows),
+        'tx_queue_bytes': sum(row['tx_queue_bytes'] for row in rows),
+        'drops': sum(row['drops'] for row in rows),
+        'udp_inuse': udp.get('inuse'),
+        'udp_mem_pages': udp.get('mem'),
+        'udp_mem_pressure_pages': int(udp_mem[1]) if len(udp_mem) == 3 else None,
+    })
+    return rows
+
+
+# Source name -> (read /proc files, function computing the rows of an interval from the files before and after it,
+# the seconds in between and the benchmark ports, columns)
+SOURCES = {
+    'cpu': (['/proc/stat', '/proc/softirqs'], cpu_rows, CPU_COLUMNS),
+    'drops': (LOSS_PATHS, drop_rows, DROP_COLUMNS),
+    'sockets': (SOCKET_PATHS, socket_rows, SOCKET_COLUMNS),
+}
+
+
+def sample_file_path(results_folder: str, role: str, source: str, file_name: str) -> str:
+    # receiver-cpu-<results file without .csv>.samples.csv
+    return f'{results_folder}{role}-{source}-{file_name.removesuffix(".csv")}{SAMPLES_EXTENSION}'
+
+
+def sampler_command(sources: list[str], interval: float, results_folder: str, role: str, file_name: str, test_name: str, run_name: str, repetition_id: int, ports: list[int], host=None) -> list[str]:
+    sampler = ['python3', REMOTE_SAMPLER] if host else [sys.executable, os.path.abspath(__file__)]
+    return sampler + ['--sources', *sources, '--interval', str(interval), '--results-folder', results_folder, '--role', role, '--file-name', file_name,
+                      '--label-test', test_name, '--label-run', run_name, '--repetition-id', str(repetition_id),
+                      '--ports', *[str(port) for port in ports]]
+
+
+def read_files(paths: list[str]) -> dict[str, str]:
+    contents = {}
+    for path in paths:
+        try:
+            with open(path, 'r') as file:
+                contents[path] = file.read()
+        except OSError:
+            contents[path] = ''
+    return contents
+
+
+def open_writer(path: str, columns: list[str]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    file = open(path, 'a', newline='')
+    writer = csv.DictWriter(file, fieldnames=LABEL_COLUMNS + columns)
+    if new_file:
+        writer.writeheader()
+    return file, writer
+
+
+def sample(sources: list[str], interval: float, results_folder: str, role: str, file_name: str, labels: dict, ports: set):
+    paths = sorted({path for source in sources for path in SOURCES[source][0]})
+    outputs = {}
+    for source in sources:
+        outputs[source] = open_writer(sample_file_path(results_folder, role, source, file_name), SOURCES[source][2])
+
+    start = time.monotonic()
+    before = read_files(paths)
+    previous = start
+    interval_id = 0
+    while True:
+        interval_id += 1
+        # Scheduled from the start, so the intervals do not drift apart from the udperf intervals
+        time.sleep(max(0.0, start + interval_id * interval - time.monotonic()))
+        after = read_files(paths)
+        now = time.monotonic()
+        row_labels = {**labels, 'interval_id': interval_id, 'timestamp': round(time.time(), 3)}
+        for source in sources:
+            file, writer = outputs[source]
+            writer.writerows({**row_labels, **row} for row in SOURCES[source][1](before, after, now - previous, ports))
+            file.flush()
+        before, previous = after, now
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sample host counters per interval during a benchmark run')
+    parser.add_argument('--sources', nargs='+', choices=list(SOURCES), default=['cpu'], help='Counters to sample')
+    parser.add_argument('--interval', type=float, default=SAMPLE_INTERVAL, help='Seconds between two samples')
+    parser.add_argument('--results-folder', required=True, help='Folder of the udperf result files, the samples are written next to them')
+    parser.add_argument('--role', choices=['receiver', 'sender'], required=True, help='Role of the host in the run')
+    parser.add_argument('--file-name', required=True, help='Name of the udperf result file of the run')
+    parser.add_argument('--label-test', required=True, help='Test name of the run')
+    parser.add_argument('--label-run', required=True, help='Run name of the run')
+    parser.add_argument('--repetition-id', type=int, required=True, help='Repetition of the run')
+    parser.add_argument('--ports', type=int, nargs='+', default=list(BENCHMARK_PORTS), help='Ports of the receiver sockets, the sockets source only samples sockets bound or connected to them')
+    args = parser.parse_args()
+
+    labels = {'test_name': args.label_test, 'run_name': args.label_run, 'repetition_id': args.repetition_id}
+    sample(args.sources, args.interval, args.results_folder, args.role, args.file_name, labels, set(args.ports))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+# Shards a benchmark campaign across several identical host pairs (testbeds).
+# The configs are expanded into a queue of runs, every pair takes the next run from the queue as soon as it is free
+# and executes it with its own Benchmark instance of benchmark.py, connected once per pair. Each pair writes its own result files (<config>-<pair>-<campaign>.csv) and
+# adds its name to the run summaries. A pair that fails its health check is drained, its run goes back to the queue.
+# The udperf binaries are built once per campaign for all pairs. Every dispatched run is a unit of the journal,
+# so --resume continues the campaign with the runs which were not completed, on any pair.
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+import logging
+import os
+import threading
+import time
+
+from benchmark import PATH_TO_udperf_BIN, Benchmark, BenchmarkOptions, argument_parser, options_from_args, parse_config_file, result_failed, test_ssh_connection
+from journal import completed_units, journal_path, load_events, record, resolve_campaign, unit_key
+from planner import order_configs, order_runs, requires_jumboframes
+from results import append_run_record
+from ssh_pool import POOL
+from udperf import CONFIGS_FOLDER, MTU_DEFAULT, MTU_MAX, RESULTS_FOLDER, SUMMARY_FOLDER, change_mtu, replace_ip_in_config
+
+MAX_UNIT_ATTEMPTS = 2 # Attempts per run on healthy pairs, before the run counts as failed
+POLL_INTERVAL = 1 # Seconds an idle pair waits for runs which may return to the queue
+MAX_CONSECUTIVE_FAILURES = 3 # Failed runs in a row after which a pair is drained, e.g. a broken NIC which still has a link
+
+
+def parse_pair(spec: str) -> dict:
+    # receiver,sender[,receiver_interface,sender_interface]
+    fields = spec.split(',')
+    if len(fields) not in (2, 4):
+        raise argparse.ArgumentTypeError(f'Invalid host pair {spec}, expected receiver,sender[,receiver_interface,sender_interface]')
+    receiver, sender = fields[:2]
+    receiver_interface, sender_interface = fields[2:] if len(fields) == 4 else (None, None)
+    return {'name': f'{receiver}-{sender}', 'receiver': receiver, 'sender': sender, 'receiver_interface': receiver_interface, 'sender_interface': sender_interface}
+
+
+def pair_healthy(pair: dict) -> bool:
+    for host, interface in ((pair['receiver'], pair['receiver_interface']), (pair['sender'], pair['sender_interface'])):
+        if not test_ssh_connection(host):
+            return False
+        if interface:
+            result = POOL.run(host, f'cat /sys/class/net/{interface}/operstate', capture_output=True, text=True)
+            if result.returncode != 0 or result.stdout.strip() != 'up':
+                logging.error(f'Interface {interface} of {host} is not up: {result.stdout.strip() or result.stderr.strip()}')
+                return False
+    return True
+
+
+def journal_unit(campaign: str, unit: tuple) -> dict:
+    config_file, test_name, run_name = unit
+    return {'campaign': campaign, 'config_file': config_file, 'test_name': test_name, 'run_name': run_name}
+
+
+def build_queue(config_files: list[str], reorder=False, shuffle=False, seed=None, campaign=None, completed=frozenset()) -> deque:
+    # Units are (config file, test name, run name). Jumboframes configs come last, so each pair changes the MTU only once.
+    # Runs completed in the resumed campaign are left out
+    queue = deque()
+    for config_file in order_configs(config_files, shuffle, seed):
+        units = [(config['test_name'], run) for config in parse_config_file(config_file) for run in config['runs']]
+        if reorder or shuffle:
+            units = order_runs(units, shuffle, seed)
+        queue.extend(unit for unit in ((config_file, test_name, str(run['run_name'])) for test_name, run in units)
+                     if unit_key(journal_unit(campaign, unit)) not in completed)
+    return queue
+
+
+def next_unit(state: dict, pair_name=None):
+    # Returns None once the queue is empty and no other pair may return a run to it.
+    # Runs which already failed on the pair are left to the other pairs, unless no other run is left
+    while True:
+        with state['lock']:
+            if state['queue']:
+                state['in_flight'] += 1
+                unit = next((unit for unit in state['queue'] if pair_name not in state['failed_pairs'].get(unit, ())), state['queue'][0])
+                state['queue'].remove(unit)
+                return unit
+            if state['in_flight'] == 0:
+                return None
+        time.sleep(POLL_INTERVAL)
+
+
+def finish_unit(state: dict, unit: tuple, requeue: bool):
+    with state['lock']:
+        if requeue:
+            state['queue'].appendleft(unit)
+        state['in_flight'] -= 1
+
+
+def set_pair_mtu(pair: dict, mtu: int):
+    if pair['receiver_interface'] and pair['sender_interface']:
+        change_mtu(mtu, pair['receiver'], pair['receiver_interface'], os.environ.copy())
+        change_mtu(mtu, pair['sender'], pair['sender_interface'], os.environ.copy())
+
+
+def pair_options(pair: dict, options: BenchmarkOptions, campaign: str) -> BenchmarkOptions:
+    # A resumed run may be dispatched to another pair, so it is measured completely instead of resuming its repetitions
+    interfaces = pair['receiver_interface'] and pair['sender_interface']
+    return replace(options, ssh_receiver=pair['receiver'], ssh_sender=pair['sender'], pair=pair['name'], campaign=campaign, resume=False,
+                   receiver_interface=pair['receiver_interface'] if interfaces else None, sender_interface=pair['sender_interface'] if interfaces else None)
+
+
+def provide_campaign_builds(pairs: list[dict], config_files: list[str], options: BenchmarkOptions, campaign: str):
+    # Builds every revision and build variant of the configs once for the hosts of all pairs, they get a copy from the build host.
+    # Returns the binaries for Benchmark.binaries, None on failure
+    hosts = [host for pair in pairs for host in (pair['receiver'], pair['sender'])]
+    benchmark = Benchmark(pair_options(pairs[0], options, campaign))
+    for config_file in config_files:
+        if benchmark.provide_builds(config_file, hosts) is None:
+            return None
+    return benchmark.binaries
+
+
+def run_unit(benchmark: Benchmark, pair: dict, unit: tuple, campaign: str) -> bool:
+    config_file, test_name, run_name = unit
+    results_file = f'{os.path.splitext(os.path.basename(config_file))[0]}-{pair["name"]}-{campaign}.csv'
+    try:
+        results = benchmark.run_config(config_file, results_file, only_runs=[[test_name, run_name]])
+        return results is not None and not any(result_failed(result) for result in results)
+    except Exception as e:
+        logging.exception(f'Pair {pair["name"]}: run {test_name}/{run_name} of {config_file} failed: {e}')
+        return False
+
+
+def run_pair(pair: dict, state: dict, campaign: str, options: BenchmarkOptions, binaries: dict):
+    benchmark = Benchmark(pair_options(pair, options, campaign))
+    benchmark.binaries.update(binaries)
+    if not benchmark.connect():
+        logging.error(f'Pair {pair["name"]} failed to connect, draining it')
+        state['drained'].append(pair['name'])
+        return
+    current_mtu = MTU_DEFAULT
+    attempts = state['attempts']
+    consecutive_failures = 0
+    while (unit := next_unit(state, pair['name'])) is not None:
+        if not pair_healthy(pair):
+            logging.error(f'Pair {pair["name"]} failed its health check, draining it')
+            finish_unit(state, unit, requeue=True)
+            state['drained'].append(pair['name'])
+            break
+
+        mtu = MTU_MAX if requires_jumboframes(unit[0]) else MTU_DEFAULT
+        if mtu != current_mtu:
+            set_pair_mtu(pair, mtu)
+            benchmark.refresh_fingerprints()
+            current_mtu = mtu
+
+        logging.info(f'Pair {pair["name"]}: running {unit[1]}/{unit[2]} of {unit[0]}')
+        record(state['journal'], 'started', **journal_unit(campaign, unit), pair=pair['name'])
+        start = time.monotonic()
+        success = run_unit(benchmark, pair, unit, campaign)
+        record(state['journal'], 'done' if success else 'failed', **journal_unit(campaign, unit), pair=pair['name'])
+        with state['lock']:
+            append_run_record(state['dispatch_file'], {'config_file': unit[0], 'test_name': unit[1], 'run_name': unit[2], 'pair': pair['name'],
+                                                       'success': success, 'duration_seconds': round(time.monotonic() - start, 2)})
+        if success:
+            consecutive_failures = 0
+            finish_unit(state, unit, requeue=False)
+            continue
+
+        consecutive_failures += 1
+        with state['lock']:
+            attempts[unit] = attempts.get(unit, 0) + 1
+            state['failed_pairs'].setdefault(unit, set()).add(pair['name'])
+            retry = attempts[unit] < MAX_UNIT_ATTEMPTS
+        if not retry:
+            logging.error(f'Run {unit[1]}/{unit[2]} of {unit[0]} failed {MAX_UNIT_ATTEMPTS} times, giving up')
+            state['failed'].append(unit)
+        finish_unit(state, unit, requeue=retry)
+        if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+            logging.error(f'Pair {pair["name"]} failed {consecutive_failures} runs in a row, draining it')
+            state['drained'].append(pair['name'])
+            break
+
+    if current_mtu != MTU_DEFAULT:
+        set_pair_mtu(pair, MTU_DEFAULT)
+    benchmark.close()
+
+
+def new_state(queue: deque, summary_folder: str, campaign: str) -> dict:
+    return {
+        'queue': queue,
+        'in_flight': 0,
+        'lock': threading.Lock(),
+        'attempts': {},
+        'failed_pairs': {}, # Run -> pairs on which it failed
+        'failed': [],
+        'drained': [],
+        'journal': journal_path(summary_folder),
+        'dispatch_file': f'{summary_folder}scheduler-{campaign}.csv',
+    }
+
+
+def dispatch(pairs: list[dict], state: dict, campaign: str, options: BenchmarkOptions, binaries: dict):
+    with ThreadPoolExecutor(max_workers=max(len(pairs), 1)) as executor:
+        futures = [executor.submit(run_pair, pair, state, campaign, options, binaries) for pair in pairs]
+        for future in futures:
+            future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Distribute the runs of benchmark configs across several host pairs. Unknown options are passed to benchmark.py')
+    parser.add_argument('configs', nargs='+', help='Benchmark config files, relative to the configs folder or as path')
+    parser.add_argument('--pairs', nargs='+', type=parse_pair, required=True, help='Host pairs as receiver,sender[,receiver_interface,sender_interface]')
+    parser.add_argument('--receiver-ip', default=None, help='IP address of the receivers, written into the configs like udperf.py does')
+    parser.add_argument('--results-folder', default=RESULTS_FOLDER, help='Path to results folder')
+    parser.add_argument('--reorder', action='store_true', help='Group the runs of each config by pacing and affinity, see planner.py')
+    parser.add_argument('--shuffle', action='store_true', help='Shuffle the configs and runs within their groups')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for --shuffle')
+    args, benchmark_arguments = parser.parse_known_args()
+    options = options_from_args(argument_parser().parse_args(benchmark_arguments))
+    options.udperf_bin = options.udperf_repo + PATH_TO_udperf_BIN
+    options.results_folder = args.results_folder
+    options.summary_folder = options.summary_folder or SUMMARY_FOLDER
+
+    if options.search == 'knee':
+        logging.error('The knee search needs all runs of a test on one pair and cannot be sharded. Exiting.')
+        exit(1)
+
+    config_files = [config if os.path.exists(config) else CONFIGS_FOLDER + config for config in args.configs]
+    if args.receiver_ip:
+        config_files = [config for config in config_files if replace_ip_in_config(config, args.receiver_ip) is not False]
+
+    # The campaign of the scheduler is resumed, the pairs measure the runs which were not completed from the start
+    journal_file = journal_path(options.summary_folder)
+    campaign = resolve_campaign(journal_file, options.campaign, options.resume, config_file=config_files[0])
+    completed = completed_units(load_events(journal_file), campaign) if options.resume else set()
+    try:
+        queue = build_queue(config_files, args.reorder, args.shuffle, args.seed, campaign, completed)
+    except ValueError as e:
+        logging.error(f'Invalid sweep in configs: {e}')
+        exit(1)
+
+    state = new_state(queue, options.summary_folder, campaign)
+    logging.info(f'Campaign {campaign}: {len(queue)} runs on {len(args.pairs)} host pairs')
+
+    pairs = [pair for pair in args.pairs if pair_healthy(pair)]
+    state['drained'].extend(pair['name'] for pair in args.pairs if pair not in pairs)
+    binaries = provide_campaign_builds(pairs, config_files, options, campaign) if pairs and queue else {}
+    if binaries is None:
+        logging.error('Failed to provide the udperf binaries on all host pairs. Exiting.')
+        exit(1)
+    dispatch(pairs, state, campaign, options, binaries)
+
+    if state['drained']:
+        logging.warning(f'Drained host pairs: {state["drained"]}')
+    if state['queue']:
+        logging.error(f'{len(state["queue"])} runs were not executed, all host pairs are drained')
+    if state['failed']:
+        logging.error(f'Failed runs: {state["failed"]}')
+    logging.info(f'Dispatched runs stored in: {state["dispatch_file"]}')
+    POOL.log_stats()
+
+
+if __name__ == '__main__':
+    main()
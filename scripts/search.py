@@ -0,0 +1,109 @@
+# Search modes of benchmark.py.
+# The searches only decide which point to measure next. Measuring is done by a callback, which runs a repetition
+# of the benchmark with the given value and returns the measured results, or None if the repetition failed.
+import logging
+
+# Maximum lossless throughput search (RFC 2544 style)
+LOSS_THRESHOLD = 0.1 # Packet loss in percent up to which an offered rate counts as lossless
+SEARCH_PRECISION = 0.02 # The search stops when the interval between lossless and lossy rate is smaller than this fraction of the lossy rate
+SEARCH_MAX_STEPS = 12
+
+
+def find_max_lossless_rate(measure, low: float, high: float, loss_threshold: float = LOSS_THRESHOLD, precision: float = SEARCH_PRECISION, max_steps: int = SEARCH_MAX_STEPS):
+    # measure(rate) -> {'packet_loss': ..., 'data_rate_gbit': ...} or None
+    # Returns the highest measured lossless rate (None if no measured rate was lossless) and the measured loss curve
+    curve = []
+    best = None
+    rate = high # The maximum rate is tried first, it is lossless in many cases
+
+    for step in range(max_steps):
+        result = measure(rate)
+        if result is None:
+            logging.error(f'Measurement at rate {rate} failed, stopping the search')
+            break
+
+        lossless = result['packet_loss'] <= loss_threshold
+        curve.append({'rate': rate, **result, 'lossless': lossless})
+        logging.info(f'Search step {step + 1}: rate {rate} packet loss {result["packet_loss"]}% -> {"lossless" if lossless else "lossy"}')
+
+        if lossless:
+            best = rate
+            low = rate
+        else:
+            high = rate
+        rate = (low + high) // 2 if isinstance(low, int) and isinstance(high, int) else (low + high) / 2
+        if high - low <= precision * high or rate == low:
+            break
+
+    return best, sorted(curve, key=lambda point: point['rate'])
+
+
+# Adaptive sampling of a scaling parameter (parallel, uring-ring-size, with-mmsg-amount)
+KNEE_BUDGET = 8 # Maximum number of measured points per test
+KNEE_INITIAL_POINTS = 3
+
+
+def slopes(points: list[tuple]) -> list[float]:
+    return [(y2 - y1) / (x2 - x1) for (x1, y1), (x2, y2) in zip(points, points[1:])]
+
+
+def next_candidate(candidates: list, measured: dict):
+    # Refine the interval between two measured points where the slope changes the most,
+    # weighted with the width of the interval. Returns None if no candidate is left
+    points = sorted(measured.items())
+    interval_slopes = slopes(points)
+    best_score, best_candidate = -1, None
+    for index, ((x1, _), (x2, _)) in enumerate(zip(points, points[1:])):
+        between = [value for value in candidates if x1 < value < x2]
+        if not between:
+            continue
+        change = sum(abs(interval_slopes[index] - interval_slopes[neighbour]) for neighbour in (index - 1, index + 1) if 0 <= neighbour < len(interval_slopes))
+        # Without any slope change, the widest interval is refined
+        score = (change + 1e-9) * (x2 - x1)
+        if score > best_score:
+            best_score, best_candidate = score, between[len(between) // 2]
+    return best_candidate
+
+
+def find_knee(measure, candidates: list, budget: int = KNEE_BUDGET, initial_points: int = KNEE_INITIAL_POINTS) -> dict:
+    # measure(value) -> measured throughput or None
+    # Returns the measured points, the knee (largest decrease of the slope), the point of peak efficiency (throughput per unit) and the peak.
+    # Slopes are computed over the position in the candidate list, so geometric candidates (ring sizes) are refined like linear ones
+    candidates = sorted(set(candidates))
+    positions = list(range(len(candidates)))
+    initial_positions = sorted({round(i * (len(candidates) - 1) / max(initial_points - 1, 1)) for i in range(min(initial_points, len(candidates)))})
+    measured = {}
+
+    for position in initial_positions:
+        if len(measured) >= budget:
+            break
+        result = measure(candidates[position])
+        if result is not None:
+            measured[position] = result
+
+    while len(measured) < budget:
+        position = next_candidate(positions, measured)
+        if position is None:
+            break
+        result = measure(candidates[position])
+        if result is None:
+            # Do not try the failed value again
+            positions.remove(position)
+            continue
+        measured[position] = result
+
+    points = sorted(measured.items())
+    knee = None
+    if len(points) >= 3:
+        interval_slopes = slopes(points)
+        slope_decreases = [interval_slopes[i] - interval_slopes[i + 1] for i in range(len(interval_slopes) - 1)]
+        if max(slope_decreases) > 0:
+            knee = candidates[points[slope_decreases.index(max(slope_decreases)) + 1][0]]
+
+    points = [(candidates[position], value) for position, value in points]
+    return {
+        'points': points,
+        'knee': knee,
+        'peak_efficiency': max(points, key=lambda point: point[1] / point[0] if point[0] else 0)[0] if points else None,
+        'peak': max(points, key=lambda point: point[1])[0] if points else None,
+    }
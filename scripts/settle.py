@@ -0,0 +1,69 @@
+# Settle phase between benchmark runs.
+# Instead of sleeping a fixed time, sample CPU, softirq, NIC and UDP activity on all hosts and
+# start the next run as soon as every host is quiet, or after a maximum wait.
+import logging
+import time
+
+from procfs import cpu_busy_percent, parse_net_dev, parse_snmp, parse_softirqs, parse_stat, read_proc_files
+
+SETTLE_PATHS = ['/proc/stat', '/proc/softirqs', '/proc/net/dev', '/proc/net/snmp']
+SAMPLE_INTERVAL = 0.25
+
+DEFAULT_THRESHOLDS = {
+    'max_wait': 15,          # Seconds after which the next run is started anyway
+    'cpu_percent': 5,        # Busy CPU time of the whole host in percent
+    'softirq_rate': 5000,    # NET_RX + NET_TX softirqs per second over all CPUs
+    'packet_rate': 1000,     # Packets per second on the interface plus UDP datagrams per second
+}
+
+
+def take_snapshot(host, interface=None, agent=None) -> dict:
+    contents = read_proc_files(host, SETTLE_PATHS, agent)
+    net_dev = parse_net_dev(contents['/proc/net/dev'])
+    softirqs = parse_softirqs(contents['/proc/softirqs'])
+    udp = parse_snmp(contents['/proc/net/snmp']).get('Udp', {})
+
+    # Without a known interface, count the packets of all interfaces except loopback
+    interfaces = [interface] if interface in net_dev else [name for name in net_dev if name != 'lo']
+
+    return {
+        'time': time.monotonic(),
+        'cpu': parse_stat(contents['/proc/stat']).get('cpu', []),
+        'softirqs': sum(softirqs.get('NET_RX', [])) + sum(softirqs.get('NET_TX', [])),
+        'packets': sum(net_dev[name]['rx_packets'] + net_dev[name]['tx_packets'] for name in interfaces),
+        'datagrams': udp.get('InDatagrams', 0) + udp.get('OutDatagrams', 0),
+    }
+
+
+def activity(before: dict, after: dict) -> dict:
+    elapsed = after['time'] - before['time']
+    return {
+        'cpu_percent': cpu_busy_percent(before['cpu'], after['cpu']),
+        'softirq_rate': (after['softirqs'] - before['softirqs']) / elapsed,
+        'packet_rate': (after['packets'] - before['packets'] + after['datagrams'] - before['datagrams']) / elapsed,
+    }
+
+
+def wait_until_settled(hosts: list[tuple], thresholds: dict = DEFAULT_THRESHOLDS) -> float:
+    # hosts: list of (ssh address or None, interface or None, agent or None)
+    start = time.monotonic()
+    snapshots = [take_snapshot(*host) for host in hosts]
+
+    while True:
+        time.sleep(SAMPLE_INTERVAL)
+        new_snapshots = [take_snapshot(*host) for host in hosts]
+        busy_hosts = {}
+        for host, before, after in zip(hosts, snapshots, new_snapshots):
+            host_activity = activity(before, after)
+            if any(host_activity[key] > thresholds[key] for key in host_activity):
+                busy_hosts[host[0] or 'localhost'] = {key: round(value, 1) for key, value in host_activity.items()}
+        snapshots = new_snapshots
+
+        settle_time = time.monotonic() - start
+        if not busy_hosts:
+            logging.info(f'Hosts settled after {settle_time:.2f}s')
+            return settle_time
+        if settle_time >= thresholds['max_wait']:
+            logging.warning(f'Hosts did not settle within {thresholds["max_wait"]}s, starting anyway. Activity: {busy_hosts}')
+            return settle_time
+        logging.debug(f'Waiting for hosts to settle: {busy_hosts}')
@@ -0,0 +1,140 @@
+# Shared SSH connection pool for all orchestration scripts.
+# Every remote command goes through a persistent OpenSSH ControlMaster connection per host,
+# so only the first command to a host pays the full handshake. The master sockets live in a
+# shared directory, which lets run.py, udperf.py and benchmark.py (separate processes) reuse them.
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import subprocess
+import threading
+import time
+
+SSH_OPTIONS = ['-o', 'LogLevel=quiet', '-o', 'StrictHostKeyChecking=no']
+CONTROL_DIR = os.environ.get('UDPERF_SSH_CONTROL_DIR', f'/tmp/udperf-ssh-{os.getuid()}')
+CONTROL_PERSIST = 600 # Seconds an idle master connection is kept open
+CONNECT_TIMEOUT = 10
+
+
+class SSHPool:
+    def __init__(self, control_dir: str = CONTROL_DIR, control_persist: int = CONTROL_PERSIST):
+        self.control_dir = control_dir
+        self.control_persist = control_persist
+        self._stats: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._host_locks: dict[str, threading.Lock] = {}
+
+    def control_path(self, host: str) -> str:
+        # Hash the host name, since unix socket paths are limited to ~100 characters
+        digest = hashlib.sha1(host.encode()).hexdigest()[:16]
+        return os.path.join(self.control_dir, digest)
+
+    def ssh_command(self, host: str, command=None) -> list[str]:
+        ssh_command = ['ssh', *SSH_OPTIONS, '-o', 'ControlMaster=no', '-o', f'ControlPath={self.control_path(host)}', host]
+        if command is not None:
+            ssh_command.append(command)
+        return ssh_command
+
+    def is_connected(self, host: str) -> bool:
+        return os.path.exists(self.control_path(host))
+
+    def connect(self, host: str) -> bool:
+        with self._host_lock(host):
+            if self.is_connected(host):
+                return True
+
+            os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+            logging.debug(f'Opening SSH master connection to {host}')
+            master_command = ['ssh', *SSH_OPTIONS, '-o', f'ConnectTimeout={CONNECT_TIMEOUT}', '-o', f'ControlPersist={self.control_persist}', '-M', '-N', '-f', '-S', self.control_path(host), host]
+            try:
+                # stdio must not be inherited, otherwise the backgrounded master keeps our pipes open
+                result = subprocess.run(master_command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=CONNECT_TIMEOUT + 5)
+            except subprocess.TimeoutExpired:
+                logging.error(f'Opening SSH master connection to {host} timed out')
+                return False
+
+            if result.returncode != 0:
+                logging.warning(f'Opening SSH master connection to {host} failed, falling back to direct connections')
+                return False
+
+            self._count(host, 'masters')
+            return True
+
+    def run(self, host: str, command: str, timeout=None, **kwargs) -> subprocess.CompletedProcess:
+        self._prepare(host)
+        start = time.perf_counter()
+        try:
+            return subprocess.run(self.ssh_command(host, command), timeout=timeout, **kwargs)
+        finally:
+            self._count(host, 'seconds', time.perf_counter() - start)
+
+    def popen(self, host: str, command: str, **kwargs) -> subprocess.Popen:
+        self._prepare(host)
+        return subprocess.Popen(self.ssh_command(host, command), **kwargs)
+
+    async def create_subprocess(self, host: str, command: str, **kwargs) -> asyncio.subprocess.Process:
+        # Opening a master connection blocks, so it must not run in the event loop
+        await asyncio.to_thread(self._prepare, host)
+        return await asyncio.create_subprocess_exec(*self.ssh_command(host, command), **kwargs)
+
+    def copy_from_host(self, host: str, remote_path: str, local_path: str, **kwargs) -> subprocess.CompletedProcess:
+        self._prepare(host)
+        scp_command = ['scp', *SSH_OPTIONS, '-o', 'ControlMaster=no', '-o', f'ControlPath={self.control_path(host)}', f'{host}:{remote_path}', local_path]
+        return subprocess.run(scp_command, **kwargs)
+
+    def forward(self, host: str, remote_port: int):
+        # Forward a free local port to remote_port on the host over the master connection
+        if not self.is_connected(host) and not self.connect(host):
+            return None
+
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as free_socket:
+            free_socket.bind(('127.0.0.1', 0))
+            local_port = free_socket.getsockname()[1]
+
+        forward_command = ['ssh', *SSH_OPTIONS, '-S', self.control_path(host), '-O', 'forward', '-L', f'{local_port}:127.0.0.1:{remote_port}', host]
+        result = subprocess.run(forward_command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            logging.error(f'Forwarding local port {local_port} to {host}:{remote_port} failed')
+            return None
+
+        self._count(host, 'forwards')
+        return local_port
+
+    def close(self, host: str):
+        if self.is_connected(host):
+            logging.debug(f'Closing SSH master connection to {host}')
+            subprocess.run(['ssh', *SSH_OPTIONS, '-S', self.control_path(host), '-O', 'exit', host], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def close_all(self):
+        for host in list(self._stats.keys()):
+            self.close(host)
+
+    def stats(self) -> dict[str, dict]:
+        with self._lock:
+            return {host: dict(host_stats) for host, host_stats in self._stats.items()}
+
+    def log_stats(self):
+        for host, host_stats in self.stats().items():
+            logging.info(f"SSH pool {host}: {host_stats['commands']} commands, {host_stats['reused']} reused a master connection, {host_stats['masters']} masters opened, {host_stats['seconds']:.2f}s spent in blocking commands")
+
+    def _prepare(self, host: str):
+        # Reuse the master connection if one is alive, otherwise try to open one
+        reused = self.is_connected(host)
+        if not reused:
+            self.connect(host)
+        self._count(host, 'commands')
+        if reused:
+            self._count(host, 'reused')
+
+    def _count(self, host: str, key: str, value=1):
+        with self._lock:
+            host_stats = self._stats.setdefault(host, {'commands': 0, 'reused': 0, 'masters': 0, 'forwards': 0, 'seconds': 0.0})
+            host_stats[key] += value
+
+    def _host_lock(self, host: str) -> threading.Lock:
+        with self._lock:
+            return self._host_locks.setdefault(host, threading.Lock())
+
+
+POOL = SSHPool()
@@ -0,0 +1,178 @@
+# Process supervisor for the benchmark processes (udperf, iperf, samplers) on a host.
+# "supervisor.py run --name NAME -- COMMAND" starts the command in its own process group, records its pid and start time
+# in a state file and waits on a pidfd of the process. The whole group is stopped when the supervisor receives SIGTERM, SIGINT
+# or SIGHUP, or with --stop-on-eof when its stdin is closed (the orchestrator or the SSH connection went away).
+# Children left behind by the process are killed with its group once it exited.
+# "supervisor.py reap" stops every recorded process which is still running, e.g. after a crash of the orchestrator.
+# Only processes started by the supervisor are touched, so unrelated processes on the benchmark ports are left alone.
+import argparse
+import json
+import logging
+import os
+import select
+import signal
+import subprocess
+import sys
+
+from ssh_pool import POOL
+
+STATE_DIRECTORY = os.environ.get('UDPERF_SUPERVISOR_DIR', f'/tmp/udperf-supervisor-{os.getuid()}')
+STOP_GRACE_PERIOD = 2 # Seconds between SIGTERM and SIGKILL when stopping a process group
+REMOTE_SUPERVISOR = 'udperf-benchmark/scripts/supervisor.py' # Next to agent.py, relative to the home directory of the remote host
+
+
+class StopRequested(Exception):
+    pass
+
+
+def supervised_command(name: str, command: list[str], host=None, stop_on_eof=False) -> list[str]:
+    # Command line which runs command under the supervisor, on the host or locally
+    supervisor = ['python3', REMOTE_SUPERVISOR] if host else [sys.executable, os.path.abspath(__file__)]
+    return supervisor + ['run', '--name', name] + (['--stop-on-eof'] if stop_on_eof else []) + ['--'] + command
+
+
+def state_path(name: str) -> str:
+    return os.path.join(STATE_DIRECTORY, f'{name}.json')
+
+
+def process_start_time(pid: int):
+    # Start time in clock ticks since boot, it tells a process apart from a later one with the same pid
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as stat_file:
+            return int(stat_file.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def wait_pidfd(pidfd: int, timeout=None) -> bool:
+    # A pidfd becomes readable when the process exited
+    readable, _, _ = select.select([pidfd], [], [], timeout)
+    return bool(readable)
+
+
+def signal_group(pgid: int, signum: int):
+    try:
+        os.killpg(pgid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def stop_group(pid: int, pidfd: int):
+    # The process is the leader of its group, so its pid is the group id
+    signal_group(pid, signal.SIGTERM)
+    if not wait_pidfd(pidfd, STOP_GRACE_PERIOD):
+        logging.warning(f'Process {pid} did not stop within {STOP_GRACE_PERIOD}s, killing its group')
+        signal_group(pid, signal.SIGKILL)
+        wait_pidfd(pidfd)
+
+
+def remove_state(name: str):
+    try:
+        os.remove(state_path(name))
+    except FileNotFoundError:
+        pass
+
+
+def request_stop(signum, frame):
+    raise StopRequested()
+
+
+def run(name: str, command: list[str], stop_on_eof=False) -> int:
+    # A process left behind under the same name, e.g. by a killed supervisor, is stopped first
+    reap([name])
+    os.makedirs(STATE_DIRECTORY, exist_ok=True)
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, request_stop)
+
+    try:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL if stop_on_eof else None, start_new_session=True)
+    except OSError as e:
+        logging.error(f'Failed to start {name}: {e}')
+        return 127
+    pidfd = os.pidfd_open(process.pid)
+    with open(state_path(name), 'w') as state_file:
+        json.dump({'pid': process.pid, 'start_time': process_start_time(process.pid), 'command': command}, state_file)
+
+    try:
+        watched = [pidfd] + ([sys.stdin.fileno()] if stop_on_eof else [])
+        while True:
+            readable, _, _ = select.select(watched, [], [])
+            if pidfd in readable:
+                break
+            if not os.read(sys.stdin.fileno(), 4096):
+                stop_group(process.pid, pidfd)
+                break
+    except StopRequested:
+        stop_group(process.pid, pidfd)
+    finally:
+        # The exited leader is not reaped yet, so its group id cannot be reused while the rest of the group is killed
+        signal_group(process.pid, signal.SIGKILL)
+        returncode = process.wait()
+        os.close(pidfd)
+        remove_state(name)
+    # Exit code of a shell for processes ended by a signal
+    return returncode if returncode >= 0 else 128 - returncode
+
+
+def reap(names=None) -> list[str]:
+    # Stops the recorded processes (all or the given names) which are still running, returns their names
+    if names is None:
+        names = [file_name[:-len('.json')] for file_name in os.listdir(STATE_DIRECTORY) if file_name.endswith('.json')] if os.path.isdir(STATE_DIRECTORY) else []
+    stopped = []
+    for name in names:
+        try:
+            with open(state_path(name), 'r') as state_file:
+                state = json.load(state_file)
+        except (OSError, json.JSONDecodeError):
+            continue
+
+        pid = state['pid']
+        try:
+            pidfd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            pidfd = None
+        # The pidfd refers to the process with this pid at the time it was opened, so the start time is checked afterwards
+        if pidfd is not None and process_start_time(pid) == state['start_time']:
+            logging.warning(f'Stopping {name} (pid {pid}) left behind by a previous run')
+            stop_group(pid, pidfd)
+            stopped.append(name)
+        if pidfd is not None:
+            os.close(pidfd)
+        remove_state(name)
+    return stopped
+
+
+def reap_host(host=None) -> list[str]:
+    # Reaps the processes on the host from the orchestrator, remote hosts over the shared SSH connection
+    if host is None:
+        return reap()
+    result = POOL.run(host, f'python3 {REMOTE_SUPERVISOR} reap', capture_output=True, text=True)
+    if result.returncode != 0:
+        logging.error(f'Failed to reap processes on {host}: {result.stderr}')
+        return []
+    return result.stdout.split()
+
+
+def main():
+    # stdout and stderr belong to the supervised process, so the supervisor only reports problems
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Supervisor of the benchmark processes on this host')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='Run a command in its own process group')
+    run_parser.add_argument('--name', required=True, help='Name of the process, unique on this host')
+    run_parser.add_argument('--stop-on-eof', action='store_true', help='Stop the process when stdin is closed')
+    run_parser.add_argument('argv', nargs=argparse.REMAINDER, help='Command to run, after --')
+    subparsers.add_parser('reap', help='Stop all processes started by supervisors on this host which are still running')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        argv = args.argv[1:] if args.argv[:1] == ['--'] else args.argv
+        sys.exit(run(args.name, argv, args.stop_on_eof))
+    elif args.command == 'reap':
+        for name in reap():
+            print(name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+# Declarative sweeps for benchmark configs.
+# Instead of listing every run, a test can contain a "sweep" entry. The cartesian product of its values is expanded lazily into runs:
+#   "ring-size {uring-ring-size}": {
+#       "sweep": {
+#           "parameters": {"uring-ring-size": [1, 4, "...", 64, 128, "...", 1024]},
+#           "receiver": {"parallel": [1, 2, "4..12:2"]},
+#           "sender": {}
+#       }
+#   }
+# Values are single values or lists. List elements can be ranges "a..b" (step 1), "a..b:s" (step s), "a..b:*f" (factor f)
+# or "...", which continues the progression of the preceding values up to the next value.
+# Parameters used in the test name are split into separate tests, the run name is generated from the remaining parameters
+# or from the optional "run_name" template, e.g. "{parallel} threads".
+import itertools
+import math
+import re
+import string
+
+SWEEP_KEY = 'sweep'
+SWEEP_SIDES = ['parameters', 'receiver', 'sender'] # parameters apply to receiver and sender
+ELLIPSIS = '...'
+NUMBER = r'-?\d+(?:\.\d+)?'
+RANGE_PATTERN = re.compile(rf'({NUMBER})\.\.({NUMBER})(?::(\*?)({NUMBER}))?')
+
+
+def parse_number(text: str):
+    return int(text) if re.fullmatch(r'-?\d+', text) else float(text)
+
+
+def progression(start, end, step=None, factor=None) -> list:
+    # All values from start up to end (inclusive if it is part of the progression)
+    if (step is not None and step <= 0) or (factor is not None and factor <= 1) or (factor is not None and start <= 0):
+        raise ValueError(f'Progression from {start} to {end} with step {step} or factor {factor} does not terminate')
+    values = []
+    value = start
+    while value <= end:
+        values.append(value)
+        value = value * factor if factor is not None else value + step
+    return values
+
+
+def expand_range(text: str) -> list:
+    match = RANGE_PATTERN.fullmatch(text)
+    start, end = parse_number(match.group(1)), parse_number(match.group(2))
+    if match.group(4) is None:
+        return progression(start, end, step=1)
+    if match.group(3):
+        return progression(start, end, factor=parse_number(match.group(4)))
+    return progression(start, end, step=parse_number(match.group(4)))
+
+
+def continue_progression(previous: list, end) -> list:
+    # Geometric if the preceding values are not arithmetic and the last is an integer multiple of the one before, e.g. 1, 4, ... -> 16, 64
+    if len(previous) < 2 or not all(isinstance(value, (int, float)) for value in previous[-3:] + [end]):
+        raise ValueError(f'"{ELLIPSIS}" needs two preceding numbers and a following number, got {previous} and {end}')
+    first, second = previous[-2], previous[-1]
+    arithmetic = len(previous) >= 3 and second - first == first - previous[-3]
+    if not arithmetic and first > 0 and second % first == 0 and second // first >= 2:
+        values = progression(second, end, factor=second // first)
+    else:
+        values = progression(second, end, step=second - first)
+    # The preceding value and the end value are already part of the list
+    return [value for value in values[1:] if value != end]
+
+
+def expand_values(value) -> list:
+    elements = value if isinstance(value, list) else [value]
+    values = []
+    for index, element in enumerate(elements):
+        if element == ELLIPSIS:
+            if index + 1 >= len(elements):
+                raise ValueError(f'"{ELLIPSIS}" must be followed by an end value in {elements}')
+            end = elements[index + 1]
+            end = parse_number(end) if isinstance(end, str) and re.fullmatch(NUMBER, end) else end
+            values += continue_progression(values, end)
+        elif isinstance(element, str) and RANGE_PATTERN.fullmatch(element):
+            values += expand_range(element)
+        else:
+            values.append(element)
+    return values
+
+
+def expand_cli_values(values: list[str]) -> list:
+    # Values given on the command line, e.g. ['1', '2', '...', '64'] or ['1..12']
+    return expand_values([parse_number(value) if re.fullmatch(NUMBER, value) else value for value in values])
+
+
+def sweep_dimensions(sweep: dict) -> dict[tuple[str, str], list]:
+    # Maps (side, parameter) to the expanded values. Expanding the values eagerly reports invalid sweeps before the benchmark starts
+    unknown_keys = set(sweep) - set(SWEEP_SIDES) - {'run_name', 'repetitions'}
+    if unknown_keys:
+        raise ValueError(f'Unknown keys {sorted(unknown_keys)} in sweep, supported are {SWEEP_SIDES + ["run_name", "repetitions"]}')
+    dimensions = {}
+    for side in SWEEP_SIDES:
+        for parameter, value in sweep.get(side, {}).items():
+            dimensions[(side, parameter)] = expand_values(value)
+    return dimensions
+
+
+def combinations(dimensions: dict[tuple[str, str], list]):
+    keys = list(dimensions)
+    for values in itertools.product(*dimensions.values()):
+        yield dict(zip(keys, values))
+
+
+def count_runs(sweep: dict) -> int:
+    return math.prod(len(values) for values in sweep_dimensions(sweep).values())
+
+
+def template_fields(template: str) -> list[str]:
+    return [field for _, field, _, _ in string.Formatter().parse(template) if field]
+
+
+def split_test(test_name: str, test_runs: dict):
+    # Yields (test name, test runs). Swept parameters used in the test name create one test per value
+    sweep = test_runs.get(SWEEP_KEY)
+    fields = template_fields(test_name)
+    if not sweep or not fields:
+        yield test_name, test_runs
+        return
+
+    dimensions = {key: values for key, values in sweep_dimensions(sweep).items() if key[1] in fields}
+    missing_fields = set(fields) - {parameter for _, parameter in dimensions}
+    if missing_fields:
+        raise ValueError(f'Test name "{test_name}" uses {sorted(missing_fields)}, which are not swept')
+
+    for combination in combinations(dimensions):
+        split_sweep = {key: dict(value) if isinstance(value, dict) else value for key, value in sweep.items()}
+        for (side, parameter), value in combination.items():
+            split_sweep[side][parameter] = value
+        names = {parameter: value for (_, parameter), value in combination.items()}
+        yield test_name.format_map(names), {**test_runs, SWEEP_KEY: split_sweep}
+
+
+def run_name(combination: dict[tuple[str, str], object], varying: list[tuple[str, str]], template=None) -> str:
+    names = {parameter: value for (_, parameter), value in combination.items()}
+    if template is not None:
+        return template.format_map(names)
+    if len(varying) == 1:
+        return str(combination[varying[0]])
+    return ' '.join(f'{parameter}={combination[(side, parameter)]}' for side, parameter in varying)
+
+
+def expand_sweep(sweep: dict):
+    # Yields (run name, run config, parameters) in the same format as the explicitly listed runs of a test
+    dimensions = sweep_dimensions(sweep)
+    varying = [key for key, values in dimensions.items() if len(values) > 1]
+    for combination in combinations(dimensions):
+        run_config = {side: {} for side in SWEEP_SIDES}
+        for (side, parameter), value in combination.items():
+            run_config[side][parameter] = value
+        if 'repetitions' in sweep:
+            run_config['repetitions'] = sweep['repetitions']
+        yield run_name(combination, varying, sweep.get('run_name')), run_config, run_config.pop('parameters')
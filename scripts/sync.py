@@ -0,0 +1,69 @@
+# Incremental synchronization of the result files from the hosts to the orchestrator during a campaign.
+# udperf only appends to its result CSVs and logs, so each file is synchronized from the size of its local copy on:
+# only the new bytes are transferred. Bytes after the last newline are left for the next synchronization,
+# so the local copies always end with a complete row and can be read by the visualize scripts at any moment.
+# The perf stat output is overwritten by every run instead, so it is not synchronized.
+# The local layout matches an unpacked results archive of visualize.py: <sync folder>/udperf-receiver and <sync folder>/udperf-sender.
+import logging
+import os
+import shlex
+
+from perf_stat import PERF_EXTENSION, PERF_STDERR_EXTENSION
+from ssh_pool import POOL
+
+SYNC_FOLDER = 'results/live'
+SYNC_EXTENSIONS = ('.csv', '.log')
+EXCLUDED_EXTENSIONS = (PERF_EXTENSION, PERF_STDERR_EXTENSION) # Overwritten by every run
+
+
+def sync_targets(ssh_receiver: str, ssh_sender: str, sync_folder: str) -> list[tuple]:
+    # (host, file name prefix, local folder) per role. The prefix separates the roles if both run on the same host
+    return [(ssh_receiver, 'receiver-', os.path.join(sync_folder, 'udperf-receiver')), (ssh_sender, 'sender-', os.path.join(sync_folder, 'udperf-sender'))]
+
+
+def remote_file_sizes(host: str, folder: str, prefix: str):
+    result = POOL.run(host, f"find {shlex.quote(folder)} -maxdepth 1 -type f -name {shlex.quote(prefix + '*')} -printf '%s %f\\n'", capture_output=True, text=True)
+    if result.returncode != 0:
+        logging.error(f'Failed to list the results in {folder} on {host}: {result.stderr}')
+        return None
+    sizes = {}
+    for line in result.stdout.splitlines():
+        size, name = line.split(' ', 1)
+        if name.endswith(SYNC_EXTENSIONS) and not name.endswith(EXCLUDED_EXTENSIONS):
+            sizes[name] = int(size)
+    return sizes
+
+
+def sync_file(host: str, remote_path: str, local_path: str, remote_size: int) -> int:
+    # Returns the number of synchronized bytes
+    offset = os.path.getsize(local_path) if os.path.exists(local_path) else 0
+    if remote_size < offset:
+        # The file was replaced on the host, copy it again
+        logging.warning(f'{remote_path} on {host} shrank, copying it again')
+        offset = 0
+        os.remove(local_path)
+    if remote_size == offset:
+        return 0
+
+    result = POOL.run(host, f'tail -c +{offset + 1} {shlex.quote(remote_path)} | head -c {remote_size - offset}', capture_output=True)
+    if result.returncode != 0:
+        logging.error(f'Failed to read {remote_path} on {host}: {result.stderr.decode()}')
+        return 0
+    complete = result.stdout[:result.stdout.rfind(b'\n') + 1]
+    with open(local_path, 'ab') as file:
+        file.write(complete)
+    return len(complete)
+
+
+def sync_results(targets: list[tuple], remote_folder: str) -> int:
+    # Returns the number of synchronized bytes of all targets
+    synced = 0
+    for host, prefix, local_folder in targets:
+        sizes = remote_file_sizes(host, remote_folder, prefix)
+        if sizes is None:
+            continue
+        os.makedirs(local_folder, exist_ok=True)
+        for name, size in sizes.items():
+            synced += sync_file(host, os.path.join(remote_folder, name), os.path.join(local_folder, name), size)
+    logging.debug(f'Synchronized {synced} bytes of results')
+    return synced
@@ -5,6 +5,11 @@ import logging
 import os
 import subprocess
 
+from benchmark import PATH_TO_udperf_BIN, Benchmark, BenchmarkOptions, result_failed
+from journal import completed_units, journal_path, load_events, resolve_campaign, unit_key
+from planner import order_configs, requires_jumboframes
+from ssh_pool import POOL
+
 #BENCHMARK_CONFIGS = [
 #    "udperf_jumboframes_max.json",
 #    "udperf_jumboframes.json",
@@ -63,6 +68,7 @@ BENCHMARK_CONFIGS = [
 
 
 RESULTS_FOLDER = "./udperf-benchmark/results/"
+SUMMARY_FOLDER = "./results/summaries/" # Local, next to the synchronized and collected results of run.py
 CONFIGS_FOLDER = "configs/"
 PATH_TO_udperf_REPO = "./udperf"
 MTU_MAX = 9000
@@ -71,7 +77,7 @@ MTU_DEFAULT = 1500
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def main():
+def main(argv=None) -> bool:
     logging.info('Starting main function')
     parser = argparse.ArgumentParser(description="Wrapper script for benchmark.py to benchmark udperf")
 
@@ -82,8 +88,18 @@ def main():
     parser.add_argument("receiver_ip", nargs='?', default="0.0.0.0", type=str, help="The ip address of the receiver")
     parser.add_argument('--udperf-repo', default=PATH_TO_udperf_REPO, help='Path to the udperf repository')
     parser.add_argument('--results-folder', default=RESULTS_FOLDER, help='Path to results folder')
-
-    args = parser.parse_args()
+    parser.add_argument('--summary-folder', default=SUMMARY_FOLDER, help='Local folder of the run summaries, drop counters, queue balance, journal and results index, see benchmark.py')
+    parser.add_argument('--adaptive', action='store_true', help='Repeat each run until its confidence interval is narrow enough, see benchmark.py')
+    parser.add_argument('--reorder', action='store_true', help='Run the configs grouped by MTU and the runs grouped by pacing and affinity, see planner.py')
+    parser.add_argument('--shuffle', action='store_true', help='Shuffle the configs and runs within their groups')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for --shuffle')
+    parser.add_argument('--dry-run', action='store_true', help='Print the planned runs and their command lines without changing the hosts or running anything')
+    parser.add_argument('--udperf-revisions', nargs='+', default=None, help='Branches, tags or commits of udperf to compare in one campaign')
+    parser.add_argument('--resume', action='store_true', help='Continue the last campaign from the journal in the summary folder, skipping completed configs and repetitions')
+    parser.add_argument('--campaign', default=None, help='Id of the campaign in the journal, set by run.py')
+    parser.add_argument('--force', action='store_true', help='Measure all runs again, even if they are already in the results index')
+
+    args = parser.parse_args(argv)
 
     logging.info(f"Receiver hostname/interface: {args.receiver_hostname}/{args.receiver_interface}")
     logging.info(f"Sender hostname/interface: {args.sender_hostname}/{args.sender_interface}")
@@ -96,47 +112,86 @@ def main():
     if 'SSH_AUTH_SOCK' in os.environ:
         env_vars['SSH_AUTH_SOCK'] = os.environ['SSH_AUTH_SOCK']
 
-    mtu_changed = False
+    benchmark_configs = BENCHMARK_CONFIGS
+    if args.reorder or args.shuffle:
+        benchmark_configs = order_configs(BENCHMARK_CONFIGS, args.shuffle, args.seed)
+    current_mtu = MTU_DEFAULT
+
+    journal_file = journal_path(args.summary_folder)
+    campaign = resolve_campaign(journal_file, args.campaign, args.resume)
+    completed = completed_units(load_events(journal_file), campaign) if args.resume else set()
+    logging.info(f"Campaign: {campaign}")
+
+    # All configs run in this process, so the SSH connections, agents and binaries are set up only once
+    remote = args.receiver_hostname and args.sender_hostname
+    interfaces = args.receiver_interface and args.sender_interface
+    options = BenchmarkOptions(udperf_repo=path_to_udperf_repo, udperf_bin=path_to_udperf_repo + PATH_TO_udperf_BIN, results_folder=results_folder, summary_folder=args.summary_folder,
+                               ssh_receiver=args.receiver_hostname if remote else None, ssh_sender=args.sender_hostname if remote else None,
+                               receiver_interface=args.receiver_interface if interfaces else None, sender_interface=args.sender_interface if interfaces else None,
+                               adaptive=args.adaptive, reorder=args.reorder, shuffle=args.shuffle, seed=args.seed, dry_run=args.dry_run,
+                               resume=args.resume, campaign=campaign, force=args.force)
+    if args.udperf_revisions:
+        options.udperf_revisions = args.udperf_revisions
+    benchmark = Benchmark(options)
+    if not benchmark.connect():
+        logging.error("Failed to connect to the hosts. Exiting.")
+        return False
 
-    for index, config in enumerate(BENCHMARK_CONFIGS):
+    # run.py only records the campaign as done if all configs and their runs succeeded
+    success = True
+    for index, config in enumerate(benchmark_configs):
         logging.info('-------------------')
-        logging.info(f"Running udperf with config: {config} ({index + 1}/{len(BENCHMARK_CONFIGS)}")
+        logging.info(f"Running udperf with config: {config} ({index + 1}/{len(benchmark_configs)}")
         logging.info('-------------------')
 
-        if "jumboframes" in config:
-            logging.warning(f"Changing MTU to {MTU_MAX}")
-            change_mtu(MTU_MAX, args.receiver_hostname, args.receiver_interface, env_vars)
-            change_mtu(MTU_MAX, args.sender_hostname, args.sender_interface, env_vars)
-            mtu_changed = True
+        if unit_key({'campaign': campaign, 'config_file': CONFIGS_FOLDER + config}) in completed:
+            logging.info(f"Config {config} already completed in campaign {campaign}, skipping")
+            continue
+
+        # The MTU is only changed if it differs from the MTU of the previous config
+        mtu = MTU_MAX if requires_jumboframes(config) else MTU_DEFAULT
+        if mtu != current_mtu:
+            logging.warning(f"Changing MTU to {mtu}")
+            if not args.dry_run:
+                change_mtu(mtu, args.receiver_hostname, args.receiver_interface, env_vars)
+                change_mtu(mtu, args.sender_hostname, args.sender_interface, env_vars)
+                benchmark.refresh_fingerprints()
+            current_mtu = mtu
         
         if replace_ip_in_config(CONFIGS_FOLDER + config, args.receiver_ip) is False:
+            success = False
             continue
 
-        if args.receiver_hostname and args.sender_hostname:
-            parameters = [CONFIGS_FOLDER + config, '--udperf-repo', path_to_udperf_repo, '--results-folder', results_folder, '--ssh-sender', args.sender_hostname, '--ssh-receiver', args.receiver_hostname]
-        else:
-            parameters = [CONFIGS_FOLDER + config, '--udperf-repo', path_to_udperf_repo, '--results-folder', results_folder]
-            
         try:
-            subprocess.run(["python3", 'scripts/benchmark.py'] + parameters, check=True, env=env_vars)
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Failed to execute {config}: {e}")
-
-        if mtu_changed:
-            logging.warning(f"Changing MTU back to {MTU_DEFAULT}")
+            results = benchmark.run_config(CONFIGS_FOLDER + config)
+            if results is None:
+                logging.error(f"Failed to execute {config}")
+                success = False
+            elif any(result_failed(result) for result in results):
+                logging.error(f"Runs of {config} failed, they are measured again with --resume")
+                success = False
+        except Exception as e:
+            logging.exception(f"Failed to execute {config}: {e}")
+            success = False
+
+    if current_mtu != MTU_DEFAULT:
+        logging.warning(f"Changing MTU back to {MTU_DEFAULT}")
+        if not args.dry_run:
             change_mtu(MTU_DEFAULT, args.receiver_hostname, args.receiver_interface, env_vars)
             change_mtu(MTU_DEFAULT, args.sender_hostname, args.sender_interface, env_vars)
-            mtu_changed = False
+
+    benchmark.close()
+    return success
 
 
 def change_mtu(mtu: int, host=None, interface=None, env_vars=None) -> bool:
-    if host and interface and env_vars:
-        command = f"ssh -o LogLevel=quiet -o StrictHostKeyChecking=no {host} 'ifconfig {interface} mtu {mtu} up'"
-    else:
-        command = f"ifconfig {interface} mtu {mtu} up"
+    command = f"ifconfig {interface} mtu {mtu} up"
 
     try:
-        subprocess.run(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, env=env_vars)
+        if host and interface and env_vars:
+            POOL.run(host, command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        else:
+            subprocess.run(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, env=env_vars)
         logging.info(f"MTU changed to {mtu}")
         return True
     except subprocess.CalledProcessError as e:
@@ -0,0 +1,6 @@
+# The scripts import each other as siblings, like when they are run from scripts/
+import os
+import sys
+
+SCRIPTS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+sys.path.insert(0, SCRIPTS_DIRECTORY)
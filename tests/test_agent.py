@@ -0,0 +1,124 @@
+# Runs agent.py serve on localhost with a temporary home directory and talks to it through AgentClient
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import SCRIPTS_DIRECTORY
+from agent import AgentClient, AgentError, token_path
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as free_socket:
+        free_socket.bind(('127.0.0.1', 0))
+        return free_socket.getsockname()[1]
+
+
+@pytest.fixture
+def agent_port(tmp_path, monkeypatch):
+    # The agent writes its token to the home directory and resolves relative paths against it
+    monkeypatch.setenv('HOME', str(tmp_path))
+    port = free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIRECTORY, 'agent.py'), 'serve', '--port', str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while not (tmp_path / token_path(port)).exists():
+        assert time.monotonic() < deadline, 'agent did not start'
+        time.sleep(0.05)
+    yield port
+    process.terminate()
+    process.wait()
+
+
+@pytest.fixture
+def client(agent_port):
+    client = AgentClient(None, agent_port)
+    assert client.try_connect()
+    yield client
+    client.close()
+
+
+def test_token_file_is_private(tmp_path, agent_port):
+    assert os.stat(tmp_path / token_path(agent_port)).st_mode & 0o777 == 0o600
+
+
+def test_start_wait(client):
+    client.start('echo', [sys.executable, '-c', 'import sys; print("out"); print("err", file=sys.stderr)'])
+    result = client.wait('echo')
+    assert result['returncode'] == 0
+    assert result['stdout'] == 'out\n'
+    assert result['stderr'] == 'err\n'
+
+
+def test_environment_is_passed(client):
+    client.start('env', [sys.executable, '-c', 'import os; print(os.environ["RUST_LOG"])'], {'RUST_LOG': 'error'})
+    assert client.wait('env')['stdout'] == 'error\n'
+
+
+def test_stop(client):
+    client.start('sleep', ['sleep', '30'])
+    start = time.monotonic()
+    assert client.stop('sleep') == -15
+    assert time.monotonic() - start < 5
+    # A stopped process is forgotten
+    assert client.stop('sleep') is None
+
+
+def test_stop_all(client):
+    client.start('first', ['sleep', '30'])
+    client.start('second', ['sleep', '30'])
+    assert sorted(client.stop_all()) == ['first', 'second']
+
+
+def test_wait_timeout(client):
+    client.start('sleep', ['sleep', '30'])
+    # The agent returns no returncode while the process is still running
+    assert client.wait('sleep', timeout=0.1)['returncode'] is None
+    with pytest.raises(AgentError, match='timed out'):
+        client.request('wait', request_timeout=0.1, name='sleep')
+    client.stop('sleep')
+
+
+def test_read_file(tmp_path, client):
+    (tmp_path / 'results.csv').write_bytes(b'a,b\n1,2\n')
+    assert client.fetch_file('results.csv') == b'a,b\n1,2\n'
+    assert client.fetch_file('results.csv', offset=4) == b'1,2\n'
+
+
+def test_read_text(tmp_path, client):
+    (tmp_path / 'stat').write_text('cpu 1 2 3\n')
+    assert client.read_text([str(tmp_path / 'stat'), str(tmp_path / 'missing')]) == {str(tmp_path / 'stat'): 'cpu 1 2 3\n', str(tmp_path / 'missing'): ''}
+
+
+def test_errors(client):
+    with pytest.raises(AgentError, match='No process with name'):
+        client.wait('unknown')
+    with pytest.raises(AgentError):
+        client.fetch_file('missing.csv')
+    with pytest.raises(AgentError, match='Unknown operation'):
+        client.request('_get_process', name='unknown')
+    with pytest.raises(AgentError):
+        client.start('missing', ['/nonexistent/binary'])
+
+
+def test_request_without_connection(agent_port):
+    client = AgentClient(None, agent_port)
+    with pytest.raises(AgentError, match='Not connected'):
+        client.stop_all()
+
+
+def test_wrong_token_is_rejected(tmp_path, agent_port):
+    (tmp_path / token_path(agent_port)).unlink()
+    (tmp_path / token_path(agent_port)).write_text('wrong')
+    assert not AgentClient(None, agent_port).try_connect()
+
+    # Without authentication, the connection is closed before any operation runs
+    with socket.create_connection(('127.0.0.1', agent_port)) as raw_socket:
+        raw_socket.sendall((json.dumps({'id': 1, 'op': 'start', 'args': {'name': 'x', 'argv': ['touch', str(tmp_path / 'x')]}}) + '\n').encode())
+        response = json.loads(raw_socket.makefile('rb').readline())
+    assert not response['ok']
+    time.sleep(0.2)
+    assert not (tmp_path / 'x').exists()
@@ -0,0 +1,39 @@
+from build_cache import BUILD_VARIANTS, DEFAULT_BUILD, cache_key, resolve_build_variant
+
+COMMIT = '0123456789abcdef0123456789abcdef01234567'
+
+
+def test_cache_key_depends_on_toolchain():
+    old = cache_key(COMMIT, DEFAULT_BUILD, 'rustc 1.78.0 (9b00956e5 2024-04-29)')
+    new = cache_key(COMMIT, DEFAULT_BUILD, 'rustc 1.79.0 (129f3b996 2024-06-10)')
+    assert old != new
+    assert old == cache_key(COMMIT, DEFAULT_BUILD, 'rustc 1.78.0 (9b00956e5 2024-04-29)')
+    assert old.startswith(COMMIT[:12])
+
+
+def test_cache_key_depends_on_build_options():
+    lto = resolve_build_variant(DEFAULT_BUILD, BUILD_VARIANTS['lto'])
+    assert cache_key(COMMIT, DEFAULT_BUILD, 'rustc') != cache_key(COMMIT, lto, 'rustc')
+
+
+def test_native_binaries_are_built_per_cpu_model(monkeypatch):
+    import build_cache
+    models = {'receiver': 'x86_64 Intel(R) Xeon(R) Gold 6326', 'sender': 'x86_64 AMD EPYC 7543'}
+    built, shipped = [], []
+    monkeypatch.setattr(build_cache, 'rustc_version', lambda host: 'rustc 1.79.0')
+    monkeypatch.setattr(build_cache, 'cpu_model', lambda host: models[host])
+    monkeypatch.setattr(build_cache, 'has_binary', lambda host, key: False)
+    monkeypatch.setattr(build_cache, 'build_binary', lambda host, *args: built.append(host) or True)
+    monkeypatch.setattr(build_cache, 'ship_binary', lambda source, target, key: shipped.append(target) or True)
+    native = resolve_build_variant(DEFAULT_BUILD, BUILD_VARIANTS['native'])
+
+    first_path = build_cache.ensure_binary(['receiver', 'sender'], 'udperf', 'url', COMMIT, native)
+    assert first_path is not None
+    assert sorted(built) == ['receiver', 'sender'] and shipped == []
+
+    # Hosts with the same CPU share one build, and the key changes with the CPU models
+    built.clear()
+    models['sender'] = models['receiver']
+    path = build_cache.ensure_binary(['receiver', 'sender'], 'udperf', 'url', COMMIT, native)
+    assert built == ['receiver'] and shipped == ['sender']
+    assert path != first_path
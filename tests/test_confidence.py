@@ -0,0 +1,32 @@
+# 95% confidence intervals of the adaptive repetitions
+import math
+
+import pytest
+
+from confidence import Z_95, confidence_interval, relative_half_width, t_quantile
+
+
+def test_t_quantile():
+    assert t_quantile(1) == 12.706
+    assert t_quantile(4) == 2.776
+    # Between two entries of the table, the quantile of the lower one is used
+    assert t_quantile(27) == 2.060
+    assert t_quantile(1000) == Z_95
+
+
+def test_confidence_interval_of_few_repetitions():
+    mean, half_width = confidence_interval([10.0, 12.0])
+    assert mean == 11.0
+    assert half_width == pytest.approx(12.706) # Standard deviation sqrt(2) over sqrt(2) repetitions
+    mean, half_width = confidence_interval([9.0, 10.0, 11.0, 10.0, 10.0])
+    assert mean == 10.0
+    assert half_width == pytest.approx(2.776 * math.sqrt(0.5) / math.sqrt(5))
+    assert confidence_interval([10.0]) == (10.0, math.inf)
+
+
+def test_relative_half_width():
+    assert relative_half_width([9.0, 10.0, 11.0, 10.0, 10.0]) == pytest.approx(2.776 * math.sqrt(0.5) / math.sqrt(5) / 10)
+    assert relative_half_width([5.0, 5.0, 5.0]) == 0.0
+    # A zero mean, e.g. if no packet was received, never reaches the confidence target
+    assert relative_half_width([0.0, 0.0]) == math.inf
+    assert relative_half_width([-1.0, 1.0]) == math.inf
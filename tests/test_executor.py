@@ -0,0 +1,63 @@
+# Processes of a run under the supervisor: a failure or the deadline cancels the other processes of the run
+import sys
+import time
+
+import pytest
+
+from executor import RunProcess, execute_run
+
+
+@pytest.fixture
+def environment(tmp_path):
+    # The supervisor records its processes in the state directory
+    return {'UDPERF_SUPERVISOR_DIR': str(tmp_path / 'supervisor')}
+
+
+def python_process(name: str, script: str, environment: dict, **kwargs) -> RunProcess:
+    return RunProcess(name, [sys.executable, '-c', script], env=environment, **kwargs)
+
+
+def test_successful_run(environment):
+    processes = [python_process('receiver', 'print("done")', environment), python_process('sender', 'pass', environment)]
+    assert execute_run(processes, 10)
+
+
+def test_failure_cancels_other_processes(environment, tmp_path):
+    marker = tmp_path / 'finished'
+    receiver = python_process('receiver', f'import time; time.sleep(30); open("{marker}", "w")', environment)
+    sender = python_process('sender', 'import sys; sys.exit(1)', environment)
+    start = time.monotonic()
+    assert not execute_run([receiver, sender], 60)
+    assert time.monotonic() - start < 10
+    assert not marker.exists()
+
+
+def test_stderr_fails_run(environment):
+    process = python_process('receiver', 'import sys; print("bind failed", file=sys.stderr)', environment)
+    assert not execute_run([process], 10)
+    assert process.stderr_lines == ['bind failed\n']
+
+
+def test_deadline(environment):
+    start = time.monotonic()
+    assert not execute_run([python_process('receiver', 'import time; time.sleep(30)', environment)], 1)
+    assert time.monotonic() - start < 10
+
+
+def test_background_process_is_stopped(environment):
+    # Samplers run until the other processes finished, they do not fail the run
+    sampler = python_process('sampler', 'import time; time.sleep(30)', environment, background=True)
+    start = time.monotonic()
+    assert execute_run([python_process('receiver', 'pass', environment), sampler], 60)
+    assert time.monotonic() - start < 10
+
+
+def test_ready_check(environment):
+    started = []
+
+    async def ready(abort):
+        started.append('ready')
+        return False
+    sender = python_process('sender', 'pass', environment, after_ready=True)
+    assert not execute_run([python_process('receiver', 'import time; time.sleep(1)', environment), sender], 10, ready)
+    assert started == ['ready']
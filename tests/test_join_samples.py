@@ -0,0 +1,36 @@
+# Join of the sampler rows to the udperf intervals by time, although the sampler started before the sender
+import os
+import sys
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'visualize'))
+from join_samples import join_samples
+
+START = 1792200000.0
+
+
+def write_csv(path, rows: list[dict]) -> str:
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def test_samples_are_joined_by_time(tmp_path):
+    # udperf intervals of 0.5s ending at START + 0.5, + 1.0 and + 1.5, and its summary row
+    results = write_csv(tmp_path / 'receiver-uring.csv', [{'test_name': 'test', 'run_name': 1, 'repetition_id': 1, 'interval_id': interval_id, 'data_rate_gbit': 10.0} for interval_id in (1, 2, 3, 0)])
+    counters = write_csv(tmp_path / 'counters-uring.csv', [{'test_name': 'test', 'run_name': 1, 'repetition_id': 1, 'receiver_start_timestamp': START, 'sender_start_timestamp': START + 0.3, 'interval': 0.5}])
+    # The sampler started 0.3s before the receiver, so its interval 2 overlaps the first udperf interval the most. Most of its interval 1 lies before the run
+    samples = []
+    for interval_id in range(1, 5):
+        timestamp = START - 0.3 + interval_id * 0.5
+        samples += [{'test_name': 'test', 'run_name': 1, 'repetition_id': 1, 'interval_id': interval_id, 'timestamp': timestamp, 'cpu': cpu,
+                     'busy_percent': 10.0 * interval_id, 'user_percent': 0.0, 'system_percent': 0.0, 'irq_percent': 0.0, 'softirq_percent': 5.0 * interval_id * (cpu == '1'),
+                     'net_rx_per_second': 100, 'net_tx_per_second': 0} for cpu in ('all', '0', '1')]
+    samples = write_csv(tmp_path / 'receiver-cpu-uring.samples.csv', samples)
+
+    joined = join_samples(results, samples, counters, 'receiver', 'receiver_')
+    assert list(joined['interval_id']) == [0, 1, 2, 3]
+    assert list(joined['receiver_busy_percent']) == [30.0, 20.0, 30.0, 40.0]
+    assert list(joined['receiver_max_core_softirq_percent']) == [15.0, 10.0, 15.0, 20.0]
+    assert 'timestamp' not in joined.columns
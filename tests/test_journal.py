@@ -0,0 +1,51 @@
+# Campaign journal: completed units, resumed campaigns and failed runs
+from benchmark import RunResult, result_failed
+from journal import completed_units, last_campaign, load_events, record, resolve_campaign, unit_key
+
+
+def test_completed_units(tmp_path):
+    journal = str(tmp_path / 'journal.jsonl')
+    config = {'campaign': 'a', 'config_file': 'uring.json'}
+    record(journal, 'started', **config)
+    record(journal, 'started', **config, test_name='test', run_name='run 1')
+    record(journal, 'done', **config, test_name='test', run_name='run 1')
+    record(journal, 'started', **config, test_name='test', run_name='run 2')
+    record(journal, 'failed', **config, test_name='test', run_name='run 2')
+    # A failed run which succeeded later is completed
+    record(journal, 'started', **config, test_name='test', run_name='run 3')
+    record(journal, 'failed', **config, test_name='test', run_name='run 3')
+    record(journal, 'done', **config, test_name='test', run_name='run 3')
+    record(journal, 'done', campaign='b', config_file='uring.json', test_name='test', run_name='run 2')
+
+    assert completed_units(load_events(journal), 'a') == {unit_key({**config, 'test_name': 'test', 'run_name': 'run 1'}), unit_key({**config, 'test_name': 'test', 'run_name': 'run 3'})}
+
+
+def test_incomplete_last_line(tmp_path):
+    journal = tmp_path / 'journal.jsonl'
+    record(str(journal), 'done', campaign='a', config_file='uring.json')
+    # A crash while writing leaves an incomplete line, the next event starts on a new line
+    with open(journal, 'a') as file:
+        file.write('{"campaign": "a", "sta')
+    record(str(journal), 'done', campaign='a', config_file='syscalls.json')
+    assert [event['config_file'] for event in load_events(str(journal))] == ['uring.json', 'syscalls.json']
+
+
+def test_resolve_campaign(tmp_path):
+    journal = str(tmp_path / 'journal.jsonl')
+    record(journal, 'started', campaign='20261001-120000', config_file='uring.json')
+    record(journal, 'started', campaign='20261002-120000', config_file='syscalls.json')
+
+    assert resolve_campaign(journal, 'given', resume=True) == 'given'
+    assert resolve_campaign(journal, resume=True) == '20261002-120000'
+    assert resolve_campaign(journal, resume=True, config_file='uring.json') == '20261001-120000'
+    assert last_campaign(load_events(journal), config_file='missing.json') is None
+    # Without a campaign to resume, a new one is started
+    assert resolve_campaign(journal, resume=True, config_file='missing.json') not in ('20261001-120000', '20261002-120000')
+    assert resolve_campaign(journal) not in ('20261001-120000', '20261002-120000')
+
+
+def test_result_failed():
+    result = RunResult(test_name='test', run_name='run', build='develop', pair=None, repetitions=0, failed=True, memoized=False, time=10, duration_seconds=0)
+    assert result_failed(result)
+    assert not result_failed({'max_lossless_bandwidth': 1000, 'failed': False})
+    assert result_failed({'knee': None, 'failed': True})
@@ -0,0 +1,65 @@
+# Drop counters of /proc/net/softnet_stat, /proc/net/snmp and /proc/net/dev and their deltas per repetition
+from loss_counters import counter_deltas, parse_loss_counters
+from procfs import parse_net_dev, parse_snmp, parse_softnet_stat, split_proc_output
+
+SNMP = '''Ip: Forwarding DefaultTTL InReceives
+Ip: 1 64 1000
+Udp: InDatagrams NoPorts InErrors OutDatagrams RcvbufErrors SndbufErrors InCsumErrors IgnoredMulti MemErrors
+Udp: {in_datagrams} 3 {in_errors} 20 {rcvbuf_errors} 0 0 0 0
+'''
+NET_DEV = '''Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo:  1000      10    0   {lo_drop}    0     0          0         0     1000      10    0    0    0     0       0          0
+  ens6f0np0: 150000 100    0   {rx_drop}    1     0          0         0     3000      20    0    2    0     0       0          0
+'''
+# Linux 5.10 and newer: 13 values per line, the last one is the CPU. CPU 1 is offline
+SOFTNET_STAT = '''{processed:08x} {dropped:08x} 00000002 00000000 00000000 00000000 00000000 00000000 00000000 00000000 00000000 00000000 00000000
+00000100 00000000 00000001 00000000 00000000 00000000 00000000 00000000 00000000 00000000 00000000 00000000 00000002
+'''
+
+
+def contents(in_datagrams=100, in_errors=5, rcvbuf_errors=4, lo_drop=0, rx_drop=7, processed=0x200, dropped=1) -> dict[str, str]:
+    return {
+        '/proc/net/snmp': SNMP.format(in_datagrams=in_datagrams, in_errors=in_errors, rcvbuf_errors=rcvbuf_errors),
+        '/proc/net/dev': NET_DEV.format(lo_drop=lo_drop, rx_drop=rx_drop),
+        '/proc/net/softnet_stat': SOFTNET_STAT.format(processed=processed, dropped=dropped),
+    }
+
+
+def test_parse_softnet_stat():
+    assert parse_softnet_stat(contents()['/proc/net/softnet_stat']) == {0: {'processed': 0x200, 'dropped': 1, 'time_squeeze': 2}, 2: {'processed': 0x100, 'dropped': 0, 'time_squeeze': 1}}
+    # Older kernels list the online CPUs in order without their number
+    assert list(parse_softnet_stat('00000010 00000000 00000000\n00000020 00000001 00000000\n')) == [0, 1]
+
+
+def test_parse_snmp_and_net_dev():
+    assert parse_snmp(contents()['/proc/net/snmp'])['Udp']['RcvbufErrors'] == 4
+    assert parse_snmp(contents()['/proc/net/snmp'])['Ip']['InReceives'] == 1000
+    net_dev = parse_net_dev(contents()['/proc/net/dev'])
+    assert list(net_dev) == ['lo', 'ens6f0np0']
+    assert net_dev['ens6f0np0']['rx_drop'] == 7 and net_dev['ens6f0np0']['tx_drop'] == 2
+
+
+def test_loss_counters():
+    counters = parse_loss_counters(contents(lo_drop=50), 'ens6f0np0')
+    assert counters['udp_rcvbuf_errors'] == 4 and counters['udp_no_ports'] == 3
+    assert counters['softnet_dropped'] == 1 and counters['softnet_time_squeeze'] == 3
+    # rx drops and fifo overruns of the interface, loopback is not counted
+    assert counters['nic_rx_dropped'] == 8 and counters['nic_tx_dropped'] == 2
+    assert parse_loss_counters(contents(lo_drop=50))['nic_rx_dropped'] == 8
+
+
+def test_counter_deltas():
+    before = parse_loss_counters(contents(), 'ens6f0np0')
+    after = parse_loss_counters(contents(in_datagrams=1100, in_errors=15, rcvbuf_errors=14, rx_drop=9, dropped=3), 'ens6f0np0')
+    deltas = counter_deltas(before, after, 'receiver_')
+    assert deltas['receiver_udp_in_datagrams'] == 1000
+    assert deltas['receiver_udp_rcvbuf_errors'] == 10 and deltas['receiver_udp_in_errors'] == 10
+    assert deltas['receiver_softnet_dropped'] == 2 and deltas['receiver_nic_rx_dropped'] == 2
+    assert deltas['receiver_udp_no_ports'] == 0
+
+
+def test_split_proc_output():
+    output = '### udperf-procfs /proc/net/snmp\nUdp: InDatagrams\nUdp: 1\n### udperf-procfs /proc/net/dev\n'
+    assert split_proc_output(output, ['/proc/net/snmp', '/proc/net/dev', '/proc/net/softnet_stat']) == {
+        '/proc/net/snmp': 'Udp: InDatagrams\nUdp: 1\n', '/proc/net/dev': '', '/proc/net/softnet_stat': ''}
@@ -0,0 +1,48 @@
+# Queue balance of the NIC statistics per repetition, computed over the queues used by the run
+import csv
+import logging
+
+from benchmark import Session, record_run_counters
+from nic_stats import nic_deltas, parse_ethtool_stats
+
+
+def ethtool_stats(packets: list[int]) -> dict[str, int]:
+    text = 'NIC statistics:\n' + ''.join(f'     rx_queue_{queue}_packets: {count}\n     rx_queue_{queue}_bytes: {count * 1500}\n' for queue, count in enumerate(packets))
+    return parse_ethtool_stats(text + '     rx_dropped: 0\n')
+
+
+def local_session(tmp_path) -> Session:
+    return Session('uring.json', 'uring.csv', f'{tmp_path}/', f'{tmp_path}/', None, None, None, None, [], {}, f'{tmp_path}/journal.jsonl', 'campaign')
+
+
+def record_receiver_queues(tmp_path, receiver: dict, packets: list[int]) -> dict:
+    before = {'receiver': {'loss': None, 'nic': ethtool_stats([0] * 12)}, 'sender': {'loss': None, 'nic': None}}
+    after = {'receiver': {'loss': None, 'nic': ethtool_stats(packets)}, 'sender': {'loss': None, 'nic': None}}
+    record_run_counters(local_session(tmp_path), {'run_name': 'run', 'receiver': receiver, 'sender': {}}, 'test', 1, before, after)
+    with open(tmp_path / 'counters-uring.csv', newline='') as file:
+        return next(csv.DictReader(file))
+
+
+def test_nic_deltas():
+    columns, queue_rows = nic_deltas(ethtool_stats([0, 0, 0]), ethtool_stats([100, 100, 50]), 'rx', 2, 'receiver_')
+    assert columns['receiver_rx_queue_max_mean'] == 1.0
+    assert columns['receiver_rx_packets_outside_queues'] == 50
+    assert columns['receiver_ethtool_rx_dropped'] == 0
+    assert [row['rx_packets'] for row in queue_rows] == [100, 100, 50]
+
+
+def test_single_queue_run_is_balanced(tmp_path, caplog):
+    with caplog.at_level(logging.WARNING):
+        row = record_receiver_queues(tmp_path, {'parallel': 1}, [1000] + [0] * 11)
+    assert row['receiver_rx_queue_max_mean'] == '1.0'
+    assert row['receiver_rx_queue_jain_index'] == '1.0'
+    assert row['receiver_rx_packets_outside_queues'] == '0'
+    assert 'Unbalanced' not in caplog.text
+
+
+def test_unbalanced_multi_queue_run(tmp_path, caplog):
+    with caplog.at_level(logging.WARNING):
+        row = record_receiver_queues(tmp_path, {'parallel': 4}, [700, 100, 100, 100] + [0] * 8)
+    assert row['receiver_rx_queue_max_mean'] == '2.8'
+    assert row['receiver_rx_queue_busiest_queue'] == '0'
+    assert 'Unbalanced rx queues on the receiver: queue 0 carried 2.8x the mean packets of 4 queues' in caplog.text
@@ -0,0 +1,74 @@
+# perf stat mode with a stub perf on PATH, which prints a warning like the real one and writes fixed counters
+import csv
+import os
+import subprocess
+import sys
+
+from benchmark import Session, record_run_counters
+from perf_stat import perf_command, perf_metrics, perf_output_path, parse_perf_stat
+
+STUB_PERF = f'''#!{sys.executable}
+import subprocess, sys
+arguments = sys.argv[1:]
+output_path = arguments[arguments.index('-o') + 1]
+print('WARNING: LLC-load-misses event is not supported by the kernel.', file=sys.stderr)
+# Like perf, the command inherits all file descriptors
+returncode = subprocess.call(arguments[arguments.index('--') + 1:], close_fds=False)
+with open(output_path, 'w') as file:
+    file.write('# started on Sat Oct 17 12:00:00 2026\\n\\n')
+    file.write('2000000,,cpu_core/cycles/,100,100.00,,\\n1000000,,cpu_atom/cycles/,100,100.00,,\\n')
+    file.write('4500000,,instructions:u,100,100.00,1.50,insn per cycle\\n50000,,cache-references,100,100.00,,\\n')
+    file.write('1000,,cache-misses,100,100.00,2.00,of all cache refs\\n<not supported>,,LLC-load-misses,0,100.00,,\\n')
+    file.write('<not counted>,,context-switches,0,0.00,,\\n')
+sys.exit(returncode)
+'''
+
+
+def run_under_stub_perf(tmp_path, monkeypatch, script: str, role: str = 'receiver') -> subprocess.CompletedProcess:
+    (tmp_path / 'bin').mkdir(exist_ok=True)
+    (tmp_path / 'bin' / 'perf').write_text(STUB_PERF)
+    (tmp_path / 'bin' / 'perf').chmod(0o755)
+    monkeypatch.setenv('PATH', f'{tmp_path}/bin{os.pathsep}{os.environ["PATH"]}')
+    command = perf_command([sys.executable, '-c', script], perf_output_path(f'{tmp_path}/', role, 'uring.csv'))
+    return subprocess.run(command, capture_output=True, text=True)
+
+
+def test_perf_warnings_do_not_reach_stderr(tmp_path, monkeypatch):
+    result = run_under_stub_perf(tmp_path, monkeypatch, 'print("udperf")')
+    assert result.returncode == 0
+    assert result.stdout == 'udperf\n'
+    assert result.stderr == ''
+    assert 'not supported' in (tmp_path / 'receiver-uring.perf-stderr.log').read_text()
+
+
+def test_udperf_stderr_and_returncode_are_kept(tmp_path, monkeypatch):
+    result = run_under_stub_perf(tmp_path, monkeypatch, 'import sys; print("bind failed", file=sys.stderr); sys.exit(3)')
+    assert result.returncode == 3
+    assert result.stderr == 'bind failed\n'
+
+
+def test_parse_perf_stat(tmp_path, monkeypatch):
+    run_under_stub_perf(tmp_path, monkeypatch, 'pass')
+    counters = parse_perf_stat((tmp_path / 'receiver-uring.perf.log').read_text())
+    # The cycles of both core types of a hybrid CPU are added up, events which were not counted are left out
+    assert counters == {'cycles': 3000000, 'instructions': 4500000, 'cache_references': 50000, 'cache_misses': 1000}
+    assert perf_metrics(counters, 1000, 'receiver_') == {
+        'receiver_cycles': 3000000, 'receiver_instructions': 4500000, 'receiver_cache_references': 50000, 'receiver_cache_misses': 1000,
+        'receiver_ipc': 1.5, 'receiver_cycles_per_packet': 3000.0, 'receiver_cache_misses_per_packet': 1.0}
+    assert 'receiver_cycles_per_packet' not in perf_metrics(counters, None, 'receiver_')
+
+
+def test_counters_row(tmp_path, monkeypatch):
+    for role in ('receiver', 'sender'):
+        run_under_stub_perf(tmp_path, monkeypatch, 'pass', role)
+    session = Session('uring.json', 'uring.csv', f'{tmp_path}/', f'{tmp_path}/', None, None, None, None, [], {}, f'{tmp_path}/journal.jsonl', 'campaign', perf_stat=True)
+    counters = {'loss': None, 'nic': None}
+    record_run_counters(session, {'run_name': 'run', 'receiver': {}, 'sender': {}}, 'test', 1, {'receiver': counters, 'sender': counters}, {'receiver': counters, 'sender': counters})
+
+    with open(tmp_path / 'counters-uring.csv', newline='') as file:
+        row = next(csv.DictReader(file))
+    assert row['test_name'] == 'test' and row['repetition_id'] == '1'
+    assert row['receiver_ipc'] == '1.5' and row['sender_ipc'] == '1.5'
+    assert row['sender_cache_misses'] == '1000'
+    assert 'receiver_llc_load_misses' not in row
+    assert session.run_counters[('test', 'run', 1)]['receiver_cycles'] == 3000000
@@ -0,0 +1,73 @@
+# Estimate of the dry run from the run summaries of earlier campaigns
+import json
+import os
+
+import pytest
+
+import benchmark
+from benchmark import Benchmark, BenchmarkOptions, print_plan
+from planner import measured_overhead, previous_runs_files
+from results import append_run_record
+
+RUN = {'run_name': 'single', 'repetitions': 2, 'sender': {'time': 10}, 'receiver': {}}
+
+
+def write_runs_file(path, durations: list[float], memoized=False, measured_repetitions=2):
+    for duration in durations:
+        append_run_record(str(path), {'test_name': 'test', 'run_name': 'single', 'repetitions': 2, 'memoized': memoized, 'time': 10, 'duration_seconds': duration,
+                                      'measured_repetitions': measured_repetitions})
+
+
+def test_previous_runs_files(tmp_path):
+    for index, name in enumerate(['runs-uring-10-01-12:00.csv', 'runs-uring-10-02-12:00.csv', 'runs-uring-recv1-send1-20261003-120000.csv', 'runs-uring-10-04-12:00.csv', 'runs-uring_gsro-10-05-12:00.csv']):
+        write_runs_file(tmp_path / name, [24])
+        os.utime(tmp_path / name, (1000 + index, 1000 + index))
+    # Only the newest campaigns of the same config, oldest first
+    assert [os.path.basename(path) for path in previous_runs_files(str(tmp_path) + '/', 'configs/uring.json', 3)] == \
+        ['runs-uring-10-02-12:00.csv', 'runs-uring-recv1-send1-20261003-120000.csv', 'runs-uring-10-04-12:00.csv']
+
+
+def test_measured_overhead(tmp_path):
+    write_runs_file(tmp_path / 'runs-uring-10-01-12:00.csv', [24, 28])
+    write_runs_file(tmp_path / 'runs-uring-10-02-12:00.csv', [26])
+    # Memoized runs were not measured, their duration says nothing about the overhead
+    write_runs_file(tmp_path / 'runs-uring-10-03-12:00.csv', [0.1], memoized=True)
+    assert measured_overhead(previous_runs_files(str(tmp_path), 'uring.json')) == 3.0
+    assert measured_overhead(previous_runs_files(str(tmp_path), 'syscalls.json')) is None
+
+
+def test_measured_overhead_of_resumed_runs(tmp_path):
+    # One of the two repetitions was resumed from the interrupted campaign and took no time
+    write_runs_file(tmp_path / 'runs-uring-10-01-12:00.csv', [13], measured_repetitions=1)
+    assert measured_overhead(previous_runs_files(str(tmp_path), 'uring.json')) == 3.0
+    # Runs summaries of older versions without the measured repetitions still count all repetitions
+    append_run_record(str(tmp_path / 'runs-syscalls-10-01-12:00.csv'), {'test_name': 'test', 'run_name': 'single', 'repetitions': 2, 'memoized': False, 'time': 10, 'duration_seconds': 24})
+    assert measured_overhead(previous_runs_files(str(tmp_path), 'syscalls.json')) == 2.0
+    # Never a negative overhead, e.g. if a repetition ended early
+    write_runs_file(tmp_path / 'runs-gsro-10-01-12:00.csv', [5], measured_repetitions=1)
+    assert measured_overhead(previous_runs_files(str(tmp_path), 'gsro.json')) == 0.0
+
+
+def test_dry_run_uses_earlier_campaign(tmp_path, capsys):
+    write_runs_file(tmp_path / 'runs-uring-10-01-12:00.csv', [26])
+    print_plan([('test', RUN)], {'develop': '/nonexistent/udperf'}, None, 'uring-10-02-13:00.csv', str(tmp_path) + '/', previous_runs_files(str(tmp_path), 'configs/uring.json'))
+    output = capsys.readouterr().out
+    assert '~0h 00m 26s' in output
+    assert 'measured overhead of 3.0s per repetition' in output
+
+
+def test_dry_run_does_not_build(tmp_path, monkeypatch, capsys):
+    # Building or shipping a binary would change the hosts
+    monkeypatch.setattr(benchmark, 'ensure_binary', lambda *args: pytest.fail('binary built in a dry run'))
+    monkeypatch.setattr(benchmark, 'build_local_binary', lambda *args: pytest.fail('binary built in a dry run'))
+    monkeypatch.setattr(benchmark, 'planned_binary', lambda hosts, repo_url, revision, build: f'.cache/udperf-bin/{revision}/udperf')
+    config_file = tmp_path / 'uring.json'
+    config_file.write_text(json.dumps({'parameters': {'repetitions': 1, 'time': 1}, 'test': {'single': {'sender': {}, 'receiver': {}}}}))
+    options = BenchmarkOptions(ssh_sender='sender', ssh_receiver='receiver', results_folder=f'{tmp_path}/hosts/', summary_folder=f'{tmp_path}/summaries/', dry_run=True)
+
+    assert Benchmark(options).run_config(str(config_file), 'uring.csv') == []
+    assert '.cache/udperf-bin/develop/udperf receiver' in capsys.readouterr().out
+    assert not os.path.exists(f'{tmp_path}/summaries/')
+
+    options.ssh_sender = options.ssh_receiver = None
+    assert Benchmark(options).provide_builds(str(config_file)) == {'local': options.udperf_bin}
@@ -0,0 +1,44 @@
+# Reading the result rows of a repetition, only the rows appended since the previous repetition are read
+import results
+from results import ResultTail
+
+HEADER = 'test_name,run_name,repetition_id,interval_id,data_rate_gbit\n'
+
+
+def repetition(repetition_id: int, data_rate: float) -> str:
+    return f'test,single,{repetition_id},1,{data_rate}\ntest,single,{repetition_id},0,{data_rate}\n'
+
+
+def test_only_new_rows_are_read(tmp_path, monkeypatch):
+    path = tmp_path / 'receiver-uring.csv'
+    offsets = []
+    read_result_file = results.read_result_file
+    monkeypatch.setattr(results, 'read_result_file', lambda path, host=None, agent=None, offset=0: offsets.append(offset) or read_result_file(path, host, agent, offset))
+    tail = ResultTail(str(path))
+
+    path.write_text(HEADER + repetition(1, 10.0))
+    assert tail.repetition_text('test', 'single', 1) == HEADER + repetition(1, 10.0)
+    with open(path, 'a') as file:
+        file.write(repetition(2, 12.0) + 'test,sing')
+    assert tail.repetition_text('test', 'single', 2) == HEADER + repetition(2, 12.0)
+    # The sender rows of the same repetition are read from the same rows, the incomplete row is left for the next read
+    assert tail.repetition_text('test', 'single', 2) == HEADER + repetition(2, 12.0)
+    assert offsets == [0, len(HEADER + repetition(1, 10.0)), len(HEADER + repetition(1, 10.0) + repetition(2, 12.0))]
+
+
+def test_rows_read_before_are_read_from_whole_file(tmp_path):
+    path = tmp_path / 'receiver-uring.csv'
+    path.write_text(HEADER + repetition(1, 10.0) + repetition(2, 12.0))
+    tail = ResultTail(str(path))
+    assert results.repetition_value(tail.repetition_text('test', 'single', 2), 'test', 'single', 2) == 12.0
+    with open(path, 'a') as file:
+        file.write(repetition(3, 14.0))
+    assert results.repetition_value(tail.repetition_text('test', 'single', 3), 'test', 'single', 3) == 14.0
+    assert results.repetition_value(tail.repetition_text('test', 'single', 1), 'test', 'single', 1) == 10.0
+
+
+def test_missing_file(tmp_path):
+    tail = ResultTail(str(tmp_path / 'receiver-uring.csv'))
+    assert tail.repetition_text('test', 'single', 1) == ''
+    (tmp_path / 'receiver-uring.csv').write_text(HEADER + repetition(1, 10.0))
+    assert tail.repetition_text('test', 'single', 1) == HEADER + repetition(1, 10.0)
@@ -0,0 +1,58 @@
+# Reuse of repetitions measured in an earlier campaign, after its result files were collected from the hosts
+import logging
+import os
+import shutil
+
+from benchmark import BenchmarkOptions, Session, index_repetition, memoized_entries, reuse_repetitions
+from results import read_result_file, repetition_value
+from results_index import index_path, load_index
+
+RUN = {'run_name': 'single', 'repetitions': 2, 'sender': {'time': 10}, 'receiver': {'parallel': 1}}
+HEADER = 'test_name,run_name,repetition_id,interval_id,data_rate_gbit\n'
+
+
+def local_session(tmp_path, csv_file_name: str) -> Session:
+    results_folder = f'{tmp_path}/hosts/'
+    summary_folder = f'{tmp_path}/summaries/'
+    os.makedirs(results_folder, exist_ok=True)
+    return Session('uring.json', csv_file_name, results_folder, summary_folder, None, None, None, None, [], {}, f'{summary_folder}journal.jsonl', 'campaign')
+
+
+def measure_earlier_campaign(session: Session):
+    for mode in ('receiver', 'sender'):
+        with open(f'{session.results_folder}{mode}-{session.csv_file_name}', 'w') as file:
+            file.write(HEADER)
+            for repetition_id, data_rate in ((1, 10.0), (2, 12.0)):
+                file.write(f'test,single,{repetition_id},1,{data_rate}\ntest,single,{repetition_id},0,{data_rate}\n')
+    for repetition_id, data_rate in ((1, 10.0), (2, 12.0)):
+        assert index_repetition(session, RUN, 'test', repetition_id, 'runhash', index_path(session.summary_folder), data_rate)
+
+
+def test_reuse_from_earlier_campaign(tmp_path):
+    earlier = local_session(tmp_path, 'uring-10-01-12:00.csv')
+    measure_earlier_campaign(earlier)
+    # run.py deletes the results on the hosts after collecting them
+    shutil.rmtree(earlier.results_folder)
+
+    session = local_session(tmp_path, 'uring-10-02-12:00.csv')
+    entries = memoized_entries(load_index(index_path(session.summary_folder)), 'runhash', RUN, BenchmarkOptions())
+    assert len(entries) == 2
+    assert reuse_repetitions(session, RUN, 'test@develop', entries) == [10.0, 12.0]
+    for mode in ('receiver', 'sender'):
+        text = read_result_file(f'{session.results_folder}{mode}-{session.csv_file_name}')
+        assert text.startswith(HEADER)
+        assert repetition_value(text, 'test@develop', 'single', 2) == 12.0
+        assert len(text.splitlines()) == 5
+
+
+def test_reuse_with_missing_rows(tmp_path, caplog):
+    earlier = local_session(tmp_path, 'uring-10-01-12:00.csv')
+    measure_earlier_campaign(earlier)
+    shutil.rmtree(f'{earlier.summary_folder}results-index')
+
+    session = local_session(tmp_path, 'uring-10-02-12:00.csv')
+    entries = memoized_entries(load_index(index_path(session.summary_folder)), 'runhash', RUN, BenchmarkOptions())
+    with caplog.at_level(logging.WARNING):
+        assert reuse_repetitions(session, RUN, 'test', entries) is None
+    assert 'measuring the run again' in caplog.text
+    assert not os.path.exists(f'{session.results_folder}receiver-{session.csv_file_name}')
@@ -0,0 +1,53 @@
+# Rows of the sampler per interval, from /proc files read before and after the interval
+from sampler import benchmark_sockets, cpu_rows, drop_rows, socket_rows
+from test_loss_counters import contents
+
+UDP_HEADER = '   sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode ref pointer drops\n'
+
+
+def udp_socket(local_port: int, remote_port: int, inode: int, rx_queue: int = 0, drops: int = 0) -> str:
+    remote_address = '0100007F' if remote_port else '00000000'
+    return f'   0: 00000000:{local_port:04X} {remote_address}:{remote_port:04X} 07 00000000:{rx_queue:08X} 00:00000000 00000000  1000        0 {inode} 2 0000000000000000 {drops}\n'
+
+
+def socket_files(udp: str, udp6: str = '') -> dict[str, str]:
+    return {'/proc/net/udp': UDP_HEADER + udp, '/proc/net/udp6': UDP_HEADER + udp6,
+            '/proc/net/sockstat': 'sockets: used 100\nUDP: inuse 3 mem 12\n', '/proc/sys/net/ipv4/udp_mem': '190000\t253334\t380000\n'}
+
+
+def test_benchmark_sockets():
+    files = socket_files(udp_socket(45001, 0, 101) + udp_socket(53, 0, 102) + udp_socket(38000, 45002, 103), udp_socket(45003, 0, 104))
+    # Bound to a benchmark port (receiver), connected to one (sender), over IPv4 and IPv6. The DNS socket is left out
+    assert sorted(benchmark_sockets(files, {45001, 45002, 45003})) == [101, 103, 104]
+    assert sorted(benchmark_sockets(files, {45001})) == [101]
+
+
+def test_socket_rows():
+    before = socket_files(udp_socket(45001, 0, 101, drops=5))
+    after = socket_files(udp_socket(45001, 0, 101, rx_queue=4096, drops=8) + udp_socket(45002, 0, 102, drops=2) + udp_socket(53, 0, 103, drops=100))
+    rows = socket_rows(before, after, 0.5, {45001, 45002})
+    assert rows[0] == {'socket': 'all', 'rx_queue_bytes': 4096, 'tx_queue_bytes': 0, 'drops': 5, 'udp_inuse': 3, 'udp_mem_pages': 12, 'udp_mem_pressure_pages': 253334}
+    # A socket opened during the interval dropped all of its packets in it
+    assert [(row['socket'], row['drops']) for row in rows[1:]] == [('101', 3), ('102', 2)]
+
+
+def test_drop_rows():
+    rows = drop_rows(contents(processed=0x200, dropped=1), contents(processed=0x300, dropped=4, rcvbuf_errors=10), 0.5, set())
+    assert rows[0]['cpu'] == 'all'
+    assert rows[0]['softnet_processed_per_second'] == 0x100 * 2
+    assert rows[0]['softnet_dropped'] == 3 and rows[0]['udp_rcvbuf_errors'] == 6
+    assert [(row['cpu'], row['softnet_dropped']) for row in rows[1:]] == [('0', 3), ('2', 0)]
+
+
+def test_cpu_rows_of_host_with_offline_cpu():
+    # CPU 1 is offline, the softirq columns are matched to the CPUn header instead of the position
+    stat = 'cpu  {0} 0 {0} 100 0 0 {0} 0 0 0\ncpu0 {1} 0 0 50 0 0 {1} 0 0 0\ncpu2 0 0 {2} {3} 0 0 0 0 0 0\n'
+    softirqs = '                    CPU0       CPU2\n      NET_TX:          1          {0}\n      NET_RX:          {1}          {2}\n'
+    before = {'/proc/stat': stat.format(0, 0, 0, 50), '/proc/softirqs': softirqs.format(0, 100, 200)}
+    after = {'/proc/stat': stat.format(100, 50, 50, 100), '/proc/softirqs': softirqs.format(10, 150, 400)}
+    rows = {row['cpu']: row for row in cpu_rows(before, after, 0.5, set())}
+    assert list(rows) == ['all', '0', '2']
+    assert rows['all']['net_rx_per_second'] == 500 and rows['all']['net_tx_per_second'] == 20
+    assert rows['0']['net_rx_per_second'] == 100 and rows['0']['softirq_percent'] == 50.0
+    assert rows['2']['net_rx_per_second'] == 400 and rows['2']['net_tx_per_second'] == 20
+    assert rows['2']['busy_percent'] == 50.0 and rows['2']['system_percent'] == 50.0
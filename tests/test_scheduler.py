@@ -0,0 +1,96 @@
+# Dispatch of the runs of a campaign to two host pairs, with a fake Benchmark instead of hosts
+import json
+import threading
+import time
+
+import pytest
+
+import scheduler
+from benchmark import BenchmarkOptions, RunResult
+from journal import completed_units, load_events, record, unit_key
+
+RUN_NAMES = ['run 1', 'run 2', 'run 3', 'run 4', 'run 5']
+
+
+class FakeBenchmark:
+    executed = []
+    broken_pairs = set() # Pairs whose runs have no measured repetition
+    lock = threading.Lock()
+
+    def __init__(self, options: BenchmarkOptions):
+        self.options = options
+        self.binaries = {}
+
+    def connect(self) -> bool:
+        return True
+
+    def refresh_fingerprints(self):
+        pass
+
+    def run_config(self, config_file: str, csv_file_name=None, only_runs=None):
+        assert self.binaries == {('develop', 'build'): '.cache/udperf/binary'}
+        assert not self.options.resume
+        with self.lock:
+            self.executed.append((self.options.pair, config_file, *only_runs[0]))
+        time.sleep(0.05)
+        failed = self.options.pair in self.broken_pairs
+        return [RunResult(test_name=only_runs[0][0], run_name=only_runs[0][1], build='develop', pair=self.options.pair, repetitions=0 if failed else 1,
+                          failed=failed, memoized=False, time=1, duration_seconds=1)]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, 'Benchmark', FakeBenchmark)
+    monkeypatch.setattr(scheduler, 'pair_healthy', lambda pair: True)
+    FakeBenchmark.executed = []
+    FakeBenchmark.broken_pairs = set()
+    path = tmp_path / 'uring.json'
+    path.write_text(json.dumps({'parameters': {'repetitions': 1, 'time': 1}, 'test': {run_name: {'sender': {}, 'receiver': {}} for run_name in RUN_NAMES}}))
+    return str(path)
+
+
+def dispatch(tmp_path, config_file: str, campaign: str, completed=frozenset()) -> dict:
+    summary_folder = f'{tmp_path}/summaries/'
+    state = scheduler.new_state(scheduler.build_queue([config_file], campaign=campaign, completed=completed), summary_folder, campaign)
+    pairs = [scheduler.parse_pair('recv1,send1'), scheduler.parse_pair('recv2,send2')]
+    scheduler.dispatch(pairs, state, campaign, BenchmarkOptions(summary_folder=summary_folder, resume=True), {('develop', 'build'): '.cache/udperf/binary'})
+    return state
+
+
+def test_every_run_once(tmp_path, config_file):
+    state = dispatch(tmp_path, config_file, 'campaign')
+    runs = [run_name for _, _, _, run_name in FakeBenchmark.executed]
+    assert sorted(runs) == RUN_NAMES
+    assert {pair for pair, *_ in FakeBenchmark.executed} == {'recv1-send1', 'recv2-send2'}
+    assert not state['queue'] and not state['failed']
+
+    # One journal unit per dispatched run, the config itself is not a unit
+    events = load_events(state['journal'])
+    assert len(events) == 2 * len(RUN_NAMES)
+    assert completed_units(events, 'campaign') == {unit_key({'campaign': 'campaign', 'config_file': config_file, 'test_name': 'test', 'run_name': run_name}) for run_name in RUN_NAMES}
+
+
+def test_resume_skips_completed_runs(tmp_path, config_file):
+    journal = f'{tmp_path}/summaries/journal.jsonl'
+    for run_name in RUN_NAMES[:2]:
+        record(journal, 'started', campaign='campaign', config_file=config_file, test_name='test', run_name=run_name, pair='recv1-send1')
+        record(journal, 'done', campaign='campaign', config_file=config_file, test_name='test', run_name=run_name, pair='recv1-send1')
+    # The interrupted run is dispatched again
+    record(journal, 'started', campaign='campaign', config_file=config_file, test_name='test', run_name=RUN_NAMES[2], pair='recv2-send2')
+
+    dispatch(tmp_path, config_file, 'campaign', completed_units(load_events(journal), 'campaign'))
+    assert sorted(run_name for _, _, _, run_name in FakeBenchmark.executed) == RUN_NAMES[2:]
+
+
+def test_broken_pair_is_drained(tmp_path, config_file):
+    FakeBenchmark.broken_pairs = {'recv2-send2'}
+    state = dispatch(tmp_path, config_file, 'campaign')
+    assert state['drained'] == ['recv2-send2']
+    assert len([pair for pair, *_ in FakeBenchmark.executed if pair == 'recv2-send2']) == scheduler.MAX_CONSECUTIVE_FAILURES
+    # Every run succeeds once on the healthy pair, none is given up
+    assert sorted(run_name for pair, _, _, run_name in FakeBenchmark.executed if pair == 'recv1-send1') == RUN_NAMES
+    assert not state['failed']
+    assert len(completed_units(load_events(state['journal']), 'campaign')) == len(RUN_NAMES)
@@ -0,0 +1,73 @@
+# Search modes: bisection for the maximum lossless rate and adaptive sampling of the knee of a scaling curve
+from search import find_knee, find_max_lossless_rate
+
+
+def loss_above(limit: int):
+    def measure(rate):
+        measured.append(rate)
+        return {'packet_loss': 0.0 if rate <= limit else (rate - limit) / 100, 'data_rate_gbit': rate / 1000}
+    measured = []
+    measure.measured = measured
+    return measure
+
+
+def test_lossless_rate_converges_to_loss_threshold():
+    measure = loss_above(7300)
+    best, curve = find_max_lossless_rate(measure, 0, 10000, loss_threshold=0.1, precision=0.02)
+    # 7310 loses exactly the threshold of 0.1% and still counts as lossless
+    assert 7310 * 0.98 <= best <= 7310
+    lossy = min(point['rate'] for point in curve if not point['lossless'])
+    assert lossy - best <= 0.02 * lossy
+    assert measure.measured[0] == 10000
+    assert [point['rate'] for point in curve] == sorted(measure.measured)
+
+
+def test_lossless_max_bandwidth():
+    best, curve = find_max_lossless_rate(loss_above(20000), 0, 10000)
+    assert best == 10000 and len(curve) == 1
+
+
+def test_min_bandwidth_already_lossy():
+    measure = loss_above(500)
+    best, curve = find_max_lossless_rate(measure, 1000, 10000, max_steps=12)
+    assert best is None
+    assert not any(point['lossless'] for point in curve)
+    assert all(1000 < rate <= 10000 for rate in measure.measured)
+    assert len(measure.measured) <= 12
+
+
+def test_search_stops_on_failed_measurement():
+    best, curve = find_max_lossless_rate(lambda rate: None, 0, 10000)
+    assert best is None and curve == []
+
+
+def test_knee_of_saturating_curve():
+    measured = []
+    # Throughput grows linearly up to 8 threads and stays flat afterwards
+    result = find_knee(lambda value: measured.append(value) or min(value, 8) * 1.0, list(range(1, 17)), budget=8)
+    assert result['knee'] == 8
+    assert result['peak'] == 8 and result['peak_efficiency'] == 1
+    assert len(measured) == 8 == len(set(measured))
+    assert measured[:3] == [1, 9, 16]
+    assert result['points'] == sorted(result['points'])
+
+
+def test_knee_of_geometric_candidates():
+    # Ring sizes are refined by their position in the candidate list
+    result = find_knee(lambda value: float(min(value, 8)), [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024], budget=6)
+    assert result['knee'] == 8
+    assert len(result['points']) == 6
+
+
+def test_knee_budget_with_failed_values():
+    measured = []
+
+    def measure(value):
+        measured.append(value)
+        return None if value == 5 else float(min(value, 8))
+    result = find_knee(measure, list(range(1, 17)), budget=4)
+    assert len(result['points']) == 4
+    # The failed value is not measured again and does not count against the budget
+    assert measured.count(5) == 1
+    assert 5 not in [value for value, _ in result['points']]
+    assert find_knee(lambda value: None, [1, 2, 4], budget=4) == {'points': [], 'knee': None, 'peak_efficiency': None, 'peak': None}
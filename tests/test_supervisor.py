@@ -0,0 +1,53 @@
+# Reaping of processes left behind by a crashed orchestrator, identified by pid and start time
+import json
+import os
+import subprocess
+import time
+
+import pytest
+
+import supervisor
+from supervisor import process_start_time, reap, state_path
+
+
+@pytest.fixture
+def state_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(supervisor, 'STATE_DIRECTORY', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def sleeper():
+    process = subprocess.Popen(['sleep', '60'], start_new_session=True)
+    yield process
+    process.kill()
+    process.wait()
+
+
+def record_state(name: str, pid: int, start_time):
+    with open(state_path(name), 'w') as state_file:
+        json.dump({'pid': pid, 'start_time': start_time, 'command': ['sleep', '60']}, state_file)
+
+
+def test_reap_stops_recorded_process(state_directory, sleeper):
+    record_state('receiver', sleeper.pid, process_start_time(sleeper.pid))
+    assert reap() == ['receiver']
+    assert sleeper.wait(5) != 0
+    assert not os.listdir(state_directory)
+
+
+def test_reap_leaves_reused_pid_alone(state_directory, sleeper):
+    # The recorded process exited and its pid now belongs to an unrelated process, which started later
+    record_state('receiver', sleeper.pid, process_start_time(sleeper.pid) - 1)
+    assert reap() == []
+    time.sleep(0.1)
+    assert sleeper.poll() is None
+    assert not os.listdir(state_directory)
+
+
+def test_reap_exited_process(state_directory):
+    process = subprocess.Popen(['true'])
+    process.wait()
+    record_state('sender', process.pid, 1)
+    assert reap(['sender']) == []
+    assert not os.listdir(state_directory)
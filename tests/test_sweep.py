@@ -0,0 +1,81 @@
+# Expansion of declarative sweeps: values, inferred progressions, run names and tests split per swept value
+import os
+
+import pytest
+
+from benchmark import parse_config_file
+from sweep import count_runs, expand_cli_values, expand_sweep, expand_values, split_test
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_lists_and_ranges():
+    assert expand_values(64) == [64]
+    assert expand_values(['io-uring', 'select']) == ['io-uring', 'select']
+    assert expand_values([1, 2, '4..12:2']) == [1, 2, 4, 6, 8, 10, 12]
+    assert expand_values('1..4') == [1, 2, 3, 4]
+    assert expand_values('1..100:*4') == [1, 4, 16, 64]
+    assert expand_values('0.5..2:0.5') == [0.5, 1.0, 1.5, 2.0]
+    assert expand_cli_values(['1', '2', '3', '...', '5']) == [1, 2, 3, 4, 5]
+
+
+def test_inferred_progressions():
+    # Geometric if the last value is an integer multiple of the one before, unless three values are equally spaced
+    assert expand_values([3, 5, '...', 11]) == [3, 5, 7, 9, 11]
+    assert expand_values([1, 4, '...', 64]) == [1, 4, 16, 64]
+    assert expand_values([1, 2, '...', 16]) == [1, 2, 4, 8, 16]
+    assert expand_values([1, 2, 3, '...', 6]) == [1, 2, 3, 4, 5, 6]
+    assert expand_values([1, 4, '...', 64, 128, '...', 1024]) == [1, 4, 16, 64, 128, 256, 512, 1024]
+    # The end value does not have to be part of the progression
+    assert expand_values([2, 5, '...', 12]) == [2, 5, 8, 11, 12]
+
+
+@pytest.mark.parametrize('values, message', [
+    ([4, '...', 16], 'needs two preceding numbers'),
+    ([1, 2, '...'], 'must be followed by an end value'),
+    (['a', 'b', '...', 'z'], 'needs two preceding numbers'),
+    # Neither arithmetic nor geometric: decreasing values never reach the end
+    ([4, 2, '...', 16], 'does not terminate'),
+    (['1..8:*1'], 'does not terminate'),
+    (['8..1:0'], 'does not terminate'),
+])
+def test_invalid_values(values, message):
+    with pytest.raises(ValueError, match=message):
+        expand_values(values)
+
+
+def test_run_names():
+    sweep = {'parameters': {'uring-ring-size': 64}, 'receiver': {'parallel': [1, 2]}, 'sender': {}}
+    assert [run_name for run_name, _, _ in expand_sweep(sweep)] == ['1', '2']
+    assert next(expand_sweep(sweep))[1:] == ({'receiver': {'parallel': 1}, 'sender': {}}, {'uring-ring-size': 64})
+
+    sweep['receiver']['io-model'] = ['select', 'io-uring']
+    assert [run_name for run_name, _, _ in expand_sweep(sweep)][:2] == ['parallel=1 io-model=select', 'parallel=1 io-model=io-uring']
+    assert [run_name for run_name, _, _ in expand_sweep({**sweep, 'run_name': '{parallel} threads {io-model}', 'repetitions': 3})][-1] == '2 threads io-uring'
+    assert next(expand_sweep({**sweep, 'repetitions': 3}))[1]['repetitions'] == 3
+    assert count_runs(sweep) == 4
+
+
+def test_split_per_swept_value():
+    test_runs = {'sweep': {'parameters': {'uring-ring-size': [1, 4]}, 'receiver': {'parallel': [1, 2]}, 'sender': {}}}
+    tests = list(split_test('ring-size {uring-ring-size}', test_runs))
+    assert [test_name for test_name, _ in tests] == ['ring-size 1', 'ring-size 4']
+    assert tests[1][1]['sweep']['parameters'] == {'uring-ring-size': 4}
+    assert tests[1][1]['sweep']['receiver'] == {'parallel': [1, 2]}
+    # The sweep of the config is not changed
+    assert test_runs['sweep']['parameters'] == {'uring-ring-size': [1, 4]}
+
+    assert list(split_test('ring-size', test_runs)) == [('ring-size', test_runs)]
+    with pytest.raises(ValueError, match=r"uses \['parallel-sender'\], which are not swept"):
+        list(split_test('threads {parallel-sender}', test_runs))
+    with pytest.raises(ValueError, match='Unknown keys'):
+        list(split_test('ring-size {uring-ring-size}', {'sweep': {'parameter': {'uring-ring-size': [1]}}}))
+
+
+def test_converted_config_expands_to_explicit_runs():
+    # The explicit config is the ring-size config before it was converted to a sweep
+    sweep_tests = parse_config_file(f'{REPOSITORY}/configs/uring_receiver_multi_thread_ring_size_gsro_multishot.json')
+    explicit_tests = parse_config_file(f'{REPOSITORY}/tests/configs/uring_receiver_multi_thread_ring_size_gsro_multishot_explicit.json')
+    assert [test['test_name'] for test in sweep_tests] == [test['test_name'] for test in explicit_tests]
+    assert [test['run_count'] for test in sweep_tests] == [test['run_count'] for test in explicit_tests]
+    assert [list(test['runs']) for test in sweep_tests] == [list(test['runs']) for test in explicit_tests]
@@ -0,0 +1,69 @@
+# Incremental synchronization of the result files, with the remote commands run locally instead of over SSH
+import subprocess
+
+import pytest
+
+import sync
+from sync import sync_file, sync_results
+
+
+class LocalPool:
+    def run(self, host, command, **kwargs):
+        return subprocess.run(['bash', '-c', command], **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def local_pool(monkeypatch):
+    monkeypatch.setattr(sync, 'POOL', LocalPool())
+
+
+def append(path, text: str) -> int:
+    with open(path, 'a') as file:
+        file.write(text)
+    return path.stat().st_size
+
+
+def test_partial_line_is_left_for_next_sync(tmp_path):
+    remote, local = tmp_path / 'receiver-uring.csv', tmp_path / 'local.csv'
+    size = append(remote, 'test_name,interval_id\ntest,1\ntest,')
+    assert sync_file('host', str(remote), str(local), size) == len('test_name,interval_id\ntest,1\n')
+    assert local.read_text() == 'test_name,interval_id\ntest,1\n'
+
+    size = append(remote, '2\ntest,3\n')
+    assert sync_file('host', str(remote), str(local), size) == len('test,2\ntest,3\n')
+    assert local.read_text() == remote.read_text()
+    assert sync_file('host', str(remote), str(local), size) == 0
+
+
+def test_bytes_written_after_listing_are_not_synced(tmp_path):
+    remote, local = tmp_path / 'receiver-uring.csv', tmp_path / 'local.csv'
+    size = append(remote, 'test,1\n')
+    append(remote, 'test,2\n')
+    sync_file('host', str(remote), str(local), size)
+    assert local.read_text() == 'test,1\n'
+
+
+def test_replaced_file_is_copied_again(tmp_path):
+    remote, local = tmp_path / 'receiver-uring.csv', tmp_path / 'local.csv'
+    sync_file('host', str(remote), str(local), append(remote, 'test,1\ntest,2\n'))
+    remote.write_text('new,1\n')
+    assert sync_file('host', str(remote), str(local), remote.stat().st_size) == len('new,1\n')
+    assert local.read_text() == 'new,1\n'
+
+
+def test_sync_results(tmp_path):
+    remote_folder = tmp_path / 'hosts'
+    remote_folder.mkdir()
+    (remote_folder / 'receiver-uring.csv').write_text('test,1\n')
+    (remote_folder / 'receiver-uring.log').write_text('error\n')
+    (remote_folder / 'sender-uring.csv').write_text('test,1\ntest,2\n')
+    (remote_folder / 'receiver-uring.json').write_text('{}\n')
+    # Overwritten by every run, so an incremental copy would mix the counters of several runs
+    (remote_folder / 'receiver-uring.perf.log').write_text('2000000,,cycles\n')
+    (remote_folder / 'receiver-uring.perf-stderr.log').write_text('WARNING\n')
+    targets = sync.sync_targets('receiver', 'sender', str(tmp_path / 'live'))
+
+    assert sync_results(targets, str(remote_folder)) == 27
+    assert sorted(path.name for path in (tmp_path / 'live' / 'udperf-receiver').iterdir()) == ['receiver-uring.csv', 'receiver-uring.log']
+    assert (tmp_path / 'live' / 'udperf-sender' / 'sender-uring.csv').read_text() == 'test,1\ntest,2\n'
+    assert sync_results(targets, str(remote_folder)) == 0
@@ -19,6 +19,7 @@ matplotlib_logger.setLevel(logging.WARNING)
 
 PATH_TO_RESULTS_FOLDER = 'results'
 BURN_IN_THRESHOLD = 25 # Percentage of data points (rows) to skip at the beginning of the test
+REVISION_SEPARATOR = '@' # Test names of multi-revision campaigns are labelled <test name>@<udperf revision>
 
 MAPPINGS_COLUMNS = {
     "amount_threads": "Number of Threads",
@@ -67,11 +68,20 @@ def pre_process_data(results_file: str, y_value: str) -> pd.DataFrame:
 
     # Ensure run_name is always a string
     processed_df['run_name'] = processed_df['run_name'].astype(str)
+    processed_df = add_revision_columns(processed_df)
 
     logging.debug('Processed data: %s', processed_df)
     return processed_df
 
 
+def add_revision_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # Split the test label into test name and udperf revision. Results of single revision campaigns get an empty revision
+    split_names = df['test_name'].astype(str).str.rsplit(REVISION_SEPARATOR, n=1)
+    df['test_base_name'] = split_names.str[0]
+    df['revision'] = split_names.str[1].fillna('')
+    return df
+
+
 def get_names_ordered(results_file: str, name: str) -> np.ndarray:
     data = pd.read_csv(results_file)
     # Get the unique names in the order they appear in the csv file -> This order should be the order in the plot
@@ -191,22 +201,41 @@ def generate_bar_chart(y: str, data: pd.DataFrame, chart_title: str, results_fil
     # We assume that test_name is the same for all runs
     data['run_name'] = pd.Categorical(data['run_name'], categories=get_names_ordered(results_file, 'run_name'), ordered=True)
 
-    grouped = data.groupby('run_name')[y]
+    revisions = data['revision'].unique()
+    if len(revisions) > 1:
+        # One bar per revision next to each other for every run
+        grouped_data = data.groupby(['run_name', 'revision'], observed=True)[y].agg(['mean', 'std']).reset_index()
+        run_names = data['run_name'].cat.categories
+        plot_x_values = pd.Series(run_names).str.replace(' ', '\n', 1)
+        positions = np.arange(len(run_names))
+        width = 0.8 / len(revisions)
+
+        for index, revision in enumerate(revisions):
+            revision_data = grouped_data[grouped_data['revision'] == revision].set_index('run_name').reindex(run_names)
+            offset = (index - (len(revisions) - 1) / 2) * width
+            if no_errors:
+                plt.bar(positions + offset, revision_data['mean'], width, label=revision)
+            else:
+                plt.bar(positions + offset, revision_data['mean'], width, label=revision, yerr=revision_data['std'], capsize=3)
+        plt.xticks(positions, plot_x_values)
+        plt.legend(title='Revision')
+    else:
+        grouped = data.groupby('run_name')[y]
 
-    mean_std = grouped.agg(['mean', 'std'])
-    grouped_data = mean_std.reset_index()
+        mean_std = grouped.agg(['mean', 'std'])
+        grouped_data = mean_std.reset_index()
 
-    # Replacing spaces in x-axis labels for better readability
-    plot_x_values = grouped_data['run_name'].str.replace(' ', '\n', 1) 
+        # Replacing spaces in x-axis labels for better readability
+        plot_x_values = grouped_data['run_name'].str.replace(' ', '\n', 1)
 
-    # Calculate mean and standard dev for each run
-    means = grouped_data['mean']
-    std_devs = grouped_data['std']
+        # Calculate mean and standard dev for each run
+        means = grouped_data['mean']
+        std_devs = grouped_data['std']
 
-    if no_errors:
-        plt.bar(plot_x_values, means)
-    else:
-        plt.bar(plot_x_values, means, yerr=std_devs, capsize=5, error_kw=dict(ecolor='darkred', lw=2, capsize=5, capthick=2))
+        if no_errors:
+            plt.bar(plot_x_values, means)
+        else:
+            plt.bar(plot_x_values, means, yerr=std_devs, capsize=5, error_kw=dict(ecolor='darkred', lw=2, capsize=5, capthick=2))
 
     if x_label is not None:
         plt.xlabel(MAPPINGS_COLUMNS.get(x_label, x_label))
@@ -224,7 +253,43 @@ def generate_bar_chart(y: str, data: pd.DataFrame, chart_title: str, results_fil
     plot_file = results_folder + '/' + chart_title + '_bar'
     save_plot(plot_file, pdf, replace_plot)
 
-    
+
+def generate_comparison_chart(x: str, y: str, data: pd.DataFrame, chart_title: str, results_file: str, results_folder: str, rm_filename=False, pdf=False, replace_plot=False):
+    # Relative difference of every revision to the first revision in the results file (baseline) per test
+    revisions = get_names_ordered(results_file, 'test_name')
+    revisions = [name.rsplit(REVISION_SEPARATOR, 1)[1] for name in revisions.astype(str) if REVISION_SEPARATOR in name]
+    revisions = list(dict.fromkeys(revisions))
+    if len(revisions) < 2:
+        logging.warning('Results file %s contains less than two revisions, skipping comparison chart', results_file)
+        return
+
+    baseline = revisions[0]
+    plt.figure()
+    for test_name, group in data.groupby('test_base_name', sort=False):
+        mean_y = group.groupby(['revision', x])[y].mean()
+        if baseline not in mean_y.index.get_level_values('revision'):
+            continue
+        baseline_y = mean_y.loc[baseline]
+        for revision in revisions[1:]:
+            if revision not in mean_y.index.get_level_values('revision'):
+                continue
+            change = (mean_y.loc[revision] / baseline_y - 1) * 100
+            change = change.dropna()
+            plt.plot(change.index.astype(str), change.values, label=f'{test_name}: {revision}', marker='o')
+
+    plt.axhline(0, color='black', linewidth=1)
+    plt.xlabel(MAPPINGS_COLUMNS.get(x, x))
+    plt.ylabel(f'Change of {MAPPINGS_COLUMNS.get(y, y)} vs. {baseline} (%)')
+    if not rm_filename:
+        plt.text(0.99, 0.5, 'data: ' + os.path.basename(results_file), ha='center', va='center', rotation=90, transform=plt.gcf().transFigure, fontsize=8)
+    plt.title(chart_title)
+    plt.legend()
+
+    chart_title = chart_title.lower().replace(' - ', '_').replace(' ', '_').replace('/', '_').replace('-', '_')
+    plot_file = results_folder + '/' + chart_title + '_compare'
+    save_plot(plot_file, pdf, replace_plot)
+
+
 def save_plot(plot_file, pdf, replace_plot=False):
     if replace_plot is False:
         counter = 1
@@ -265,7 +330,7 @@ def main():
     parser.add_argument('x_axis_param', default='run_name', help='Name of the x-axis parameter')
     parser.add_argument('y_axis_param', default='data_rate_gbit', help='Name of the y-axis parameter')
     parser.add_argument('--test_name', help='Name of the specific test to generate the heatmap for')
-    parser.add_argument('type', default='area', help='Type of graph to generate (area, bar, heat)')
+    parser.add_argument('type', default='area', help='Type of graph to generate (area, bar, heat, compare)')
     parser.add_argument('-l', action='store_true', help='Add labels to data points')
     parser.add_argument('--rm-filename', action='store_true', help='Add the results file name to the graph')
     parser.add_argument('--no-errors', action='store_true', help='Dont display errors (standard deviation etc.) in the charts')
@@ -284,6 +349,8 @@ def main():
         if args.chart_name == 'Benchmark':
             args.chart_name = data_frame['test_name'].iloc[0]
         generate_bar_chart(args.y_axis_param, data_frame, args.chart_name, args.results_file, args.results_folder, args.rm_filename, args.no_errors, args.x_label, args.pdf, args.replace)
+    elif args.type == 'compare':
+        generate_comparison_chart(args.x_axis_param, args.y_axis_param, data_frame, args.chart_name, args.results_file, args.results_folder, args.rm_filename, args.pdf, args.replace)
     elif args.type == 'heat':
         pass
         # Needs to be moved to using pandas
@@ -0,0 +1,110 @@
+# Joins the per-interval host samples of scripts/sampler.py to the udperf result CSV of the same host.
+# The sampler starts before the readiness barrier and the sender, so its intervals are shifted against the udperf intervals.
+# Samples and udperf rows are therefore matched by time: benchmark.py records the start time of receiver and sender and the interval
+# of every repetition in counters-<results file>.csv, and the udperf interval i ends at start + i * interval. Every udperf interval
+# gets the sample which ended closest to it, within half an interval. The clocks of the hosts are assumed to be synchronized (NTP).
+# Per interval, the host totals (cpu "all") and the busiest CPU are added as columns with a prefix,
+# e.g. receiver_softirq_percent next to data_rate_gbit. The summary rows (interval_id 0) get the mean of the joined intervals of their repetition.
+# Samples of the drops source are joined the same way, their summary rows get the drops of all joined intervals.
+# For the sockets source, the host totals and the fullest and most dropping socket of each interval are added.
+import argparse
+import logging
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+LABEL_COLUMNS = ['test_name', 'run_name', 'repetition_id']
+JOIN_COLUMNS = LABEL_COLUMNS + ['interval_id']
+HOST_COLUMNS = ['busy_percent', 'user_percent', 'system_percent', 'irq_percent', 'softirq_percent', 'net_rx_per_second', 'net_tx_per_second']
+DROP_COLUMNS = ['softnet_processed_per_second', 'udp_in_datagrams', 'udp_out_datagrams', 'udp_rcvbuf_errors', 'udp_sndbuf_errors', 'udp_in_errors', 'udp_no_ports',
+                'softnet_dropped', 'softnet_time_squeeze', 'nic_rx_dropped', 'nic_tx_dropped'] # See DROP_COLUMNS in scripts/sampler.py
+SOCKET_COLUMNS = ['rx_queue_bytes', 'drops', 'udp_mem_pages']
+
+
+def aggregate_cpu_samples(samples: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+    # Returns one row per sample interval and the columns which are summed up instead of averaged for the summary rows
+    host = samples[samples['cpu'] == 'all'][JOIN_COLUMNS + ['timestamp'] + HOST_COLUMNS]
+    # The busiest CPU shows a single saturated core, e.g. the one handling the NET_RX softirqs of the receiver
+    busiest = samples[samples['cpu'] != 'all'].groupby(JOIN_COLUMNS).agg(max_core_busy_percent=('busy_percent', 'max'), max_core_softirq_percent=('softirq_percent', 'max')).reset_index()
+    return host.merge(busiest, on=JOIN_COLUMNS, how='left'), []
+
+
+def aggregate_drop_samples(samples: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+    host = samples[samples['cpu'] == 'all'][JOIN_COLUMNS + ['timestamp'] + DROP_COLUMNS]
+    # Backlog drops concentrate on the CPUs which handle the NET_RX softirqs of the receive queues
+    busiest = samples[samples['cpu'] != 'all'].groupby(JOIN_COLUMNS).agg(max_core_softnet_dropped=('softnet_dropped', 'max'), max_core_softnet_time_squeeze=('softnet_time_squeeze', 'max')).reset_index()
+    return host.merge(busiest, on=JOIN_COLUMNS, how='left'), DROP_COLUMNS[1:] + ['max_core_softnet_dropped', 'max_core_softnet_time_squeeze']
+
+
+def aggregate_socket_samples(samples: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+    host = samples[samples['socket'] == 'all'][JOIN_COLUMNS + ['timestamp'] + SOCKET_COLUMNS]
+    # A socket which falls behind has a full receive queue and drops, while the other sockets of the run keep up
+    sockets = samples[samples['socket'] != 'all'].groupby(JOIN_COLUMNS).agg(max_socket_rx_queue_bytes=('rx_queue_bytes', 'max'), max_socket_drops=('drops', 'max'), sockets=('socket', 'count')).reset_index()
+    return host.merge(sockets, on=JOIN_COLUMNS, how='left'), ['drops']
+
+
+def interval_timestamps(results: pd.DataFrame, counters: pd.DataFrame, role: str) -> pd.DataFrame:
+    # End time of every udperf interval, from the start time of the role and the interval of its repetition
+    starts = counters[LABEL_COLUMNS + [f'{role}_start_timestamp', 'interval']].rename(columns={f'{role}_start_timestamp': 'start_timestamp'})
+    starts = starts.drop_duplicates(LABEL_COLUMNS, keep='last')
+    results = results.merge(starts, on=LABEL_COLUMNS, how='left')
+    results['timestamp'] = results['start_timestamp'] + results['interval_id'] * results['interval']
+    return results
+
+
+def join_by_time(intervals: pd.DataFrame, aggregated: pd.DataFrame) -> pd.DataFrame:
+    samples = aggregated.drop(columns='interval_id').rename(columns={'timestamp': 'sample_timestamp'})
+    # Repetitions without a start time, e.g. measured before the start times were recorded, are not joined
+    timed = intervals['timestamp'].notna()
+    joined = pd.merge_asof(intervals[timed].sort_values('timestamp'), samples.sort_values('sample_timestamp'), left_on='timestamp', right_on='sample_timestamp', by=LABEL_COLUMNS, direction='nearest')
+    # A sample further away belongs to the time before or after the run
+    unmatched = (joined['sample_timestamp'] - joined['timestamp']).abs() > joined['interval'] / 2
+    joined.loc[unmatched, [column for column in samples.columns if column not in LABEL_COLUMNS]] = None
+    return pd.concat([joined, intervals[~timed]], ignore_index=True)
+
+
+def join_samples(results_file: str, samples_file: str, counters_file: str, role: str, prefix: str) -> pd.DataFrame:
+    results = pd.read_csv(results_file)
+    samples = pd.read_csv(samples_file, dtype={'cpu': str, 'socket': str})
+    counters = pd.read_csv(counters_file)
+    # Numeric run names are read as numbers and empty ones as NaN, so all sides are compared as strings
+    for frame in (results, samples, counters):
+        frame['run_name'] = frame['run_name'].fillna('').astype(str)
+
+    if 'socket' in samples.columns:
+        (aggregated, summed_columns), check_column = aggregate_socket_samples(samples), 'drops'
+    elif 'softnet_dropped' in samples.columns:
+        (aggregated, summed_columns), check_column = aggregate_drop_samples(samples), 'softnet_dropped'
+    else:
+        (aggregated, summed_columns), check_column = aggregate_cpu_samples(samples), 'busy_percent'
+    sample_columns = [column for column in aggregated.columns if column not in JOIN_COLUMNS + ['timestamp']]
+
+    results = interval_timestamps(results, counters, role)
+    intervals = join_by_time(results[results['interval_id'] != 0], aggregated)
+    summaries = intervals.groupby(LABEL_COLUMNS)[sample_columns].agg({column: 'sum' if column in summed_columns else 'mean' for column in sample_columns}).reset_index()
+    summary_rows = results[results['interval_id'] == 0].merge(summaries, on=LABEL_COLUMNS, how='left')
+
+    joined = pd.concat([intervals, summary_rows], ignore_index=True).sort_values(LABEL_COLUMNS + ['interval_id'], kind='stable')
+    joined = joined.drop(columns=['start_timestamp', 'interval', 'timestamp', 'sample_timestamp']).rename(columns={column: prefix + column for column in sample_columns})
+    missing = joined[prefix + check_column].isna().sum()
+    if missing:
+        logging.warning(f'{missing} of {len(joined)} rows of {results_file} have no samples')
+    return joined.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Join the CPU, drop or socket samples of sampler.py to a udperf result CSV by time')
+    parser.add_argument('results_file', help='udperf result CSV, e.g. receiver-<config>.csv')
+    parser.add_argument('samples_file', help='Samples of the same host, e.g. receiver-cpu-<config>.samples.csv or receiver-sockets-<config>.samples.csv')
+    parser.add_argument('counters_file', help='Counters of the same campaign with the start times of the repetitions, counters-<config>.csv in the summary folder')
+    parser.add_argument('--role', choices=['receiver', 'sender'], default='receiver', help='Role of the host of the results file')
+    parser.add_argument('--prefix', help='Prefix of the added columns, <role>_ by default')
+    parser.add_argument('--output', required=True, help='Path of the joined CSV')
+    args = parser.parse_args()
+
+    join_samples(args.results_file, args.samples_file, args.counters_file, args.role, args.prefix or f'{args.role}_').to_csv(args.output, index=False)
+    logging.info(f'Joined results stored in: {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Breaks the packet loss of the runs down by the place where the kernel dropped the packets.
+# Input is the counters-<results file> written by benchmark.py with the drop counter deltas of every repetition on both hosts.
+# Per test and run, the mean drops per repetition are stacked: socket buffer overflow (UDP RcvbufErrors), backlog drops
+# (softnet_stat dropped) and NIC drops (/proc/net/dev drop and fifo) of the receiver, and the send buffer errors of the sender.
+# With the udperf receiver CSV, packet_loss of the summary rows is drawn on a second axis.
+import argparse
+import logging
+import os
+import matplotlib.pyplot as plt
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Column of the counters file -> label in the plot
+LOSS_CAUSES = {
+    'receiver_udp_rcvbuf_errors': 'Socket buffer overflow (receiver)',
+    'receiver_softnet_dropped': 'Backlog drops (receiver)',
+    'receiver_nic_rx_dropped': 'NIC drops (receiver)',
+    'sender_udp_sndbuf_errors': 'Send buffer errors (sender)',
+}
+
+
+def loss_breakdown(counters_file: str, results_file=None) -> pd.DataFrame:
+    counters = pd.read_csv(counters_file)
+    causes = [column for column in LOSS_CAUSES if column in counters.columns]
+    counters['run_name'] = counters['run_name'].fillna('').astype(str)
+    breakdown = counters.groupby(['test_name', 'run_name'], sort=False)[causes].mean().reset_index()
+
+    if results_file is not None:
+        results = pd.read_csv(results_file)
+        results['run_name'] = results['run_name'].fillna('').astype(str)
+        # interval_id 0 is the summary row of a repetition
+        loss = results[results['interval_id'] == 0].groupby(['test_name', 'run_name'])['packet_loss'].mean().reset_index()
+        breakdown = breakdown.merge(loss, on=['test_name', 'run_name'], how='left')
+    return breakdown
+
+
+def plot_loss_breakdown(breakdown: pd.DataFrame, title: str, output: str):
+    causes = [column for column in LOSS_CAUSES if column in breakdown.columns]
+    labels = [f'{test_name}\n{run_name}' if breakdown['test_name'].nunique() > 1 else run_name for test_name, run_name in zip(breakdown['test_name'], breakdown['run_name'])]
+
+    fig, ax = plt.subplots(figsize=(max(8, len(breakdown) * 0.6), 6))
+    bottom = pd.Series(0.0, index=breakdown.index)
+    for column in causes:
+        ax.bar(labels, breakdown[column], bottom=bottom, label=LOSS_CAUSES[column])
+        bottom += breakdown[column]
+    ax.set_xlabel('Run')
+    ax.set_ylabel('Dropped packets per repetition')
+    ax.set_title(title)
+    ax.tick_params(axis='x', rotation=45)
+
+    if 'packet_loss' in breakdown.columns:
+        loss_axis = ax.twinx()
+        loss_axis.plot(labels, breakdown['packet_loss'], color='black', marker='o', label='Packet Loss (%)')
+        loss_axis.set_ylabel('Packet Loss (%)')
+        loss_axis.legend(loc='upper right')
+    ax.legend(loc='upper left')
+    fig.tight_layout()
+
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fig.savefig(output)
+    logging.info(f'Plot saved as: {output}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plot the packet loss of the runs by cause from the drop counters of benchmark.py')
+    parser.add_argument('counters_file', help='Drop counters of benchmark.py, counters-<results file>.csv')
+    parser.add_argument('--results-file', default=None, help='udperf receiver CSV of the same runs, adds packet_loss to the plot')
+    parser.add_argument('--title', default='Packet Loss by Cause', help='Title of the plot')
+    parser.add_argument('--output', required=True, help='Path of the plot, e.g. loss.png')
+    parser.add_argument('--csv', default=None, help='Also write the breakdown per run to this CSV file')
+    args = parser.parse_args()
+
+    breakdown = loss_breakdown(args.counters_file, args.results_file)
+    if args.csv:
+        breakdown.to_csv(args.csv, index=False)
+    plot_loss_breakdown(breakdown, args.title, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ import os
 RESULTS_DIR = "./graphs"
 FOLDER_NAME_IN_TAR = "udperf-results-test" # Normally: "results"
 MAPPINGS_FOLDER_PATH = "visualize"
+SAMPLES_EXTENSION = ".samples.csv" # See SAMPLES_EXTENSION in scripts/sampler.py
 
 MAPPINGS = {
     "special": "configs_mapping_special.json",
@@ -18,7 +19,7 @@ MAPPINGS = {
 
 logging.basicConfig(level=logging.INFO , format='%(asctime)s - %(levelname)s - %(message)s')
 
-def create_plots(results_folder: str, csv_folder: str, configs_mapping: dict[str, dict[str, str]], no_errors=False) -> str:
+def create_plots(results_folder: str, csv_folder: str, configs_mapping: dict[str, dict[str, str]], no_errors=False, compare=False) -> str:
     logging.info(f"Create plots for the results in {results_folder}")
     os.makedirs(results_folder, exist_ok=True)
     result = ""
@@ -35,7 +36,8 @@ def create_plots(results_folder: str, csv_folder: str, configs_mapping: dict[str
         base_name = config_name.replace('.json', '-')
         csv_file = None
         for file in os.listdir(csv_folder):
-            if base_name in file and file.endswith('.csv'):
+            # Host samples of sampler.py are joined with join_samples.py, not plotted directly
+            if base_name in file and file.endswith('.csv') and not file.endswith(SAMPLES_EXTENSION):
                 csv_file = file
                 csv_file_path = os.path.join(csv_folder, csv_file)
 
@@ -50,13 +52,19 @@ def create_plots(results_folder: str, csv_folder: str, configs_mapping: dict[str
 
                 logging.debug(f"Running command: {command}")
                 subprocess.run(command, check=True)
+
+                if compare:
+                    # Relative change of each udperf revision against the first one
+                    compare_command = ["python3", "visualize/create_plot_from_csv.py", csv_file_path, title, x_label, y_label, "compare", "--results-folder", results_folder]
+                    logging.debug(f"Running command: {compare_command}")
+                    subprocess.run(compare_command, check=True)
         if csv_file is None:
             logging.error(f"No CSV file found for {config_name} in {csv_folder}")
             result += f"- {config_name} : No CSV file found\n"
             continue 
     return result
 
-def visualize(folder_name: str, results_folder: str, no_errors=False):
+def visualize(folder_name: str, results_folder: str, no_errors=False, compare=False):
     csv_folder_receiver = os.path.join(folder_name, f"udperf-receiver")
     csv_folder_sender = os.path.join(folder_name, f"udperf-sender")
     result = "FAILED PLOTS\n"
@@ -69,8 +77,8 @@ def visualize(folder_name: str, results_folder: str, no_errors=False):
             os.makedirs(results_folder_path, exist_ok=True) 
             with open(file_path, 'r') as file:
                 config_mapping = json.load(file)
-                result += create_plots(results_folder_path, csv_folder_receiver, config_mapping["receiver"], no_errors=no_errors)
-                result += create_plots(results_folder_path, csv_folder_sender, config_mapping["sender"], no_errors=no_errors)
+                result += create_plots(results_folder_path, csv_folder_receiver, config_mapping["receiver"], no_errors=no_errors, compare=compare)
+                result += create_plots(results_folder_path, csv_folder_sender, config_mapping["sender"], no_errors=no_errors, compare=compare)
                 logging.info(f"Plots created for {key}")
         except FileNotFoundError as e:
             logging.error(f"File not found: {e}")
@@ -81,37 +89,47 @@ def visualize(folder_name: str, results_folder: str, no_errors=False):
         logging.warning(result)
 
 
+def extract_archive(archive_path: str, folder_name: str):
+    # run.py collects the results of each host as tar.zst, which tarfile cannot read
+    if archive_path.endswith('.zst'):
+        subprocess.run(['tar', '--zstd', '-xf', archive_path, '-C', folder_name], check=True)
+    else:
+        with tarfile.open(archive_path, "r") as tar:
+            tar.extractall(folder_name)
+
+def host_archive(folder_name: str, host_name: str) -> str:
+    archive_path = os.path.join(folder_name, f"{host_name}-results.tar.zst")
+    return archive_path if os.path.exists(archive_path) else os.path.join(folder_name, f"{host_name}-results.tar.gz")
+
 def unpack_tar(tar_path: str, folder_name: str, receiver_name: str, sender_name=None):
     # Untar the results tar in the current directory
     with tarfile.open(tar_path, "r") as tar:
         tar.extractall(folder_name)
 
-    logging.info(f"Untar the file {receiver_name}-results.tar.gz inside {folder_name} into folder udperf-receiver")
-    receiver_tar_file = os.path.join(folder_name, f"{receiver_name}-results.tar.gz")
+    receiver_tar_file = host_archive(folder_name, receiver_name)
+    logging.info(f"Untar the file {receiver_tar_file} into folder udperf-receiver")
 
     try:
-        with tarfile.open(receiver_tar_file, "r") as tar:
-            tar.extractall(folder_name)
+        extract_archive(receiver_tar_file, folder_name)
         receiver_results_folder = os.path.join(folder_name, "udperf-receiver")
         # TODO: Change this to the variable FOLDER_NAME_IN_TAR
         os.rename(os.path.join(folder_name, "results"), receiver_results_folder)
-    except tarfile.TarError as e:
+    except (tarfile.TarError, subprocess.CalledProcessError) as e:
         logging.error(f"Error extracting tar file: {e}")
     except FileNotFoundError as e:
         logging.error(f"File not found: {e}")
 
 
     if sender_name:
-        logging.info(f"Untar the file {sender_name}-results.tar.gz inside {folder_name} into folder udperf-sender")
-        sender_tar_file = os.path.join(folder_name, f"{sender_name}-results.tar.gz")
+        sender_tar_file = host_archive(folder_name, sender_name)
+        logging.info(f"Untar the file {sender_tar_file} into folder udperf-sender")
 
         try:
-            with tarfile.open(sender_tar_file, "r") as tar:
-                tar.extractall(folder_name)
+            extract_archive(sender_tar_file, folder_name)
             sender_results_folder = os.path.join(folder_name, "udperf-sender")
             # TODO: Change this to the variable FOLDER_NAME_IN_TAR
             os.rename(os.path.join(folder_name, "results"), sender_results_folder)
-        except tarfile.TarError as e:
+        except (tarfile.TarError, subprocess.CalledProcessError) as e:
             logging.error(f"Error extracting tar file: {e}")
         except FileNotFoundError as e:
             logging.error(f"File not found: {e}")
@@ -140,6 +158,7 @@ def main():
     parser.add_argument("--use-existing", action="store_true", help="Use existing temp folder data instead of extracting the tar file.")
     parser.add_argument("--unpack-only", action="store_true", help="Only unpack the tar file and exit")
     parser.add_argument('--no-errors', action="store_true", help='Dont display errors (standard deviation etc.) in the charts')
+    parser.add_argument('--compare', action="store_true", help='Additionally plot the relative change of every udperf revision against the first one')
     parser.add_argument('--clean', action="store_true", help='Remove result folder before starting the script')
 
     args = parser.parse_args()
@@ -167,7 +186,7 @@ def main():
         fix_folder_structure(temp_folder)
 
     if not args.unpack_only:
-        visualize(temp_folder, args.results_folder, args.no_errors)
+        visualize(temp_folder, args.results_folder, args.no_errors, args.compare)
 
 
 if __name__ == '__main__':